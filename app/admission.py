@@ -0,0 +1,321 @@
+import asyncio
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from typing import Any, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+DB_PATH: str = 'admission.sqlite3'
+POLL_INTERVAL: float = 0.1  # seconds between two attempts of a queued request to be admitted
+MAX_WAIT: float = 30.0  # seconds a request waits in the queue before it is rejected
+MAX_QUEUED: int = 64  # requests waiting in the queue of all processes together
+MB: int = 1 << 20
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS reservations (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    cost INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    owner INTEGER NOT NULL,
+    created REAL NOT NULL,
+    started INTEGER
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def is_alive(pid: int) -> bool:
+    """Return True if a process with id *pid* exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def process_start(pid: int) -> Optional[int]:
+    """
+    Return the start time of the process with id *pid* in clock ticks since the boot of the machine, or None if it isn't
+    available on this platform.
+    """
+    try:
+        with open(f'/proc/{pid}/stat') as file:
+            return int(file.read().rsplit(')', 1)[1].split()[19])  # field 22, after the command name
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def is_running(pid: int, started: Optional[int]) -> bool:
+    """
+    Return True if the process with id *pid* that started at *started* (see process_start) still runs. A process that
+    reuses the id of a process that has ended, e.g., a restarted server in a container, doesn't count.
+    """
+    return is_alive(pid) and (started is None or process_start(pid) in (started, None))
+
+
+def resident_memory() -> Optional[int]:
+    """Return the resident memory (bytes) of this process, or None if it isn't available on this platform."""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def default_budget() -> int:
+    """
+    Return the memory budget (bytes) of the analyses: CPT_MEMORY_BUDGET_MB if it is set, otherwise half of the physical
+    memory of the machine.
+    """
+    if os.environ.get('CPT_MEMORY_BUDGET_MB'):
+        return int(float(os.environ['CPT_MEMORY_BUDGET_MB'])*MB)
+    try:
+        return os.sysconf('SC_PHYS_PAGES')*os.sysconf('SC_PAGE_SIZE')//2
+    except (AttributeError, ValueError, OSError):  # not available on this platform
+        return 4096*MB
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request can't be admitted within the memory budget. The request may be retried after *retry_after*
+    seconds, unless it is None because the request needs more memory than the whole budget.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.retry_after: Optional[int] = retry_after
+
+
+class Reservation:
+    """The memory reserved for an admitted request until it is released, also when used as a context manager."""
+
+    def __init__(self, budget: 'MemoryBudget', reservation_id: str, cost: int):
+        self._budget: MemoryBudget = budget
+        self._id: str = reservation_id
+        self._cost: int = cost
+        self._released: bool = False
+
+    def __enter__(self) -> 'Reservation':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+    @property
+    def cost(self) -> int:
+        return self._cost
+
+    def transfer(self) -> 'Reservation':
+        """
+        Return a reservation of the same memory that is released separately, e.g., at the end of a streamed response,
+        such that releasing this one has no effect.
+        """
+        self._released = True
+        return Reservation(self._budget, self._id, self._cost)
+
+    def release(self) -> None:
+        """Return the reserved memory to the budget. Releasing a reservation twice has no effect."""
+        if not self._released:
+            self._released = True
+            self._budget._remove(self._id)
+
+
+class MemoryBudget:
+    """
+    Admission control of the analyses by their estimated memory cost (bytes) against a budget of *budget* bytes that is
+    shared by all the server and worker processes on the machine through the SQLite database *db_path*.
+
+    A request is admitted as soon as its cost fits in the budget next to the requests that are in flight and no request
+    has been waiting longer, such that large requests aren't starved by small ones. A request that needs more than the
+    whole budget is rejected at once, a request that doesn't fit waits in the queue for at most *max_wait* seconds and
+    is rejected if *max_queued* requests are waiting already. The reservations of processes that no longer run, e.g.,
+    killed while out of memory, are released by the next request, also if a new process got the same id. The
+    database is by default the path in the environment variable CPT_ADMISSION_DB or DB_PATH and is created by *open*.
+    """
+
+    def __init__(self, budget: Optional[int] = None, db_path: Optional[str] = None, max_wait: float = MAX_WAIT,
+                 max_queued: int = MAX_QUEUED):
+        self._budget: int = budget if budget is not None else default_budget()
+        self._db_path: str = db_path or os.environ.get('CPT_ADMISSION_DB') or DB_PATH
+        self._max_wait: float = max_wait
+        self._max_queued: int = max_queued
+        self._started: Optional[int] = process_start(os.getpid())
+
+    @property
+    def budget(self) -> int:
+        return self._budget
+
+    def open(self) -> None:
+        """Create the tables of the budget in its database if they don't exist yet."""
+        with closing(self._connect()) as connection:
+            connection.executescript(SCHEMA)
+            columns: list[str] = [row['name'] for row in connection.execute('PRAGMA table_info(reservations)')]
+            if 'started' not in columns:  # a database of an earlier version
+                connection.execute('ALTER TABLE reservations ADD COLUMN started INTEGER')
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self._db_path, timeout=30, isolation_level=None)  # autocommit
+        connection.execute('PRAGMA journal_mode=WAL')  # readers don't block the writer
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _transaction(self, step, *arguments) -> Any:
+        """Run *step* with a connection and *arguments* in a transaction, one process at a time."""
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                result: Any = step(connection, *arguments)
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+        return result
+
+    @staticmethod
+    def _count(connection: sqlite3.Connection, name: str) -> None:
+        connection.execute('INSERT INTO counters (name, value) VALUES (?, 1) '
+                           'ON CONFLICT (name) DO UPDATE SET value = value + 1', (name,))
+
+    async def _in_thread(self, step, *arguments) -> Any:
+        """
+        Run *step* in a transaction in a worker thread, such that the event loop isn't blocked while the transaction
+        waits for the database. If the caller is cancelled, the cancellation is raised once the transaction has ended.
+        """
+        future: asyncio.Future = asyncio.ensure_future(run_in_threadpool(self._transaction, step, *arguments))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            await asyncio.wait([future])
+            raise
+
+    def _enqueue(self, connection: sqlite3.Connection, reservation_id: str, kind: str,
+                 cost: int) -> Optional[AdmissionRejected]:
+        owners: list[sqlite3.Row] = connection.execute('SELECT DISTINCT owner, started FROM reservations').fetchall()
+        for owner in owners:
+            if not is_running(owner['owner'], owner['started']):
+                connection.execute('DELETE FROM reservations WHERE owner = ? AND started IS ?',
+                                   (owner['owner'], owner['started']))
+
+        if cost > self._budget:
+            self._count(connection, 'rejected')
+            return AdmissionRejected(f"The request needs an estimated {cost/MB:.0f} MB of memory, more than the "
+                                     f"budget of {self._budget/MB:.0f} MB.")
+        (no_queued,) = connection.execute("SELECT COUNT(*) FROM reservations WHERE status = 'queued'").fetchone()
+        if no_queued >= self._max_queued:
+            self._count(connection, 'rejected')
+            return AdmissionRejected(f"{no_queued} requests are waiting for memory already.", retry_after=1)
+
+        connection.execute("INSERT INTO reservations (id, kind, cost, status, owner, created, started) "
+                           "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                           (reservation_id, kind, cost, os.getpid(), time.time(), self._started))
+        return None
+
+    def _admit(self, connection: sqlite3.Connection, reservation_id: str) -> bool:
+        (in_use,) = connection.execute(
+            "SELECT COALESCE(SUM(cost), 0) FROM reservations WHERE status = 'admitted'").fetchone()
+        first: Optional[sqlite3.Row] = connection.execute(
+            "SELECT id, cost FROM reservations WHERE status = 'queued' ORDER BY created, id LIMIT 1").fetchone()
+        if first is None or first['id'] != reservation_id or in_use + first['cost'] > self._budget:
+            return False
+
+        connection.execute("UPDATE reservations SET status = 'admitted' WHERE id = ?", (reservation_id,))
+        connection.execute('INSERT INTO counters (name, value) VALUES (?, ?) '
+                           'ON CONFLICT (name) DO UPDATE SET value = MAX(value, excluded.value)',
+                           ('peak', in_use + first['cost']))
+        self._count(connection, 'admitted')
+        return True
+
+    def _give_up(self, connection: sqlite3.Connection, reservation_id: str) -> None:
+        connection.execute('DELETE FROM reservations WHERE id = ?', (reservation_id,))
+        self._count(connection, 'rejected')
+
+    def _remove(self, reservation_id: str) -> None:
+        with closing(self._connect()) as connection:
+            connection.execute('DELETE FROM reservations WHERE id = ?', (reservation_id,))
+
+    def _rejection(self, cost: int) -> AdmissionRejected:
+        return AdmissionRejected(f"The request needs an estimated {cost/MB:.0f} MB of memory, which didn't become "
+                                 f"available within {self._max_wait:g} s.", retry_after=max(round(self._max_wait), 1))
+
+    def reserve(self, kind: str, cost: int, max_wait: Optional[float] = None) -> Reservation:
+        """
+        Wait until *cost* bytes fit in the budget for a request of *kind*, e.g., 'zones', and return its reservation.
+        The request waits at most *max_wait* seconds, by default those of the budget, and forever if it is infinite.
+        An AdmissionRejected exception is raised if the request can't be admitted.
+        """
+        reservation_id: str = uuid.uuid4().hex
+        rejection: Optional[AdmissionRejected] = self._transaction(self._enqueue, reservation_id, kind, cost)
+        if rejection is not None:  # raised after the transaction, which counts the rejection
+            raise rejection
+        deadline: float = time.monotonic() + (self._max_wait if max_wait is None else max_wait)
+        try:
+            while not self._transaction(self._admit, reservation_id):
+                if time.monotonic() >= deadline:
+                    self._transaction(self._give_up, reservation_id)
+                    raise self._rejection(cost)
+                time.sleep(POLL_INTERVAL)
+        except AdmissionRejected:
+            raise
+        except BaseException:
+            self._remove(reservation_id)
+            raise
+        return Reservation(self, reservation_id, cost)
+
+    async def admit(self, kind: str, cost: int) -> Reservation:
+        """
+        Like *reserve*, but wait in the queue without blocking the event loop of the server, such that the requests
+        in flight continue meanwhile. The transactions run in worker threads.
+        """
+        reservation_id: str = uuid.uuid4().hex
+        try:
+            rejection: Optional[AdmissionRejected] = await self._in_thread(self._enqueue, reservation_id, kind, cost)
+            if rejection is not None:  # raised after the transaction, which counts the rejection
+                raise rejection
+            deadline: float = time.monotonic() + self._max_wait
+            while not await self._in_thread(self._admit, reservation_id):
+                if time.monotonic() >= deadline:
+                    await self._in_thread(self._give_up, reservation_id)
+                    raise self._rejection(cost)
+                await asyncio.sleep(POLL_INTERVAL)
+        except AdmissionRejected:
+            raise
+        except BaseException:  # e.g., the client disconnected
+            self._remove(reservation_id)
+            raise
+        return Reservation(self, reservation_id, cost)
+
+    def usage(self) -> dict[str, Any]:
+        """
+        Return the budget, the memory in use by the admitted requests, the memory waited for by the queued requests
+        (all in MB), the requests in flight and in the queue and the number of admitted and rejected requests so far.
+        """
+        with closing(self._connect()) as connection:
+            rows: list[sqlite3.Row] = connection.execute(
+                'SELECT kind, cost, status, owner, created, started FROM reservations ORDER BY created').fetchall()
+            counters: dict[str, int] = {row['name']: row['value']
+                                        for row in connection.execute('SELECT name, value FROM counters')}
+
+        now: float = time.time()
+        requests: list[dict[str, Any]] = [
+            {"kind": row['kind'], "MB": round(row['cost']/MB, 1), "status": row['status'], "process": row['owner'],
+             "age (s)": round(now - row['created'], 1)} for row in rows if is_running(row['owner'], row['started'])]
+        return {
+            "budget MB": round(self._budget/MB, 1),
+            "in use MB": round(sum(r["MB"] for r in requests if r["status"] == 'admitted'), 1),
+            "queued MB": round(sum(r["MB"] for r in requests if r["status"] == 'queued'), 1),
+            "peak MB": round(counters.get('peak', 0)/MB, 1),
+            "# in flight": sum(r["status"] == 'admitted' for r in requests),
+            "# queued": sum(r["status"] == 'queued' for r in requests),
+            "# admitted": counters.get('admitted', 0),
+            "# rejected": counters.get('rejected', 0),
+            "requests": requests
+        }
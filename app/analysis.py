@@ -0,0 +1,274 @@
+import os
+import threading
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from io import BytesIO
+from typing import Optional, Union
+
+import numpy as np
+
+from app.validation import Polygon, ProbeFilter, SectionLine
+from cptlib.layertools.cross_section import CrossSection, section_probe_numbers
+from cptlib.layertools.layer_sweep import LayerSweep
+from cptlib.layertools.layers_probe import Layer, LayersProbe
+from cptlib.layertools.sbt_chart import SBTChart
+from cptlib.layertools.zones_cache import ZonesCache
+from cptlib.layertools.zones_probe import ZonesProbe
+from cptlib.probetools.preprocessing import PreprocessingPolicy
+from cptlib.probetools.json_source import is_compressed, json_file_path
+from cptlib.probetools.probe_cache import ProbeCache
+from cptlib.probetools.probe_index import ProbeIndex
+from cptlib.probetools.probe_list import Probe, ProbeList
+from cptlib.probetools.probe_location_list import ProbeLocationList
+from cptlib.setuptools.graph_set_up import GraphSetUp
+
+# The parsed probes are published once and shared by all the server and worker processes, in the directory
+# CPT_PROBE_CACHE or PROBE_CACHE_DIR
+PROBE_CACHE_DIR: str = 'probe_cache'
+probe_cache = ProbeCache(os.environ.get('CPT_PROBE_CACHE') or PROBE_CACHE_DIR)
+# The zones of the probes in cross-sections are classified once per version of their file
+zones_cache = ZonesCache()
+# pyplot keeps its figures in global state, so the figures are drawn one at a time when graphs are rendered in threads
+figure_lock = threading.Lock()
+
+# The estimated memory (bytes) of an analysis, measured on DOV exports: per byte of a json file that is parsed (plain)
+# or decompressed and imported record by record (compressed) into the probe cache, per measurement analysed by each
+# kind of request and per rendered figure
+PARSE_BYTES: float = 5.0
+STREAM_BYTES: float = 0.5
+COMPRESSION_RATIO: float = 10.0  # the size of a compressed json file once decompressed
+RECORD_BYTES: int = 500  # json bytes per record of a file that hasn't been indexed yet
+PROBE_RECORDS: int = 5000  # records of a long probe in a file that hasn't been indexed yet
+MEASUREMENT_BYTES: dict[str, int] = {'layers': 200, 'zones': 300, 'depth': 300, 'plot-data': 300, 'section': 300,
+                                     'graph': 8000, 'fast graph': 500, 'chart': 50, 'layer sweep': 1000,
+                                     'uncertainty': 500}
+FIGURE_BYTES: int = 50*2**20
+BATCH_BYTES: int = 100*2**20  # the realizations of a Monte Carlo classification in a batch
+
+
+def to_wkt(vertices: tuple[tuple[int, int], ...]) -> str:
+  """
+  Return a string representing the polygon formed by the tuple of vertices in **vertices** in WKT format.
+  """
+  wkt_fmt: str = "POLYGON (("
+  for vertex in vertices:
+    wkt_fmt = wkt_fmt + str(vertex[0]) + " " + str(vertex[1]) + ", "
+
+  wkt_fmt = wkt_fmt + str(vertices[0][0]) + " " + str(vertices[0][1]) + "))"
+  return wkt_fmt
+
+def file_version(json_probes_file: str) -> tuple[int, int, int, int]:
+  """
+  Return the device, inode, size and modification time of **json_probes_file**, which change whenever the file is
+  replaced or modified.
+  """
+  stat = os.stat(json_file_path(json_probes_file))
+  return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+def load_probes(json_probes_file: str, selection: ProbeFilter) -> ProbeList:
+  """
+  Return the probes in **json_probes_file** that satisfy **selection** as views of the dataset of the file in the
+  shared probe cache. The probes are selected by means of the index of the file.
+  """
+  if selection.is_empty():
+    return ProbeList(json_file_name=json_probes_file, cache=probe_cache)  # list all the probes in the file
+
+  probe_numbers: list[str] = select_probes(ProbeIndex(json_probes_file), selection)
+  return ProbeList(json_file_name=json_probes_file, probe_numbers=probe_numbers, cache=probe_cache)
+
+def select_probes(index: ProbeIndex, selection: ProbeFilter) -> list[str]:
+  """
+  Return the numbers of the probes in *index* that satisfy *selection*.
+  """
+  return index.select(numbers=selection.probe or None, bbox=selection.bounding_box(),
+                      date_range=selection.date_range(), method=selection.method, offset=selection.offset,
+                      limit=selection.limit)
+
+def estimate_memory(json_probes_file: str, selection: ProbeFilter, kind: str) -> int:
+  """
+  Return the estimated memory (bytes) of a request of *kind* (a key of MEASUREMENT_BYTES) for the probes in
+  **json_probes_file** that satisfy *selection*: the parsing of the file if it hasn't been published in the probe cache
+  yet, the analysis of the selected measurements, the figure of a graph or section and the batches of realizations of
+  an uncertainty analysis. The graph, plot-data and uncertainty analysis only analyse the first selected probe, the
+  chart bins the measurements in chunks. The number of measurements is taken from the index of the file if it has been
+  stored for the current version of the file, otherwise it is estimated from the size of the file, as building the
+  index requires the file to be read in full.
+  """
+  path: str = json_file_path(json_probes_file)
+  size: float = os.path.getsize(path)*(COMPRESSION_RATIO if is_compressed(path) else 1.0)
+  single_probe: bool = kind in ('graph', 'fast graph', 'plot-data', 'uncertainty')
+  cost: float = 0.0 if probe_cache.is_published(json_probes_file) else \
+    size*(STREAM_BYTES if is_compressed(path) else PARSE_BYTES)
+
+  index: Optional[ProbeIndex] = ProbeIndex.stored(json_probes_file)  # the file isn't scanned before it is admitted
+  if index is not None:
+    probe_numbers: list[str] = index.numbers if selection.is_empty() else select_probes(index, selection)
+    no_records: int = sum(index[number].no_records for number in probe_numbers[:1 if single_probe else None])
+  else:
+    no_records = int(size//RECORD_BYTES)
+    if single_probe:
+      no_records = min(no_records, PROBE_RECORDS)
+
+  cost += no_records*MEASUREMENT_BYTES[kind]
+  if kind in ('graph', 'fast graph', 'section', 'chart'):
+    cost += FIGURE_BYTES
+  if kind == 'uncertainty':
+    cost += BATCH_BYTES
+  return int(cost)
+
+def interval_statistics(probe: Probe, tops: np.ndarray, bottoms: np.ndarray) -> dict[str, list[Optional[float]]]:
+  """
+  Return the mean, minimum and maximum of qc, fs and Rf of *probe* in each depth interval [*tops*, *bottoms*). The
+  statistics of an interval without valid values are None.
+  """
+  summary: dict[str, np.ndarray] = probe.statistics().summarize(tops, bottoms)
+  del summary["# measurements"]
+  return {name: [None if value != value else value for value in values.tolist()] for name, values in summary.items()}
+
+def layers_info(probe: Probe, zone_number: int,
+                statistics: bool = False) -> dict[str, Union[str, int, float, None]]:
+  """
+  Return the probe number, number of measurements, number of layers and the depth of the top and bottom from the
+  thickest layer of *probe*. The layers are constrained to lay inside Zone *zone_number*. If *statistics* is True, the
+  mean, minimum and maximum of qc, fs and Rf in the thickest layer are added as well.
+  """
+  layers = LayersProbe(probe, zone_number) # find the clay layers in the probe
+  info: dict[str, Union[str, int, float]] = {
+    "probe number": probe.number,
+    "# measurements": len(probe.measurements),
+    "# layers": len(layers),
+    "Soil behaviour type": ZonesProbe.SBT(zone_number),
+    "top TL": "/",
+    "bottom TL": "/"
+  }
+
+  thickest_layer: Optional[Layer] = layers.thickest() # find thickest clay layer
+  if thickest_layer is not None:
+    info["top TL"] = thickest_layer.top
+    info["bottom TL"] = thickest_layer.bottom
+  if statistics:
+    tops, bottoms = ([], []) if thickest_layer is None else ([thickest_layer.top], [thickest_layer.bottom])
+    for name, values in interval_statistics(probe, np.array(tops), np.array(bottoms)).items():
+      info[name + " TL"] = values[0] if values else "/"
+
+  return info
+
+def layer_sweep_info(probe: Probe, qc_maxima: Iterable[float],
+                     zone_numbers: Iterable[int]) -> Iterator[dict[str, Union[str, int, float]]]:
+  """
+  Yield for each combination of a maximum cone resistance in *qc_maxima* and a zone number in *zone_numbers* the probe
+  number, the combination, the number of layers and the depth of the top and bottom from the thickest layer of *probe*,
+  as *layers_info* does for a single combination. All the combinations are determined in one pass over the probe.
+  """
+  for row in LayerSweep(probe, qc_maxima, zone_numbers):
+    yield {
+      "probe number": probe.number,
+      "qc max": row.qc_max,
+      "zone number": row.zone_number,
+      "Soil behaviour type": ZonesProbe.SBT(row.zone_number),
+      "# layers": row.no_layers,
+      "top TL": "/" if row.no_layers == 0 else row.top,
+      "bottom TL": "/" if row.no_layers == 0 else row.bottom
+    }
+
+def zones_info(probe: Probe, normalized: bool, preprocessing: PreprocessingPolicy = PreprocessingPolicy(),
+               statistics: bool = False) -> dict[str, Union[str, int, float, set[str], list]]:
+  """
+  Return the probe number, number of measurements, number of zones and the soil behaviour types of *probe*. The
+  measurements are processed according to *preprocessing* before they are classified. If *statistics* is True, the
+  top, bottom, zone number and the mean, minimum and maximum of qc, fs and Rf of each zone are added as lists.
+  """
+  zones = ZonesProbe(probe, normalized, preprocessing) # find the zone layers in the probe
+  info: dict[str, Union[str, int, float, set[str], list]] = {
+    "probe number": probe.number,
+    "# measurements": len(probe.measurements),
+    "# zones": len(zones),
+    "Soil behaviour types (SBTs)": zones.get_SBTs()
+  }
+  if statistics:
+    tops, bottoms, numbers = zones.columns()
+    info.update({"zone top": tops.tolist(), "zone bottom": bottoms.tolist(), "zone number": numbers.tolist()})
+    info.update(interval_statistics(probe, tops, bottoms))
+
+  return info
+
+def to_columns(rows: Iterable[dict]) -> dict[str, list]:
+  """
+  Return the values of the dictionaries in *rows* grouped per key in lists.
+  """
+  columns: dict[str, list] = defaultdict(list)
+  for row in rows:
+    for key, value in row.items():
+      columns[key].append(value)
+
+  return columns
+
+def graph_png(probe: Probe, normalized: bool, fast_rendering: bool,
+              preprocessing: PreprocessingPolicy = PreprocessingPolicy()) -> BytesIO:
+  """
+  Return a png image of the graph displaying all the soil types, the cone resistance and the friction ratio versus the
+  depth (m) of *probe*. The measurements are processed according to *preprocessing* before they are classified.
+  """
+  zones = ZonesProbe(probe, normalized, preprocessing)  # find the zone layers in the probe
+
+  # Combine data from several objects into one graph
+  with figure_lock:
+    graph = GraphSetUp(file_name=f"probe_{probe.number}", indep_variable='depth',
+                       title=probe.number, legend_font_size='xx-small', fast_rendering=fast_rendering)
+    probe.visualize(graph, ('qc', ''), (ZonesProbe.friction_ratio, 'Rf', '%', 'red'))
+    zones.visualize(graph)
+    image: BytesIO = graph.save(bytesio=True)
+    graph.close(graph.gcf())
+  return image
+
+def cross_section(json_probes_file: str, line: SectionLine, normalized: bool,
+                  preprocessing: PreprocessingPolicy = PreprocessingPolicy()) -> CrossSection:
+  """
+  Return the cross-section along *line* through the probes in **json_probes_file** that lay within its maximum offset.
+  The probes are selected by means of the index of the file and their zones are taken from the zones cache.
+  """
+  source: tuple[int, int, int, int] = file_version(json_probes_file)
+  probe_numbers: list[str] = section_probe_numbers(ProbeIndex(json_probes_file), line.vertices, line.max_offset)
+  probes = ProbeList(json_file_name=json_probes_file, probe_numbers=probe_numbers, cache=probe_cache)
+  return CrossSection(probes, line.vertices, line.max_offset, normalized, cache=zones_cache, source=source,
+                      preprocessing=preprocessing)
+
+def section_png(section: CrossSection, title: str) -> BytesIO:
+  """
+  Return a png image of *section* with *title*.
+  """
+  with figure_lock:
+    graph = GraphSetUp(file_name="section", indep_variable='depth', title=title, legend_font_size='xx-small')
+    graph.gcf().set_size_inches(10, 5)
+    section.visualize(graph)
+    image: BytesIO = graph.save(bytesio=True)
+    graph.close(graph.gcf())
+  return image
+
+def sbt_chart_png(probes: Iterable[Probe], title: str) -> Optional[BytesIO]:
+  """
+  Return a png image of the Robertson chart with the density of the valid measurements of *probes* and *title*, or
+  None if none of the measurements lays on the chart.
+  """
+  chart = SBTChart()
+  chart.add_probes(probes)
+  if not len(chart):
+    return None
+
+  with figure_lock:
+    graph = GraphSetUp(file_name="chart", indep_variable='qc',
+                       title=f"{title}: {len(chart)} measurements of {chart.no_probes} probes")
+    chart.visualize(graph)
+    image: BytesIO = graph.save(bytesio=True)
+    graph.close(graph.gcf())
+  return image
+
+def probes_in_polygon(poly: Polygon) -> BytesIO:
+  """
+  Return the numbers of the probes from the geoserver of Database Underground Flanders (DOV) that are located in the
+  area confined by *poly* as UTF-8 encoded text.
+  """
+  probe_locations = ProbeLocationList(poly.xy_min, poly.xy_max)
+  poly_wkt: str = to_wkt(poly.vertices)
+
+  return probe_locations.in_polygon(wkt_fmt=poly_wkt, bytesio=True)
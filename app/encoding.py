@@ -0,0 +1,240 @@
+import gzip
+import json
+import struct
+from collections.abc import Iterable, Iterator
+from typing import Any, Optional
+
+import numpy as np
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+# Optional encoders and compressors (the extra 'formats'): their formats are only offered if they are installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC: bytes = b'CPTC'
+MEDIA_TYPE_COLUMNS: str = 'application/x-cpt-columns'
+ALIGNMENT: int = 8
+
+MEDIA_TYPE_JSON: str = 'application/json'
+MEDIA_TYPE_MSGPACK: str = 'application/msgpack'
+MEDIA_TYPE_ARROW: str = 'application/vnd.apache.arrow.stream'
+MEDIA_TYPE_NDJSON: str = 'application/x-ndjson'
+MIN_COMPRESS_SIZE: int = 1024 # bytes
+
+
+def encode_columns(columns: dict[str, np.ndarray], metadata: dict) -> bytes:
+    """
+    Encode the arrays in *columns* and the JSON serializable *metadata* into a compact binary columnar format.
+
+    The content starts with the 4 bytes MAGIC and the length of the header as an unsigned 32-bit little-endian
+    integer. The header is a UTF-8 encoded JSON object containing *metadata* and, under the key 'columns', the name,
+    dtype, length and offset of each column. The raw little-endian column buffers follow the header. The header and
+    the buffers are padded to a multiple of ALIGNMENT bytes, such that each column can be viewed without copying, e.g.,
+    by a Float32Array in a browser or by numpy.frombuffer in a notebook.
+    """
+    header_columns: list[dict] = []
+    buffers: list[bytes] = []
+    offset: int = 0
+    for name, column in columns.items():
+        dtype: np.dtype = column.dtype.newbyteorder('<')
+        data: bytes = np.ascontiguousarray(column, dtype=dtype).tobytes()
+        header_columns.append({'name': name, 'dtype': dtype.str, 'length': len(column), 'offset': offset})
+        buffers.append(data + bytes(-len(data) % ALIGNMENT))
+        offset += len(buffers[-1])
+
+    header: bytes = json.dumps({**metadata, 'columns': header_columns}).encode('utf-8')
+    header += b' '*(-(len(MAGIC) + 4 + len(header)) % ALIGNMENT)
+    return MAGIC + struct.pack('<I', len(header)) + header + b''.join(buffers)
+
+
+def decode_columns(content: bytes) -> tuple[dict[str, np.ndarray], dict]:
+    """
+    Decode *content* encoded by *encode_columns* and return the columns and the metadata.
+
+    A ValueError is raised if *content* doesn't start with MAGIC.
+    """
+    if content[:len(MAGIC)] != MAGIC:
+        raise ValueError("The content is not encoded in the binary columnar format.")
+
+    (header_length,) = struct.unpack_from('<I', content, len(MAGIC))
+    data_start: int = len(MAGIC) + 4 + header_length
+    metadata: dict = json.loads(content[len(MAGIC) + 4:data_start])
+    columns: dict[str, np.ndarray] = {
+        column['name']: np.frombuffer(content, dtype=column['dtype'], count=column['length'],
+                                      offset=data_start + column['offset'])
+        for column in metadata.pop('columns')
+    }
+    return columns, metadata
+
+
+def to_json_lists(columns: dict[str, np.ndarray]) -> dict[str, list]:
+    """Return the columns in *columns* as lists in which NaN is replaced by None."""
+    return {name: [None if value != value else value for value in column.tolist()]  # NaN != NaN
+            for name, column in columns.items()}
+
+
+def available_media_types() -> list[str]:
+    """Return the media types of the formats that can be produced, in order of preference."""
+    media_types: list[str] = [MEDIA_TYPE_JSON, MEDIA_TYPE_NDJSON]
+    if msgpack is not None:
+        media_types.append(MEDIA_TYPE_MSGPACK)
+    if pa is not None:
+        media_types.append(MEDIA_TYPE_ARROW)
+    return media_types
+
+
+def negotiated_responses() -> dict[int, dict]:
+    """
+    Return the description of the responses of an endpoint with a negotiated format in the OpenAPI schema, to be passed
+    as *responses* together with response_model=None.
+    """
+    return {200: {'description': "The columns of the result in the format preferred by the Accept header.",
+                  'content': {media_type: {} for media_type in available_media_types()}}}
+
+
+def available_encodings() -> list[str]:
+    """Return the content codings that can be produced, in order of preference."""
+    return (['zstd'] if zstandard is not None else []) + ['gzip']
+
+
+def parse_quality_values(header: str) -> list[str]:
+    """
+    Return the values in the HTTP header *header*, e.g., an Accept or Accept-Encoding header, sorted by decreasing
+    quality value. Values with quality value 0 are left out.
+    """
+    weighted_values: list[tuple[float, str]] = []
+    for item in header.split(','):
+        value, *parameters = [part.strip() for part in item.split(';')]
+        quality: float = 1.0
+        for parameter in parameters:
+            if parameter.startswith('q='):
+                try:
+                    quality = float(parameter[2:])
+                except ValueError:
+                    quality = 0.0
+        if value and quality > 0:
+            weighted_values.append((quality, value.lower()))
+
+    weighted_values.sort(key=lambda weighted_value: -weighted_value[0]) # stable
+    return [value for _, value in weighted_values]
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """Return the available media type that is preferred by the Accept header *accept*. JSON is the fallback."""
+    media_types: list[str] = available_media_types()
+    for value in parse_quality_values(accept or ''):
+        if value in ('application/x-msgpack', 'application/vnd.msgpack'):
+            value = MEDIA_TYPE_MSGPACK
+        elif value in ('application/jsonl', 'application/jsonlines'):
+            value = MEDIA_TYPE_NDJSON
+        if value in media_types:
+            return value
+        if value in ('*/*', 'application/*'):
+            return MEDIA_TYPE_JSON
+    return MEDIA_TYPE_JSON
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Return the available content coding that is preferred by the Accept-Encoding header *accept_encoding*."""
+    encodings: list[str] = available_encodings()
+    for value in parse_quality_values(accept_encoding or ''):
+        if value in encodings:
+            return value
+        if value == '*':
+            return encodings[0]
+    return None
+
+
+def _default(obj: Any) -> Any:
+    """Convert the objects that the encoders don't support natively."""
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable.")
+
+
+def _arrow_column(values: list) -> Any:
+    """Return *values* as an Arrow array. Strings in a numeric column, e.g., '/', become null."""
+    values = [_default(value) if isinstance(value, (set, frozenset, np.generic)) else value for value in values]
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([value if isinstance(value, (int, float)) else None for value in values])
+
+
+def encode(content: dict, media_type: str) -> bytes:
+    """Encode the columns in *content* in the format with *media_type* (JSON for other media types)."""
+    if media_type == MEDIA_TYPE_MSGPACK:
+        return msgpack.packb(content, default=_default)
+    if media_type == MEDIA_TYPE_ARROW:
+        table = pa.table({name: _arrow_column(values) for name, values in content.items()})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    """Compress *body* with the content coding *encoding* ('zstd', 'gzip' or None)."""
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def compressed_response(body: bytes, media_type: str, request: Request) -> Response:
+    """Return a response with *body*, compressed as preferred by the Accept-Encoding header of *request*."""
+    headers: dict[str, str] = {'Vary': 'Accept-Encoding'}
+    encoding: Optional[str] = None
+    if len(body) >= MIN_COMPRESS_SIZE:
+        encoding = negotiate_encoding(request.headers.get('accept-encoding'))
+    if encoding is not None:
+        body = compress(body, encoding)
+        headers['Content-Encoding'] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def negotiated_response(content: dict[str, list], request: Request) -> Response:
+    """
+    Return a response with the columns in *content* in the format preferred by the Accept header of *request* (JSON,
+    MessagePack or Arrow IPC stream), compressed as preferred by its Accept-Encoding header (zstd or gzip).
+    """
+    media_type: str = negotiate_media_type(request.headers.get('accept'))
+    response: Response = compressed_response(encode(content, media_type), media_type, request)
+    response.headers['Vary'] = 'Accept, Accept-Encoding'
+    return response
+
+
+def ndjson_lines(rows: Iterable[dict]) -> Iterator[bytes]:
+    """Yield each dictionary in *rows* as a JSON line as soon as it is available."""
+    for row in rows:
+        yield encode(row, MEDIA_TYPE_JSON) + b'\n'
+
+
+def ndjson_response(rows: Iterable[dict]) -> StreamingResponse:
+    """
+    Return a response that streams the dictionaries in *rows* as newline delimited JSON. The rows are only computed
+    while the client reads the response, so memory usage doesn't grow with the number of rows and the computation
+    stops when the client disconnects.
+    """
+    return StreamingResponse(ndjson_lines(rows), media_type=MEDIA_TYPE_NDJSON)
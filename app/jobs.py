@@ -0,0 +1,301 @@
+import math
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import closing, nullcontext
+from typing import Any, Optional, Union
+
+from app.admission import MemoryBudget, Reservation, is_alive
+from app.analysis import (estimate_memory, graph_png, layers_info, load_probes, probes_in_polygon, to_columns,
+                          zones_info)
+from app.encoding import MEDIA_TYPE_JSON, encode
+from app.validation import JobRequest
+
+DB_PATH: str = 'jobs.sqlite3'
+POLL_INTERVAL: float = 0.5  # seconds between looking for jobs queued by other processes
+PROGRESS_INTERVAL: float = 0.5  # minimum seconds between two progress updates of a job
+FINISHED: tuple[str, ...] = ('done', 'failed', 'cancelled')
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    result BLOB,
+    media_type TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    owner INTEGER,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+"""
+STATUS_COLUMNS: str = 'id, kind, status, progress, error, created, updated'
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when its cancellation has been requested."""
+
+
+class JobStore:
+    """
+    A persistent queue of analysis jobs in the SQLite database *db_path*, by default the path in the environment variable
+    CPT_JOBS_DB or DB_PATH. The database is created by *open*.
+
+    Every operation uses its own connection, so the store can be shared by the threads of the server, by several server
+    processes and by the worker processes that run the jobs. A job is 'queued', 'running', 'done', 'failed' or
+    'cancelled'.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self._db_path: str = db_path or os.environ.get('CPT_JOBS_DB') or DB_PATH
+
+    def open(self) -> None:
+        """Create the tables of the store in its database if they don't exist yet."""
+        with closing(self._connect()) as connection:
+            connection.executescript(SCHEMA)
+
+    @property
+    def db_path(self) -> str:
+        return self._db_path
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self._db_path, timeout=30, isolation_level=None)  # autocommit
+        connection.execute('PRAGMA journal_mode=WAL')  # readers don't block the writer
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _execute(self, sql: str, parameters: tuple = ()) -> list[sqlite3.Row]:
+        with closing(self._connect()) as connection:
+            return connection.execute(sql, parameters).fetchall()
+
+    def submit(self, request: JobRequest) -> str:
+        """Queue a job for *request* and return its id."""
+        job_id: str = uuid.uuid4().hex
+        now: float = time.time()
+        self._execute('INSERT INTO jobs (id, kind, params, status, created, updated) VALUES (?, ?, ?, ?, ?, ?)',
+                      (job_id, request.kind, request.model_dump_json(), 'queued', now, now))
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict[str, Any]]:
+        """Return the status of the job with id *job_id*, or None if there is no such job."""
+        rows: list[sqlite3.Row] = self._execute(f'SELECT {STATUS_COLUMNS} FROM jobs WHERE id = ?', (job_id,))
+        return dict(rows[0]) if rows else None
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> list[dict[str, Any]]:
+        """Return the status of the most recent jobs, optionally only those with *status*."""
+        if status is None:
+            rows = self._execute(f'SELECT {STATUS_COLUMNS} FROM jobs ORDER BY created DESC LIMIT ?', (limit,))
+        else:
+            rows = self._execute(f'SELECT {STATUS_COLUMNS} FROM jobs WHERE status = ? ORDER BY created DESC LIMIT ?',
+                                 (status, limit))
+        return [dict(row) for row in rows]
+
+    def request(self, job_id: str) -> JobRequest:
+        """Return the request of the job with id *job_id*."""
+        rows: list[sqlite3.Row] = self._execute('SELECT params FROM jobs WHERE id = ?', (job_id,))
+        return JobRequest.model_validate_json(rows[0]['params'])
+
+    def result(self, job_id: str) -> Optional[tuple[bytes, str]]:
+        """Return the result and its media type of the job with id *job_id* if it is done."""
+        rows: list[sqlite3.Row] = self._execute(
+            "SELECT result, media_type FROM jobs WHERE id = ? AND status = 'done'", (job_id,))
+        return (rows[0]['result'], rows[0]['media_type']) if rows else None
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel the job with id *job_id* and return its status afterwards, or None if there is no such job. A queued job
+        is cancelled at once. A running job stops at its next progress update.
+        """
+        now: float = time.time()
+        self._execute("UPDATE jobs SET status = 'cancelled', updated = ? WHERE id = ? AND status = 'queued'",
+                      (now, job_id))
+        self._execute("UPDATE jobs SET cancel_requested = 1, updated = ? WHERE id = ? AND status = 'running'",
+                      (now, job_id))
+        job: Optional[dict[str, Any]] = self.get(job_id)
+        return job['status'] if job is not None else None
+
+    def claim(self, max_running: int, owner: int) -> Optional[str]:
+        """
+        Mark the oldest queued job as running by process *owner* and return its id, unless *max_running* jobs are
+        already running in all processes together.
+        """
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')  # one process at a time claims a job
+            try:
+                (no_running,) = connection.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()
+                row: Optional[sqlite3.Row] = None
+                if no_running < max_running:
+                    row = connection.execute(
+                        "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+                if row is not None:
+                    connection.execute("UPDATE jobs SET status = 'running', owner = ?, updated = ? WHERE id = ?",
+                                       (owner, time.time(), row['id']))
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+        return row['id'] if row is not None else None
+
+    def report_progress(self, job_id: str, progress: float) -> bool:
+        """Store the *progress* (0 to 1) of a running job and return True if its cancellation has been requested."""
+        self._execute("UPDATE jobs SET progress = ?, updated = ? WHERE id = ? AND status = 'running'",
+                      (progress, time.time(), job_id))
+        rows: list[sqlite3.Row] = self._execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,))
+        return bool(rows and rows[0]['cancel_requested'])
+
+    def finish(self, job_id: str, status: str, result: Optional[bytes] = None, media_type: Optional[str] = None,
+               error: Optional[str] = None) -> None:
+        """Store the final *status* of a running job together with its result or error."""
+        self._execute("UPDATE jobs SET status = ?, progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END, "
+                      "result = ?, media_type = ?, error = ?, updated = ? WHERE id = ? AND status = 'running'",
+                      (status, status, result, media_type, error, time.time(), job_id))
+
+    def requeue(self, owner: Optional[int] = None) -> int:
+        """
+        Queue the running jobs of process *owner* again, or those of processes that no longer exist if *owner* is None,
+        e.g., after a restart of the server. Jobs of which the cancellation was requested are cancelled instead.
+        Return the number of queued jobs.
+        """
+        rows: list[sqlite3.Row] = self._execute("SELECT id, owner FROM jobs WHERE status = 'running'")
+        job_ids: list[str] = [row['id'] for row in rows
+                              if (row['owner'] == owner if owner is not None else not is_alive(row['owner']))]
+        for job_id in job_ids:
+            self._execute("UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'queued' END, "
+                          "progress = 0, owner = NULL, updated = ? WHERE id = ? AND status = 'running'",
+                          (time.time(), job_id))
+        return len(job_ids)
+
+
+def analyse(request: JobRequest, report: Callable[[float], None]) -> tuple[bytes, str]:
+    """
+    Run the analysis of *request* and return the result and its media type. The fraction of the work that has been done
+    is passed to *report* after each probe.
+    """
+    if request.kind == 'dov':
+        return probes_in_polygon(request.polygon).getvalue(), 'text/plain; charset=utf-8'
+
+    probes = load_probes(request.json_probes_file, request.selection)
+    if request.kind == 'graph':
+        for probe in probes:
+            return graph_png(probe, request.normalized, request.fast_rendering).getvalue(), 'image/png'
+        raise ValueError("No probe satisfies the selection criteria.")
+
+    rows: list[dict] = []
+    for counter, probe in enumerate(probes, start=1):
+        if request.kind == 'layers':
+            rows.append(layers_info(probe, request.zone_number))
+        else:
+            rows.append(zones_info(probe, request.normalized))
+        report(counter/len(probes))
+    return encode(to_columns(rows), MEDIA_TYPE_JSON), MEDIA_TYPE_JSON
+
+
+def reserve_memory(request: JobRequest) -> Union[Reservation, nullcontext]:
+    """
+    Wait until the estimated memory of *request* fits in the memory budget shared with the server and return its
+    reservation. A job waits as long as it takes, since it has been queued already. A dov job isn't analysed locally.
+    """
+    if request.kind == 'dov':
+        return nullcontext()
+    kind: str = 'fast graph' if request.kind == 'graph' and request.fast_rendering else request.kind
+    return MemoryBudget().reserve(kind, estimate_memory(request.json_probes_file, request.selection, kind),
+                                  max_wait=math.inf)
+
+
+def run_job(db_path: str, job_id: str) -> None:
+    """Run the job with id *job_id* from the store *db_path* in a worker process and store its outcome."""
+    store = JobStore(db_path)
+    last_report: list[float] = [0.0]
+
+    def report(progress: float) -> None:
+        now: float = time.monotonic()
+        if progress < 1 and now - last_report[0] < PROGRESS_INTERVAL:
+            return
+        last_report[0] = now
+        if store.report_progress(job_id, progress):
+            raise JobCancelled()
+
+    try:
+        report(0.0)
+        request: JobRequest = store.request(job_id)
+        with reserve_memory(request):
+            result, media_type = analyse(request, report)
+    except JobCancelled:
+        store.finish(job_id, 'cancelled')
+    except Exception as error:
+        store.finish(job_id, 'failed', error=f'{type(error).__name__}: {error}')
+    else:
+        store.finish(job_id, 'done', result, media_type)
+
+
+class JobRunner:
+    """
+    Run the jobs of *store* on a pool of *max_workers* worker processes, by default one per CPU core.
+
+    A dispatcher thread claims queued jobs as long as fewer than *max_workers* jobs are running, also counting the jobs
+    run by other server processes sharing the store, such that the throughput is bounded by the cores of the machine.
+    """
+
+    def __init__(self, store: JobStore, max_workers: Optional[int] = None):
+        self._store: JobStore = store
+        self._max_workers: int = max_workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._in_flight: int = 0
+
+    def _dispatch(self) -> None:
+        while not self._stopping.is_set():
+            while self._in_flight < self._max_workers and not self._stopping.is_set():
+                job_id: Optional[str] = self._store.claim(self._max_workers, os.getpid())
+                if job_id is None:
+                    break
+                with self._lock:
+                    self._in_flight += 1
+                future: Future = self._pool.submit(run_job, self._store.db_path, job_id)
+                future.add_done_callback(lambda future, job_id=job_id: self._on_done(job_id, future))
+            self._wakeup.wait(POLL_INTERVAL)
+            self._wakeup.clear()
+
+    def _on_done(self, job_id: str, future: Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        if not self._stopping.is_set() and not future.cancelled() and future.exception() is not None:
+            # the worker process died, e.g., out of memory
+            self._store.finish(job_id, 'failed', error=f'{type(future.exception()).__name__}: {future.exception()}')
+        self._wakeup.set()
+
+    def start(self) -> None:
+        """Queue the jobs that were interrupted by a previous shutdown again and start running jobs."""
+        self._store.requeue()
+        self._stopping.clear()
+        self._pool = ProcessPoolExecutor(max_workers=self._max_workers,
+                                         mp_context=multiprocessing.get_context('spawn'))
+        self._thread = threading.Thread(target=self._dispatch, name='job-dispatcher', daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        """Look for queued jobs at once, e.g., after a job has been submitted."""
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        """Stop the workers. The jobs they were running are queued again and resumed at the next start."""
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join()
+        processes: list = list((getattr(self._pool, '_processes', None) or {}).values())
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+        self._store.requeue(owner=os.getpid())
@@ -0,0 +1,401 @@
+import argparse
+import http.server
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from collections.abc import Callable
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import requests
+
+from cptlib.probetools.json_source import json_file_path, split_extension
+
+ENDPOINTS: tuple[str, ...] = ('upload', 'zones', 'layers', 'graph', 'dov')
+DEFAULT_MIX: str = 'upload=1,zones=4,layers=4,graph=2,dov=1'
+PERCENTILES: tuple[int, ...] = (50, 95, 99)
+SAMPLE_INTERVAL: float = 0.05  # seconds between two measurements of the memory of the server
+STARTUP_TIMEOUT: float = 60.0  # seconds to wait for the server to accept requests
+MAX_FEATURES: int = 10000  # probes returned by the fake WFS for one request
+POLYGON: dict = {
+    "xy_min": (107600, 171600),
+    "xy_max": (112100, 174200),
+    "vertices": ((107700, 173367), (110551, 173406), (111345, 174141), (112012, 173328), (112041, 171760),
+                 (107680, 171681))
+}
+
+# A request of the load test: the endpoint, the start and end time (s) and the status code (0 if it failed to complete)
+Sample = namedtuple('Sample', ['endpoint', 'start', 'end', 'status'])
+
+
+class FakeWFS(http.server.ThreadingHTTPServer):
+    """
+    A local stand-in for the WFS of the geoserver of Database Underground Flanders (DOV). A GetFeature request returns
+    *density* probes per km² at random but reproducible locations (for a given *seed* and BBOX) inside the requested
+    BBOX, after a delay of *latency* seconds that mimics the remote server.
+    """
+
+    def __init__(self, density: float = 50.0, latency: float = 0.0, seed: int = 0):
+        super().__init__(('127.0.0.1', 0), _WFSHandler)
+        self.daemon_threads = True
+        self.density: float = density
+        self.latency: float = latency
+        self.seed: int = seed
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}/geoserver'
+
+    def features(self, bbox: tuple[float, float, float, float]) -> bytes:
+        """Return the GetFeature response with the probes in *bbox* (x_min, y_min, x_max, y_max)."""
+        rng = np.random.default_rng([self.seed, *(int(abs(value)) for value in bbox)])
+        area: float = max(bbox[2] - bbox[0], 0.0)*max(bbox[3] - bbox[1], 0.0)/1e6  # km²
+        no_features: int = min(int(self.density*area), MAX_FEATURES)
+        xs = rng.uniform(bbox[0], bbox[2], no_features)
+        ys = rng.uniform(bbox[1], bbox[3], no_features)
+        members: list[str] = [
+            f'<gml:featureMember><dov-pub:Sonderingen><dov-pub:sondeernummer>GEO-LT/{k:05d}-S1'
+            f'</dov-pub:sondeernummer><dov-pub:X_mL72>{x:.2f}</dov-pub:X_mL72><dov-pub:Y_mL72>{y:.2f}'
+            '</dov-pub:Y_mL72></dov-pub:Sonderingen></gml:featureMember>'
+            for k, (x, y) in enumerate(zip(xs.tolist(), ys.tolist()))
+        ]
+        return ('<?xml version="1.0" encoding="UTF-8"?><wfs:FeatureCollection xmlns:wfs="http://www.opengis.net/wfs" '
+                'xmlns:gml="http://www.opengis.net/gml" xmlns:dov-pub="http://dov.vlaanderen.be/ocdov/dov-pub">'
+                + ''.join(members) + '</wfs:FeatureCollection>').encode('utf-8')
+
+
+class _WFSHandler(http.server.BaseHTTPRequestHandler):
+    server: FakeWFS
+
+    def do_GET(self) -> None:
+        query: dict[str, list[str]] = parse_qs(urlparse(self.path).query)
+        try:
+            bbox = tuple(float(value) for value in query['BBOX'][0].split(',')[:4])
+        except (KeyError, ValueError):
+            self.send_error(400, "A GetFeature request requires a BBOX.")
+            return
+
+        time.sleep(self.server.latency)
+        body: bytes = self.server.features(bbox)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002 (the signature of the base class)
+        pass
+
+
+class MemorySampler(threading.Thread):
+    """
+    Measure the resident set size (RSS) of the process with id *pid* together with all its descendants, e.g., the
+    workers of the server and of the job runner, every *interval* seconds. The RSS is read from /proc, so it is only
+    measured on Linux.
+    """
+
+    def __init__(self, pid: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self._pid: int = pid
+        self._interval: float = interval
+        self._stopped = threading.Event()
+        self.times: list[float] = []
+        self.rss: list[int] = []  # bytes
+
+    @staticmethod
+    def tree_rss(pid: int) -> Optional[int]:
+        """Return the total RSS (bytes) of the process with id *pid* and its descendants, None if unknown."""
+        children: dict[int, list[int]] = {}
+        try:
+            entries: list[str] = os.listdir('/proc')
+        except OSError:
+            return None
+        for entry in entries:
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as file:
+                    parent: int = int(file.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(parent, []).append(int(entry))
+
+        total: int = 0
+        stack: list[int] = [pid]
+        while stack:
+            process: int = stack.pop()
+            stack.extend(children.get(process, []))
+            try:
+                with open(f'/proc/{process}/status') as file:
+                    for line in file:
+                        if line.startswith('VmRSS:'):
+                            total += int(line.split()[1])*1024
+                            break
+            except OSError:
+                continue
+        return total
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            rss: Optional[int] = self.tree_rss(self._pid)
+            if rss is not None:
+                self.times.append(time.perf_counter())
+                self.rss.append(rss)
+            self._stopped.wait(self._interval)
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+    def peak(self, start: float, end: float) -> Optional[int]:
+        """Return the highest RSS measured from *start* to *end* (the nearest measurement if there is none)."""
+        if not self.times:
+            return None
+        first: int = int(np.searchsorted(self.times, start, side='left'))
+        last: int = int(np.searchsorted(self.times, end, side='right'))
+        if first >= last:  # shorter than the interval between two measurements
+            return self.rss[min(first, len(self.rss) - 1)]
+        return max(self.rss[first:last])
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """Return the weight of each endpoint in *mix*, e.g., 'zones=4,graph=1'. A ValueError is raised if it's invalid."""
+    weights: dict[str, float] = {}
+    for item in mix.split(','):
+        endpoint, _, weight = item.partition('=')
+        if endpoint.strip() not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{endpoint.strip()}' in the mix, choose from {', '.join(ENDPOINTS)}.")
+        weights[endpoint.strip()] = float(weight or 1)
+    if any(weight < 0 for weight in weights.values()) or not sum(weights.values()) > 0:
+        raise ValueError("The weights of the mix must be non-negative and not all zero.")
+    return weights
+
+
+def free_port() -> int:
+    """Return a TCP port on the local host that is free at the moment."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_app(port: int, workers: int, work_dir: str, dov_url: str, rate_limit: int) -> subprocess.Popen:
+    """
+    Start the app with uvicorn and *workers* worker processes on *port* in the working directory *work_dir*, such that
+    the uploaded files, the probe cache and the jobs of the load test are kept apart. The app retrieves the probe
+    locations from *dov_url* and allows *rate_limit* requests per minute per client.
+    """
+    root: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env: dict[str, str] = {**os.environ, 'DOV_GEOSERVER_URL': dov_url, 'CPT_RATE_LIMIT': str(rate_limit),
+                           'PYTHONPATH': os.pathsep.join(filter(None, (root, os.environ.get('PYTHONPATH'))))}
+    return subprocess.Popen([sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port',
+                             str(port), '--workers', str(workers), '--log-level', 'warning'],
+                            cwd=work_dir, env=env, stdout=subprocess.DEVNULL)
+
+
+def wait_until_ready(server: subprocess.Popen, base_url: str, timeout: float = STARTUP_TIMEOUT) -> None:
+    """Wait until the app at *base_url* answers. A RuntimeError is raised if it stopped or didn't start in time."""
+    deadline: float = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"The server stopped with exit code {server.returncode}.")
+        try:
+            if requests.get(base_url + '/', timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"The server didn't start within {timeout} s.")
+
+
+def stop_app(server: subprocess.Popen) -> None:
+    """Shut the server down gracefully, or kill it if it doesn't stop in time."""
+    if server.poll() is None:
+        server.send_signal(signal.SIGINT)
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+
+def endpoint_requests(base_url: str, upload_name: str, content: bytes, stem: str,
+                      fast_rendering: bool) -> dict[str, Callable[[requests.Session], requests.Response]]:
+    """
+    Return a function per endpoint that sends one request with *session*: the upload of *content* as *upload_name* and
+    the analyses of the uploaded file named *stem* (without the file extension).
+    """
+    return {
+        'upload': lambda session: session.post(base_url + '/probes/upload/',
+                                               files={'json_probes_file': (upload_name, content)}),
+        'zones': lambda session: session.get(f'{base_url}/probes/zones/{stem}'),
+        'layers': lambda session: session.get(f'{base_url}/probes/layers/{stem}'),
+        'graph': lambda session: session.get(f'{base_url}/probes/graph/{stem}',
+                                             params={'fast_rendering': str(fast_rendering).lower()}),
+        'dov': lambda session: session.post(base_url + '/probes/dov/', json=POLYGON),
+    }
+
+
+def replay(plan: list[str], senders: dict[str, Callable[[requests.Session], requests.Response]], concurrency: int,
+           duration: Optional[float]) -> list[Sample]:
+    """
+    Send the requests to the endpoints in *plan* in that order from *concurrency* clients at once, each with its own
+    connection, until the plan is finished or *duration* seconds have passed. Return the samples of the requests.
+    """
+    samples: list[Sample] = []
+    lock = threading.Lock()
+    position: list[int] = [0]
+    deadline: float = time.perf_counter() + duration if duration else float('inf')
+
+    def client() -> None:
+        with requests.Session() as session:
+            while time.perf_counter() < deadline:
+                with lock:
+                    if position[0] >= len(plan):
+                        return
+                    endpoint: str = plan[position[0]]
+                    position[0] += 1
+                start: float = time.perf_counter()
+                try:
+                    status: int = senders[endpoint](session).status_code
+                except requests.RequestException:
+                    status = 0
+                with lock:
+                    samples.append(Sample(endpoint, start, time.perf_counter(), status))
+
+    threads: list[threading.Thread] = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarize(samples: list[Sample], elapsed: float, sampler: Optional[MemorySampler]) -> dict[str, dict]:
+    """
+    Return the number of requests, errors, throughput (requests/s), latency percentiles (ms) of the successful requests
+    and the peak RSS (MB) of the server while the requests were running, per endpoint and for all requests together.
+    """
+    groups: dict[str, list[Sample]] = {endpoint: [sample for sample in samples if sample.endpoint == endpoint]
+                                       for endpoint in ENDPOINTS}
+    groups = {endpoint: group for endpoint, group in groups.items() if group}
+    groups['all'] = samples
+
+    report: dict[str, dict] = {}
+    for endpoint, group in groups.items():
+        latencies = np.array([1000*(sample.end - sample.start) for sample in group if 0 < sample.status < 400])
+        peaks: list[int] = [] if sampler is None else \
+            [peak for sample in group if (peak := sampler.peak(sample.start, sample.end)) is not None]
+        report[endpoint] = {
+            'requests': len(group),
+            'errors': len(group) - len(latencies),
+            'throughput': len(group)/elapsed if elapsed > 0 else 0.0,
+            **{f'p{q}': float(np.percentile(latencies, q)) if latencies.size else None for q in PERCENTILES},
+            'peak_rss_mb': max(peaks)/2**20 if peaks else None
+        }
+    return report
+
+
+def format_report(report: dict[str, dict]) -> str:
+    """Return *report* as a table."""
+    columns: list[str] = ['requests', 'errors', 'throughput'] + [f'p{q}' for q in PERCENTILES] + ['peak_rss_mb']
+    headers: list[str] = ['endpoint', 'requests', 'errors', 'req/s'] + [f'p{q} ms' for q in PERCENTILES] + \
+        ['peak RSS MB']
+    lines: list[str] = [''.join(f'{header:>12}' for header in headers)]
+    for endpoint, row in report.items():
+        cells: list[str] = [endpoint]
+        for column in columns:
+            value = row[column]
+            cells.append('-' if value is None else f'{value:.1f}' if isinstance(value, float) else str(value))
+        lines.append(''.join(f'{cell:>12}' for cell in cells))
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m app.load_test',
+        description="Start the app with uvicorn and replay a reproducible mix of uploads, zones, layers, graph and DOV "
+                    "requests from concurrent clients. The DOV geoserver is replaced by a local fake WFS. Report the "
+                    "throughput, the latency percentiles and the peak RSS of the server per endpoint.")
+    parser.add_argument('--input', default='input_files/opdracht1',
+                        help="the json file (without the extension, it may be compressed) that is uploaded and analysed")
+    parser.add_argument('--workers', type=int, default=1, help="the number of uvicorn worker processes")
+    parser.add_argument('--concurrency', type=int, default=8, help="the number of clients sending requests at once")
+    parser.add_argument('--requests', type=int, default=200, help="the number of requests in the mix")
+    parser.add_argument('--duration', type=float, help="stop sending requests after this number of seconds")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"the weight of each endpoint (default: {DEFAULT_MIX})")
+    parser.add_argument('--warmup', type=int, default=1,
+                        help="requests per endpoint sent before the measurements, e.g., to fill the probe cache")
+    parser.add_argument('--seed', type=int, default=0, help="the seed of the order of the requests and of the fake WFS")
+    parser.add_argument('--fast-rendering', action='store_true', help="request the graphs with fast rendering")
+    parser.add_argument('--wfs-density', type=float, default=50.0, help="probes per km² returned by the fake WFS")
+    parser.add_argument('--wfs-latency', type=float, default=0.1, help="the response time (s) of the fake WFS")
+    parser.add_argument('--rate-limit', type=int, default=1_000_000,
+                        help="the requests per minute per client allowed by the rate limiting middleware")
+    parser.add_argument('--output', help="also write the report as json to this file")
+    parser.add_argument('--keep', action='store_true', help="keep the working directory of the server")
+    arguments = parser.parse_args(argv)
+    if arguments.workers < 1 or arguments.concurrency < 1 or arguments.requests < 1 or arguments.warmup < 0:
+        parser.error("--workers, --concurrency and --requests must be positive and --warmup non-negative")
+    try:
+        weights: dict[str, float] = parse_mix(arguments.mix)
+        input_path: str = json_file_path(arguments.input)
+    except (ValueError, FileNotFoundError) as error:
+        parser.error(str(error))
+
+    with open(input_path, 'rb') as file:
+        content: bytes = file.read()
+    upload_name: str = os.path.basename(input_path)
+    rng = random.Random(arguments.seed)
+    plan: list[str] = rng.choices(list(weights), weights=list(weights.values()), k=arguments.requests)
+
+    wfs = FakeWFS(arguments.wfs_density, arguments.wfs_latency, arguments.seed)
+    threading.Thread(target=wfs.serve_forever, daemon=True).start()
+    work_dir: str = tempfile.mkdtemp(prefix='cpt-load-test-')
+    port: int = free_port()
+    base_url: str = f'http://127.0.0.1:{port}'
+    server: subprocess.Popen = start_app(port, arguments.workers, work_dir, wfs.url, arguments.rate_limit)
+    try:
+        wait_until_ready(server, base_url)
+        uploaded: dict = requests.post(base_url + '/probes/upload/',
+                                       files={'json_probes_file': (upload_name, content)}).json()
+        stem: str = split_extension(uploaded['file path'])[0]
+        senders = endpoint_requests(base_url, upload_name, content, stem, arguments.fast_rendering)
+        replay([endpoint for endpoint in weights for _ in range(arguments.warmup)], senders, 1, None)
+
+        sampler = MemorySampler(server.pid)
+        sampler.start()
+        start: float = time.perf_counter()
+        samples: list[Sample] = replay(plan, senders, arguments.concurrency, arguments.duration)
+        elapsed: float = time.perf_counter() - start
+        sampler.stop()
+    except (RuntimeError, requests.RequestException, KeyError, ValueError) as error:
+        print(f"The load test failed: {error}", file=sys.stderr)
+        return 1
+    finally:
+        stop_app(server)
+        wfs.shutdown()
+        if not arguments.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report: dict[str, dict] = summarize(samples, elapsed, sampler if sampler.times else None)
+    print(f"{len(samples)} requests in {elapsed:.1f} s with {arguments.concurrency} clients and "
+          f"{arguments.workers} worker(s)")
+    print(format_report(report))
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            json.dump({'settings': vars(arguments), 'elapsed': elapsed, 'endpoints': report}, file, indent=2)
+    return 1 if report['all']['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,39 +1,279 @@
+import asyncio
+import os
 from collections import defaultdict
-from fastapi import FastAPI, File, UploadFile, Path, Query, Body
-from fastapi.responses import HTMLResponse, StreamingResponse
+from collections.abc import Callable, Hashable, Iterable, Iterator
+from contextlib import asynccontextmanager
+from datetime import date
+from io import BytesIO
+import numpy as np
+from fastapi import Depends, FastAPI, File, HTTPException, Request, UploadFile, Path, Query, Body
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from fastapi.exceptions import RequestValidationError
 from pathlib import Path as Dir
-from typing import Union, Annotated
+from pydantic import ValidationError
+from typing import Literal, Optional, TypeVar, Union, Annotated
 
+from app.admission import AdmissionRejected, MemoryBudget, Reservation, resident_memory
+from app.analysis import (cross_section, estimate_memory, file_version, graph_png, layer_sweep_info, layers_info,
+                          load_probes, probe_cache, probes_in_polygon, sbt_chart_png, section_png, to_columns,
+                          zones_info)
+from app.encoding import (MEDIA_TYPE_COLUMNS, MEDIA_TYPE_NDJSON, compressed_response, encode_columns,
+                          ndjson_response, negotiate_media_type, negotiated_response, negotiated_responses,
+                          to_json_lists)
+from app.jobs import FINISHED, JobRunner, JobStore
 from app.rate_limit import RateLimitMiddleware
-from app.validation import Polygon
-from cptlib.layertools.layers_probe import Layer, LayersProbe
+from app.single_flight import SingleFlight
+from app.upload_store import UploadStore
+from app.validation import DepthQuery, JobRequest, Polygon, ProbeFilter, SectionLine
+from cptlib.layertools.layers_probe import LayersProbe
+from cptlib.layertools.uncertainty import ErrorModel, UncertainZones, UncertaintyPolicy, check_uncertainty
 from cptlib.layertools.zones_probe import ZonesProbe
-from cptlib.probetools.probe_list import ProbeList
-from cptlib.probetools.probe_location_list import ProbeLocationList
-from cptlib.setuptools.graph_set_up import GraphSetUp
+from cptlib.probetools.preprocessing import PreprocessingPolicy, check_preprocessing
+from cptlib.probetools.probe_list import Probe, ProbeList
+from cptlib.setuptools.measurement import UNITS, Measurement
+
+# The databases (CPT_JOBS_DB and CPT_ADMISSION_DB) are opened at the start of the server, not on import
+job_store = JobStore()
+job_runner = JobRunner(job_store)
+# The analyses of all the server and worker processes share a memory budget of CPT_MEMORY_BUDGET_MB
+memory_budget = MemoryBudget()
+# Concurrent identical analyses of a process share one computation
+single_flight = SingleFlight()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  job_store.open()
+  memory_budget.open()
+  job_runner.start()  # run the queued jobs, also those interrupted by the previous shutdown
+  yield
+  job_runner.stop()
 
 app = FastAPI(
   title="Cone Penetration Test Analyzer",
-  description="Analyses probe measurements to determine the soil behaviour type according to the Robertson method (2010)."
+  description="Analyses probe measurements to determine the soil behaviour type according to the Robertson method (2010).",
+  lifespan=lifespan
 )
 
+MAX_SWEEP_COMBINATIONS: int = 1000  # of a maximum cone resistance and a zone number in a layer sweep
+MAX_REALIZATIONS: int = 5000  # of a probe in a Monte Carlo classification
+
+T = TypeVar('T')
+
 INPUT_DIR = Dir('uploaded_files')
 INPUT_DIR.mkdir(parents=True, exist_ok=True)
+upload_store = UploadStore(INPUT_DIR)
 
-# Add rate limiting middleware to limit requests to 10 per minute
-app.add_middleware(RateLimitMiddleware, throttle_rate=10)
+# Add rate limiting middleware to limit requests to 10 per minute (or CPT_RATE_LIMIT, e.g., during a load test)
+app.add_middleware(RateLimitMiddleware, throttle_rate=int(os.environ.get('CPT_RATE_LIMIT', 10)))
 
 
-def to_wkt(vertices: tuple[tuple[int, int], ...]) -> str:
+def probe_filter(
+        probe: Annotated[
+          list[str],
+          Query(
+            title="Probe numbers",
+            description="The numbers of the probes to analyse."
+          )] = [],  # noqa: B006 (FastAPI copies the default)
+        bbox: Annotated[
+          Optional[str],
+          Query(
+            title="Bounding box",
+            description="The rectangle x_min,y_min,x_max,y_max containing the probes."
+          )] = None,
+        date_from: Annotated[
+          Optional[date],
+          Query(
+            title="Start date from",
+            description="The earliest start date (datum_aanvang) of the probes."
+          )] = None,
+        date_to: Annotated[
+          Optional[date],
+          Query(
+            title="Start date to",
+            description="The latest start date (datum_aanvang) of the probes."
+          )] = None,
+        method: Annotated[
+          Optional[str],
+          Query(
+            title="Probing method",
+            description="The probing method (sondeermethode) of the probes, e.g., 'continu elektrisch'."
+          )] = None,
+        offset: Annotated[
+          int,
+          Query(
+            title="Offset",
+            description="The number of selected probes to skip.",
+            ge=0
+          )] = 0,
+        limit: Annotated[
+          Optional[int],
+          Query(
+            title="Limit",
+            description="The maximum number of probes to analyse.",
+            ge=1
+          )] = None) -> ProbeFilter:
   """
-  Return a string representing the polygon formed by the tuple of vertices in **vertices** in WKT format.
+  Collect the query parameters that select the probes to analyse.
   """
-  wkt_fmt: str = "POLYGON (("
-  for vertex in vertices:
-    wkt_fmt = wkt_fmt + str(vertex[0]) + " " + str(vertex[1]) + ", "
+  try:
+    return ProbeFilter(probe=probe, bbox=bbox, date_from=date_from, date_to=date_to, method=method, offset=offset,
+                       limit=limit)
+  except ValidationError as error:
+    raise RequestValidationError(error.errors()) from error
 
-  wkt_fmt = wkt_fmt + str(vertices[0][0]) + " " + str(vertices[0][1]) + "))"
-  return wkt_fmt
+def preprocessing_policy(
+        fs_offset: Annotated[
+          float,
+          Query(
+            title="Friction sleeve offset",
+            description="The distance (m) between the cone tip and the centre of the friction sleeve. The friction is\
+                        shifted over this distance such that it is aligned with the cone resistance.",
+            ge=0
+          )] = 0.0,
+        spike_threshold: Annotated[
+          float,
+          Query(
+            title="Spike threshold",
+            description="Replace the values that deviate more than this number of (robust) standard deviations from\
+                        the median of their window by that median. 0 disables despiking.",
+            ge=0
+          )] = 0.0,
+        spike_window: Annotated[
+          int,
+          Query(
+            title="Spike window",
+            description="The odd number of consecutive measurements in the window of the despiking.",
+            ge=3
+          )] = 5,
+        smoothing: Annotated[
+          float,
+          Query(
+            title="Smoothing",
+            description="The width (m) of the depth window of the moving average of the cone resistance and the\
+                        friction. 0 disables smoothing.",
+            ge=0
+          )] = 0.0,
+        min_thickness: Annotated[
+          float,
+          Query(
+            title="Minimum thickness",
+            description="Merge the zones thinner than this thickness (m) into the thicker one of their neighbours.",
+            ge=0
+          )] = 0.0) -> PreprocessingPolicy:
+  """
+  Collect the query parameters that describe how the measurements are processed before they are classified.
+  """
+  policy = PreprocessingPolicy(fs_offset, spike_threshold, spike_window, smoothing, min_thickness)
+  try:
+    check_preprocessing(policy)
+  except ValueError as error:
+    raise HTTPException(status_code=422, detail=str(error)) from error
+  return policy
+
+def uncertainty_policy(
+        realizations: Annotated[
+          int,
+          Query(
+            title="Realizations",
+            description="The number of realizations of the probe that are classified.",
+            ge=1,
+            le=MAX_REALIZATIONS
+          )] = 1000,
+        qc_relative: Annotated[
+          float,
+          Query(
+            title="Relative error of qc",
+            description="The standard deviation of the error of the cone resistance relative to its value.",
+            ge=0
+          )] = 0.05,
+        qc_absolute: Annotated[
+          float,
+          Query(
+            title="Absolute error of qc",
+            description="The standard deviation (MPa) of the error of the cone resistance that doesn't depend on its\
+                        value.",
+            ge=0
+          )] = 0.0,
+        fs_relative: Annotated[
+          float,
+          Query(
+            title="Relative error of fs",
+            description="The standard deviation of the error of the friction relative to its value.",
+            ge=0
+          )] = 0.10,
+        fs_absolute: Annotated[
+          float,
+          Query(
+            title="Absolute error of fs",
+            description="The standard deviation (kPa) of the error of the friction that doesn't depend on its value.",
+            ge=0
+          )] = 0.0,
+        distribution: Annotated[
+          Literal['normal', 'lognormal'],
+          Query(
+            title="Distribution",
+            description="The distribution of the relative errors: normal or lognormal (which keeps the values\
+                        positive)."
+          )] = 'normal',
+        seed: Annotated[
+          int,
+          Query(
+            title="Seed",
+            description="The seed of the random number generator, such that a classification can be reproduced.",
+            ge=0
+          )] = 0) -> UncertaintyPolicy:
+  """
+  Collect the query parameters that describe the measurement errors of a Monte Carlo classification.
+  """
+  policy = UncertaintyPolicy(ErrorModel(qc_relative, qc_absolute, distribution),
+                             ErrorModel(fs_relative, fs_absolute, distribution), realizations, seed)
+  try:
+    check_uncertainty(policy)
+  except ValueError as error:
+    raise HTTPException(status_code=422, detail=str(error)) from error
+  return policy
+
+async def admit(json_probes_file: str, selection: ProbeFilter, kind: str) -> Reservation:
+  """
+  Wait until the estimated memory of a request of *kind* for the probes in **json_probes_file** that satisfy
+  *selection* fits in the memory budget and return its reservation. A request that can't be admitted is answered with
+  the status 503 Service Unavailable.
+  """
+  try:
+    return await memory_budget.admit(kind, estimate_memory(json_probes_file, selection, kind))
+  except AdmissionRejected as error:
+    headers: Optional[dict[str, str]] = None if error.retry_after is None else {"Retry-After": str(error.retry_after)}
+    raise HTTPException(status_code=503, detail=str(error), headers=headers) from error
+
+async def in_thread(function: Callable[[], T]) -> T:
+  """
+  Return the result of *function*, called in a worker thread such that the server keeps answering other requests. A
+  thread can't be interrupted, so if the caller is cancelled, the cancellation is raised once *function* has returned
+  and the memory reservation of the caller is held as long as *function* runs.
+  """
+  future: asyncio.Future = asyncio.ensure_future(run_in_threadpool(function))
+  try:
+    return await asyncio.shield(future)
+  except asyncio.CancelledError:
+    await asyncio.wait([future])
+    raise
+
+def flight_key(operation: str, json_probes_file: str, selection: ProbeFilter, *parameters: Hashable) -> tuple:
+  """
+  Return the key of the single flight of *operation* with *parameters* for the probes in **json_probes_file** that
+  satisfy *selection*. The key includes the version of the file, such that a replaced file is analysed anew.
+  """
+  return (operation, json_probes_file, file_version(json_probes_file), selection.model_dump_json(), *parameters)
+
+def released(rows: Iterable[dict], reservation: Reservation) -> Iterator[dict]:
+  """
+  Yield the *rows* of a streamed response and release *reservation* once the stream has ended or has been aborted.
+  """
+  try:
+    yield from rows
+  finally:
+    reservation.release()
 
 @app.get("/")
 def root() -> dict[str, str]:
@@ -44,9 +284,7 @@ async def remove_uploaded_files() -> dict[str, str]:
   """
   Remove all files that have been uploaded to the server.
   """
-  for file in INPUT_DIR.iterdir():
-    if file.is_file():
-      file.unlink()
+  upload_store.clear()
 
   return {"Message": "Alle uploaded files have been successfully removed."}
 
@@ -68,19 +306,23 @@ def upload_file() -> HTMLResponse:
     return HTMLResponse(content=content)
 
 @app.post('/probes/upload/')
-async def save_file(json_probes_file: UploadFile = File(...)) -> dict[str, str]:
+async def save_file(json_probes_file: UploadFile = File(...)) -> dict[str, Union[str, bool]]:
   """
-  Save the uploaded json file on the server.
+  Save the uploaded json file on the server. The content is stored once under its SHA-256 digest and the file name
+  refers to it. If identical content has been uploaded before, its parsed probes are reused.
+  The json file may be compressed with gzip (.json.gz) or zstd (.json.zst) or be a zip archive of json files (.zip). It
+  is stored as it is and decompressed while its records are read, so it is analysed by its name without the extension.
   """
-  file_path: Dir = INPUT_DIR / json_probes_file.filename
-  with open(file_path, 'wb') as buffer:
-    content = await json_probes_file.read()
-    buffer.write(content)
+  try:
+    file_path, digest, duplicate = await upload_store.save(json_probes_file)
+  except ValueError as error:
+    raise HTTPException(status_code=422, detail=str(error)) from error
 
-  return {"file path": str(file_path)}
+  return {"file path": str(file_path), "sha256": digest, "duplicate": duplicate}
 
-@app.get("/probes/layers/{json_probes_file:path}")
+@app.get("/probes/layers/{json_probes_file:path}", response_model=None, responses=negotiated_responses())
 async def info_layers(
+        request: Request,
         json_probes_file: Annotated[
           str,
           Path(
@@ -89,6 +331,7 @@ async def info_layers(
                         The extension .json should not be included."
           )
         ],
+        selection: Annotated[ProbeFilter, Depends(probe_filter)],
         zone_number: Annotated[
           int,
           Query(
@@ -96,35 +339,104 @@ async def info_layers(
             description="A number between 0 and 9 representing the soil type.",
             ge=0,
             le=9
-          )] = 0) -> dict[str, list[Union[str, int, float]]]:
+          )] = 0,
+        statistics: Annotated[
+          bool,
+          Query(
+            title="Statistics",
+            description="Add the mean, minimum and maximum of qc, fs and Rf in the thickest layer."
+          )] = False) -> Response:
   """
   Show the probe number, number of measurements, number of layers and the depth of the top and bottom from the thickest
   layer from each probe in **json_probes_file**.
   A layer is a vertical segment of the soil over which the cone resistance is smaller than 2.0 MPa.
   Optionally, the layer can be constrained to lay inside Zone **zone_number**.
+  Optionally, the statistics of the measurements in the thickest layer are added.
+  The probes can be selected by number, location, start date and probing method and paginated with **offset** and **limit**.
+
+  The response is encoded as JSON, MessagePack or Arrow IPC stream depending on the Accept header and compressed with
+  zstd or gzip depending on the Accept-Encoding header. With the Accept header application/x-ndjson, the result of each
+  probe is streamed as a JSON line as soon as the probe has been analysed.
+  """
+  with await admit(json_probes_file, selection, 'layers') as reservation:
+    probes = await in_thread(lambda: load_probes(json_probes_file, selection))
+    rows = (layers_info(probe, zone_number, statistics) for probe in probes)
+    if negotiate_media_type(request.headers.get('accept')) == MEDIA_TYPE_NDJSON:
+      return ndjson_response(released(rows, reservation.transfer()))
+
+    return negotiated_response(to_columns(rows), request)
+
+@app.get("/probes/layer-sweep/{json_probes_file:path}", response_model=None, responses=negotiated_responses())
+async def sweep_layers(
+        request: Request,
+        json_probes_file: Annotated[
+          str,
+          Path(
+            title="JSON probes file",
+            description="A JSON file containing probes from Database Underground Flanders (DOV).\
+                        The extension .json should not be included."
+          )
+        ],
+        selection: Annotated[ProbeFilter, Depends(probe_filter)],
+        qc_from: Annotated[
+          float,
+          Query(
+            title="Smallest maximum cone resistance",
+            description="The first maximum cone resistance (MPa) of the layers in the sweep.",
+            gt=0
+          )] = 1.0,
+        qc_to: Annotated[
+          float,
+          Query(
+            title="Largest maximum cone resistance",
+            description="The last maximum cone resistance (MPa) of the layers in the sweep.",
+            gt=0
+          )] = 4.0,
+        qc_step: Annotated[
+          float,
+          Query(
+            title="Step of the maximum cone resistance",
+            description="The step (MPa) between two maximum cone resistances in the sweep.",
+            gt=0
+          )] = 0.5,
+        zone_number: Annotated[
+          list[int],
+          Query(
+            title="Zone numbers",
+            description="The numbers between 0 and 9 of the soil types of the layers in the sweep, 0 if the layers\
+                        aren't constrained to a zone."
+          )] = [0]) -> Response:  # noqa: B006 (FastAPI copies the default)
   """
-  probes = ProbeList(json_file_name=json_probes_file)  # list all the probes in the file
-  probe_info: dict[str, list[Union[str, int, float]]] = defaultdict(list)
+  Show for each combination of a maximum cone resistance from **qc_from** to **qc_to** in steps of **qc_step** and a
+  zone number in **zone_number** the number of layers and the depth of the top and bottom from the thickest layer from
+  each probe in **json_probes_file**, as the layers endpoint shows them for a single combination.
+  All the combinations of a probe are determined in a single pass over its measurements.
+  The probes can be selected by number, location, start date and probing method and paginated with **offset** and **limit**.
 
-  for probe in probes:
-    layers = LayersProbe(probe, zone_number) # find the clay layers in the probe
-    probe_info["probe number"].append(probe.number)
-    probe_info["# measurements"].append(len(probe.measurements))
-    probe_info["# layers"].append(len(layers))
-    probe_info["Soil behaviour type"].append(ZonesProbe.SBT(zone_number))
+  The response is encoded as JSON, MessagePack or Arrow IPC stream depending on the Accept header and compressed with
+  zstd or gzip depending on the Accept-Encoding header. With the Accept header application/x-ndjson, the results of
+  each probe are streamed as JSON lines as soon as the probe has been analysed.
+  """
+  if qc_to < qc_from:
+    raise HTTPException(status_code=422, detail="'qc_to' must not be smaller than 'qc_from'.")
+  if any(number < 0 or number > 9 for number in zone_number):
+    raise HTTPException(status_code=422, detail="The zone numbers must lay between 0 and 9.")
+  qc_maxima: np.ndarray = np.round(np.arange(qc_from, qc_to + 0.5*qc_step, qc_step), 6)
+  if len(qc_maxima)*len(set(zone_number)) > MAX_SWEEP_COMBINATIONS:
+    raise HTTPException(status_code=422, detail=f"The sweep is limited to {MAX_SWEEP_COMBINATIONS} combinations.")
 
-    if layers:
-      thickest_layer: Layer = max(layers) # find thickest clay layer
-      probe_info["top TL"].append(thickest_layer.top)
-      probe_info["bottom TL"].append(thickest_layer.bottom)
-    else:
-      probe_info["top TL"].append("/")
-      probe_info["bottom TL"].append("/")
+  zone_numbers: list[int] = list(dict.fromkeys(zone_number))  # without duplicates, in the given order
+  with await admit(json_probes_file, selection, 'layer sweep') as reservation:
+    probes = await in_thread(lambda: load_probes(json_probes_file, selection))
+    rows = (row for probe in probes for row in layer_sweep_info(probe, qc_maxima.tolist(), zone_numbers))
+    if negotiate_media_type(request.headers.get('accept')) == MEDIA_TYPE_NDJSON:
+      return ndjson_response(released(rows, reservation.transfer()))
 
-  return probe_info
+    return negotiated_response(to_columns(rows), request)
 
-@app.get("/probes/zones/{json_probes_file:path}")
+@app.get("/probes/zones/{json_probes_file:path}", response_model=None, responses=negotiated_responses())
 async def info_zones(
+        request: Request,
         json_probes_file: Annotated[
           str,
           Path(
@@ -132,22 +444,48 @@ async def info_zones(
             description="A JSON file containing probes from Database Underground Flanders (DOV).\
                         The extension .json should not be included."
           )
-        ]) -> dict[str, list[Union[str, int, float, set[str]]]]:
+        ],
+        selection: Annotated[ProbeFilter, Depends(probe_filter)],
+        normalized: Annotated[
+          bool,
+          Query(
+            title="Normalized",
+            description="Classify the measurements with the normalized Soil Behaviour Type Index (Robertson, 2009)."
+          )] = False,
+        statistics: Annotated[
+          bool,
+          Query(
+            title="Statistics",
+            description="Add the mean, minimum and maximum of qc, fs and Rf in each zone, together with its top, bottom and zone number."
+          )] = False,
+        preprocessing: Annotated[PreprocessingPolicy, Depends(preprocessing_policy)] = PreprocessingPolicy()
+        ) -> Response:
   """
   Show the probe number, number of measurements, number of zones and the soil behaviour types from each probe in **json_probes_file**.
   A zone is a vertical segment of the soil belonging to the same soil behaviour type.
+  Optionally, the zones are determined with the normalized cone resistance and friction ratio.
+  Optionally, the measurements are aligned, despiked and smoothed before the classification and thin zones are merged.
+  Optionally, the statistics of the measurements in each zone are added.
+  The probes can be selected by number, location, start date and probing method and paginated with **offset** and **limit**.
+
+  The response is encoded as JSON, MessagePack or Arrow IPC stream depending on the Accept header and compressed with
+  zstd or gzip depending on the Accept-Encoding header. With the Accept header application/x-ndjson, the result of each
+  probe is streamed as a JSON line as soon as the probe has been analysed. Otherwise, concurrent identical requests
+  share a single analysis.
   """
-  probes = ProbeList(json_file_name=json_probes_file)  # list all the probes in the file
-  probe_info: dict[str, list[Union[str, int, float, set[str]]]] = defaultdict(list)
+  if negotiate_media_type(request.headers.get('accept')) == MEDIA_TYPE_NDJSON:
+    with await admit(json_probes_file, selection, 'zones') as reservation:
+      probes = await in_thread(lambda: load_probes(json_probes_file, selection))
+      rows = (zones_info(probe, normalized, preprocessing, statistics) for probe in probes)
+      return ndjson_response(released(rows, reservation.transfer()))
 
-  for probe in probes:
-    zones = ZonesProbe(probe) # find the zone layers in the probe
-    probe_info["probe number"].append(probe.number)
-    probe_info["# measurements"].append(len(probe.measurements))
-    probe_info["# zones"].append(len(zones))
-    probe_info["Soil behaviour types (SBTs)"].append(zones.get_SBTs())
+  async def analyse() -> dict[str, list]:
+    with await admit(json_probes_file, selection, 'zones'):
+      return await in_thread(lambda: to_columns(zones_info(probe, normalized, preprocessing, statistics)
+                                                for probe in load_probes(json_probes_file, selection)))
 
-  return probe_info
+  key: tuple = flight_key('zones', json_probes_file, selection, normalized, statistics, preprocessing)
+  return negotiated_response(await single_flight.run(key, analyse), request)
 
 @app.get("/probes/graph/{json_probes_file:path}")
 async def graph_probes(
@@ -158,22 +496,316 @@ async def graph_probes(
             description="A JSON file containing probes from Database Underground Flanders (DOV).\
                         The extension .json should not be included."
           )
-        ]) -> StreamingResponse:
+        ],
+        selection: Annotated[ProbeFilter, Depends(probe_filter)],
+        normalized: Annotated[
+          bool,
+          Query(
+            title="Normalized",
+            description="Classify the measurements with the normalized Soil Behaviour Type Index (Robertson, 2009)."
+          )] = False,
+        fast_rendering: Annotated[
+          bool,
+          Query(
+            title="Fast rendering",
+            description="Only draw the points of the curves that are visible at the resolution of the graph and draw\
+                        the zones as one collection per soil behaviour type."
+          )] = False,
+        preprocessing: Annotated[PreprocessingPolicy, Depends(preprocessing_policy)] = PreprocessingPolicy()
+        ) -> StreamingResponse:
   """
   Show a graph displaying all the soil types, the cone resistance and the friction ratio versus the depth (m) based on
   the probe in **json_probes_file**.
+  Optionally, the graph is rendered faster for probes with many measurements.
+  Optionally, the measurements are aligned, despiked and smoothed before the classification and thin zones are merged.
+  The graph shows the first probe that satisfies the selection criteria. Concurrent identical requests share a single
+  rendering.
   """
-  probes = ProbeList(json_file_name=json_probes_file)  # list all the probes in the file
-  for probe in probes:
-    zones = ZonesProbe(probe)  # find the zone layers in the probe
+  def render() -> Optional[bytes]:
+    for probe in load_probes(json_probes_file, selection):
+      return graph_png(probe, normalized, fast_rendering, preprocessing).getvalue()
+    return None
 
-    # Combine data from several objects into one graph
-    graph = GraphSetUp(file_name=f"probe_{probe.number}", indep_variable='depth',
-                       title=probe.number, legend_font_size='xx-small')
-    probe.visualize(graph, ('qc', ''), (ZonesProbe.friction_ratio, 'Rf', '%', 'red'))
-    zones.visualize(graph)
+  async def analyse() -> Optional[bytes]:
+    with await admit(json_probes_file, selection, 'fast graph' if fast_rendering else 'graph'):
+      return await in_thread(render)
 
-    return StreamingResponse(graph.save(bytesio=True), media_type="image/png")
+  key: tuple = flight_key('graph', json_probes_file, selection, normalized, fast_rendering, preprocessing)
+  image: Optional[bytes] = await single_flight.run(key, analyse)
+  if image is None:
+    raise HTTPException(status_code=404, detail="No probe satisfies the selection criteria.")
+  return StreamingResponse(BytesIO(image), media_type="image/png")
+
+@app.get("/probes/plot-data/{json_probes_file:path}")
+async def plot_data_probe(
+        request: Request,
+        json_probes_file: Annotated[
+          str,
+          Path(
+            title="JSON probes file",
+            description="A JSON file containing probes from Database Underground Flanders (DOV).\
+                        The extension .json should not be included."
+          )
+        ],
+        probe_number: Annotated[
+          Optional[str],
+          Query(
+            title="Probe number",
+            description="The number of the probe. The first probe in the file is used if not provided."
+          )] = None,
+        normalized: Annotated[
+          bool,
+          Query(
+            title="Normalized",
+            description="Classify the measurements with the normalized Soil Behaviour Type Index (Robertson, 2009)."
+          )] = False,
+        fmt: Annotated[
+          Literal['binary', 'json'],
+          Query(
+            alias="format",
+            title="Format",
+            description="The binary columnar format or JSON."
+          )] = 'binary',
+        preprocessing: Annotated[PreprocessingPolicy, Depends(preprocessing_policy)] = PreprocessingPolicy()
+        ) -> Response:
+  """
+  Show the data behind the graph of the probe in **json_probes_file**: the depth (m), the cone resistance (MPa), the
+  friction ratio (%) and the top, bottom and zone number of each zone, such that the graph can be rendered by the client.
+  The columns are encoded in a compact binary columnar format (see app.encoding) or, optionally, as JSON lists.
+  """
+  with await admit(json_probes_file, ProbeFilter(probe=[] if probe_number is None else [probe_number]),
+                   'plot-data'):
+    probes = ProbeList(json_file_name=json_probes_file, cache=probe_cache) if probe_number is None else \
+      ProbeList(json_file_name=json_probes_file, probe_numbers=[probe_number], cache=probe_cache)
+    try:
+      probe = probes[probe_number if probe_number is not None else 0]
+    except (KeyError, IndexError) as error:
+      raise HTTPException(status_code=404, detail=str(error).strip("'")) from error
+
+    zones = ZonesProbe(probe, normalized, preprocessing)  # find the zone layers in the probe
+    depth, qc, fs = probe.columns()
+    with np.errstate(divide='ignore', invalid='ignore'):
+      Rf = ZonesProbe.friction_ratio(Measurement(depth, qc, fs))
+    zone_top, zone_bottom, zone_number = zones.columns()
+
+    columns: dict[str, np.ndarray] = {
+      "depth": depth,
+      "qc": qc,
+      "Rf": np.where(np.isfinite(Rf), Rf, np.nan),
+      "zone top": zone_top,
+      "zone bottom": zone_bottom,
+      "zone number": zone_number
+    }
+    metadata: dict = {"probe number": probe.number, "units": {**UNITS, "Rf": "%"},
+                      "SBT": [ZonesProbe.SBT(k) for k in range(0, 10)]}
+
+    if fmt == 'json':
+      return JSONResponse(content={**metadata, **to_json_lists(columns)})
+
+    # Single precision is more than sufficient for plotting
+    compact_columns: dict[str, np.ndarray] = {
+      name: column.astype(np.int8 if name == "zone number" else np.float32) for name, column in columns.items()
+    }
+    return compressed_response(encode_columns(compact_columns, metadata), MEDIA_TYPE_COLUMNS, request)
+
+@app.get("/probes/uncertainty/{json_probes_file:path}")
+async def uncertainty_probe(
+        request: Request,
+        json_probes_file: Annotated[
+          str,
+          Path(
+            title="JSON probes file",
+            description="A JSON file containing probes from Database Underground Flanders (DOV).\
+                        The extension .json should not be included."
+          )
+        ],
+        probe_number: Annotated[
+          Optional[str],
+          Query(
+            title="Probe number",
+            description="The number of the probe. The first probe in the file is used if not provided."
+          )] = None,
+        fmt: Annotated[
+          Literal['binary', 'json'],
+          Query(
+            alias="format",
+            title="Format",
+            description="The binary columnar format or JSON."
+          )] = 'binary',
+        policy: Annotated[UncertaintyPolicy, Depends(uncertainty_policy)] = UncertaintyPolicy()) -> Response:
+  """
+  Show the soil behaviour types of the probe in **json_probes_file** under measurement uncertainty: the cone resistance
+  and the friction are perturbed **realizations** times according to their relative and absolute errors and each
+  realization is classified. The response holds the probability of each measurement to belong to each zone
+  ("P zone 0" to "P zone 9"), the most likely zone number of each measurement and its probability, and the top, bottom,
+  zone number and mean probability of the zones of the most likely zonation.
+  The columns are encoded in a compact binary columnar format (see app.encoding) or, optionally, as JSON lists.
+  """
+  def select() -> Probe:
+    probes = ProbeList(json_file_name=json_probes_file, cache=probe_cache) if probe_number is None else \
+      ProbeList(json_file_name=json_probes_file, probe_numbers=[probe_number], cache=probe_cache)
+    return probes[probe_number if probe_number is not None else 0]
+
+  def classify(probe: Probe) -> dict[str, np.ndarray]:
+    zones = UncertainZones(probe, policy)
+    most_likely, probability = zones.most_likely()
+    zone_top, zone_bottom, zone_number = zones.columns()
+    return {
+      "depth": zones.depth,
+      "most likely zone": most_likely,
+      "probability": probability,
+      **{f"P zone {k}": zones.probabilities[:, k] for k in range(0, 10)},
+      "zone top": zone_top,
+      "zone bottom": zone_bottom,
+      "zone number": zone_number,
+      "zone probability": zones.zone_probabilities()
+    }
+
+  with await admit(json_probes_file, ProbeFilter(probe=[] if probe_number is None else [probe_number]),
+                   'uncertainty'):
+    try:
+      probe: Probe = await in_thread(select)
+    except (KeyError, IndexError) as error:
+      raise HTTPException(status_code=404, detail=str(error).strip("'")) from error
+
+    columns: dict[str, np.ndarray] = await in_thread(lambda: classify(probe))  # in batches of realizations
+    metadata: dict = {"probe number": probe.number, "realizations": policy.realizations, "seed": policy.seed,
+                      "units": {"depth": UNITS["depth"], "zone top": "m", "zone bottom": "m"},
+                      "SBT": [ZonesProbe.SBT(k) for k in range(0, 10)]}
+
+    if fmt == 'json':
+      return JSONResponse(content={**metadata, **to_json_lists(columns)})
+
+    # Single precision is more than sufficient for probabilities
+    compact_columns: dict[str, np.ndarray] = {
+      name: column.astype(np.int8 if name in ("most likely zone", "zone number") else np.float32)
+      for name, column in columns.items()
+    }
+    return compressed_response(encode_columns(compact_columns, metadata), MEDIA_TYPE_COLUMNS, request)
+
+@app.get("/probes/chart/{json_probes_file:path}")
+async def sbt_chart(
+        json_probes_file: Annotated[
+          str,
+          Path(
+            title="JSON probes file",
+            description="A JSON file containing probes from Database Underground Flanders (DOV).\
+                        The extension .json should not be included."
+          )
+        ],
+        selection: Annotated[ProbeFilter, Depends(probe_filter)]) -> StreamingResponse:
+  """
+  Show the Robertson chart of the soil behaviour types with the density of the measurements of the probes in
+  **json_probes_file**: the friction ratio (%) versus the cone resistance normalized by the atmospheric pressure, both
+  on a logarithmic scale, with the boundaries of the zones. The measurements are counted in bins, so the time to
+  render the chart doesn't depend on their number.
+  The probes can be selected by number, location, start date and probing method and paginated with **offset** and **limit**.
+  """
+  with await admit(json_probes_file, selection, 'chart'):
+    image = await in_thread(lambda: sbt_chart_png(load_probes(json_probes_file, selection),
+                                                  Dir(json_probes_file).name))
+    if image is None:
+      raise HTTPException(status_code=404, detail="No valid measurement of the selected probes lays on the chart.")
+
+    return StreamingResponse(image, media_type="image/png")
+
+@app.post("/probes/depth/{json_probes_file:path}")
+async def query_depths(
+        json_probes_file: Annotated[
+          str,
+          Path(
+            title="JSON probes file",
+            description="A JSON file containing probes from Database Underground Flanders (DOV).\
+                        The extension .json should not be included."
+          )
+        ],
+        queries: Annotated[
+          list[DepthQuery],
+          Body(
+            title="Depth queries",
+            description="A list of queries, each consisting of a probe number and either a depth or a depth range."
+          )],
+        zone_number: Annotated[
+          int,
+          Query(
+            title="Zone number",
+            description="A number between 0 and 9 representing the soil type of the layers.",
+            ge=0,
+            le=9
+          )] = 0) -> list[dict[str, list[dict[str, Union[str, int, float]]]]]:
+  """
+  Show for each query in **queries** the zones and the layers of its probe that contain the depth or overlap the depth range.
+  A layer is a vertical segment of the soil over which the cone resistance is smaller than 2.0 MPa.
+  Optionally, the layer can be constrained to lay inside Zone **zone_number**.
+  The zones and layers of each probe are determined once and indexed such that each query is answered by a binary search.
+  """
+  queries_per_probe: dict[str, list[int]] = defaultdict(list)
+  for counter, query in enumerate(queries):
+    queries_per_probe[query.probe].append(counter)
+  with await admit(json_probes_file, ProbeFilter(probe=list(queries_per_probe)), 'depth'):
+    probes = ProbeList(json_file_name=json_probes_file, probe_numbers=queries_per_probe.keys(), cache=probe_cache)
+
+    answers: list[dict[str, list[dict[str, Union[str, int, float]]]]] = [{} for _ in queries]
+    for number, counters in queries_per_probe.items():
+      try:
+        probe = probes[number]
+      except KeyError as error:
+        raise HTTPException(status_code=404, detail=str(error).strip("'")) from error
+
+      tops = np.array([queries[c].top if queries[c].depth is None else queries[c].depth for c in counters])
+      bottoms = np.array([queries[c].bottom if queries[c].depth is None else queries[c].depth for c in counters])
+      zones_index = ZonesProbe(probe).interval_index()
+      layers_index = LayersProbe(probe, zone_number).interval_index()
+      zone_starts, zone_stops = zones_index.overlapping_slices(tops, bottoms)
+      layer_starts, layer_stops = layers_index.overlapping_slices(tops, bottoms)
+
+      for k, counter in enumerate(counters):
+        answers[counter] = {
+          "zones": [{"zone number": zone.number, "SBT": ZonesProbe.SBT(zone.number), "top": zone.top,
+                     "bottom": zone.bottom} for zone in zones_index[zone_starts[k]:zone_stops[k]]],
+          "layers": [{"top": layer.top, "bottom": layer.bottom}
+                     for layer in layers_index[layer_starts[k]:layer_stops[k]]]
+        }
+
+    return answers
+
+@app.post("/probes/section/{json_probes_file:path}")
+async def section_probes(
+        json_probes_file: Annotated[
+          str,
+          Path(
+            title="JSON probes file",
+            description="A JSON file containing probes from Database Underground Flanders (DOV).\
+                        The extension .json should not be included."
+          )
+        ],
+        line: Annotated[
+          SectionLine,
+          Body(
+            title="Section line",
+            description="The vertices (x, y) of the section line and the maximum distance (m) of the probes to it."
+          )],
+        normalized: Annotated[
+          bool,
+          Query(
+            title="Normalized",
+            description="Classify the measurements with the normalized Soil Behaviour Type Index (Robertson, 2009)."
+          )] = False,
+        preprocessing: Annotated[PreprocessingPolicy, Depends(preprocessing_policy)] = PreprocessingPolicy()
+        ) -> StreamingResponse:
+  """
+  Show a stratigraphic cross-section along the polyline in **line** through the probes in **json_probes_file** that lay
+  within its maximum offset. The zones of neighbouring probes with the same soil behaviour type are connected by
+  interpolating their boundaries, the other zones pinch out halfway between the probes. The vertical axis is the
+  elevation (mTAW) if it is known for all probes, otherwise the depth below the surface.
+  """
+  with await admit(json_probes_file, ProbeFilter(), 'section'):
+    section = await in_thread(lambda: cross_section(json_probes_file, line, normalized, preprocessing))
+    if not len(section):
+      raise HTTPException(status_code=404, detail="No probe lays within the maximum offset of the section line.")
+
+    image: BytesIO = await in_thread(lambda: section_png(section, Dir(json_probes_file).name))
+    return StreamingResponse(image, media_type="image/png")
 
 @app.post("/probes/dov/")
 async def retrieve_probes_in_polygon(
@@ -186,14 +818,114 @@ async def retrieve_probes_in_polygon(
   """
   Retrieve all probes from the geoserver of Database Underground Flanders (DOV) that are located in the area confined by **poly**.
   """
-  probe_locations = ProbeLocationList(poly.xy_min, poly.xy_max)
-  poly_wkt: str = to_wkt(poly.vertices)
-
-  return StreamingResponse(probe_locations.in_polygon(wkt_fmt=poly_wkt, bytesio=True),
+  return StreamingResponse(probes_in_polygon(poly),
                            media_type="text/plain; charset=utf-8"
                            # for downloading: headers={"Content-Disposition": f"attachment; filename={file_name}.txt"}
                            )
 
+@app.post("/jobs/", status_code=202)
+def submit_job(
+        job: Annotated[
+          JobRequest,
+          Body(
+            title="Job",
+            description="The analysis to run in the background: zones, layers, graph or dov."
+          )]) -> dict[str, str]:
+  """
+  Queue the analysis in **job** and return the id of the job. The zones, layers or graph of the probes in a JSON probes
+  file are determined as by the corresponding endpoints, the probes are selected with **selection**. A dov job retrieves
+  the probes in **polygon**. The jobs are run by a pool of worker processes, one per CPU core, and survive a restart of
+  the server.
+  """
+  job_id: str = job_store.submit(job)
+  job_runner.wake()
+  return {"id": job_id, "status": "queued"}
+
+@app.get("/jobs/")
+def list_jobs(
+        status: Annotated[
+          Optional[Literal['queued', 'running', 'done', 'failed', 'cancelled']],
+          Query(
+            title="Status",
+            description="Only show the jobs with this status."
+          )] = None) -> list[dict[str, Union[str, float, None]]]:
+  """
+  Show the id, kind, status and progress of the most recent jobs.
+  """
+  return job_store.list(status)
+
+@app.get("/jobs/{job_id}")
+def job_status(
+        job_id: Annotated[
+          str,
+          Path(
+            title="Job id",
+            description="The id returned when the job was submitted."
+          )]) -> dict[str, Union[str, float, None]]:
+  """
+  Show the status (queued, running, done, failed or cancelled) and progress (0 to 1) of job **job_id**. The reason of a
+  failure is shown under error.
+  """
+  job: Optional[dict] = job_store.get(job_id)
+  if job is None:
+    raise HTTPException(status_code=404, detail=f"There is no job with id {job_id}.")
+
+  return job
+
+@app.get("/jobs/{job_id}/result")
+def job_result(
+        request: Request,
+        job_id: Annotated[
+          str,
+          Path(
+            title="Job id",
+            description="The id returned when the job was submitted."
+          )]) -> Response:
+  """
+  Return the result of job **job_id** once it is done: the columns of a zones or layers job as JSON, the graph of a
+  graph job as png image and the probe numbers of a dov job as text.
+  """
+  job: Optional[dict] = job_store.get(job_id)
+  if job is None:
+    raise HTTPException(status_code=404, detail=f"There is no job with id {job_id}.")
+  if job["status"] != "done":
+    raise HTTPException(status_code=409, detail=f"Job {job_id} is {job['status']}, it has no result.")
+
+  result, media_type = job_store.result(job_id)
+  if media_type == "image/png":  # already compressed
+    return Response(content=result, media_type=media_type)
+
+  return compressed_response(result, media_type, request)
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(
+        job_id: Annotated[
+          str,
+          Path(
+            title="Job id",
+            description="The id returned when the job was submitted."
+          )]) -> dict[str, str]:
+  """
+  Cancel job **job_id**. A queued job is cancelled at once, a running job after the probe it is analysing.
+  """
+  status: Optional[str] = job_store.cancel(job_id)
+  if status is None:
+    raise HTTPException(status_code=404, detail=f"There is no job with id {job_id}.")
+  if status in FINISHED and status != "cancelled":
+    raise HTTPException(status_code=409, detail=f"Job {job_id} is already {status}.")
+
+  return {"id": job_id, "status": status}
+
+@app.get("/diagnostics/memory")
+def memory_usage() -> dict[str, Union[int, float, None, list]]:
+  """
+  Show the memory budget of the analyses, the estimated memory in use by the requests in flight and waited for by the
+  queued requests, the peak usage and the number of admitted and rejected requests of all the processes together (MB),
+  the requests in flight and in the queue and the resident memory of this server process.
+  """
+  rss: Optional[int] = resident_memory()
+  return {**memory_budget.usage(), "process": os.getpid(), "process RSS MB": None if rss is None else round(rss/2**20, 1)}
+
 @app.get("/SBT/")
 async def info_sbt() -> dict[int, str]:
   """
@@ -0,0 +1,72 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class Flight:
+    """A computation in flight and the number of callers that wait for its result."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task: asyncio.Task = task
+        self.callers: int = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical computations within a process: a call of `run` with the key of a computation that is
+    still in flight attaches to it instead of starting its own, and all its callers receive the same result or the same
+    exception. A key is forgotten as soon as its computation has finished, so results are never cached.
+
+    The computation runs in a task of its own, such that a caller that is cancelled (e.g. because its client has
+    disconnected) doesn't cancel it for the other callers. The computation is only cancelled once all its callers have
+    been cancelled, and it is forgotten at that moment, such that a later call never attaches to it.
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, Flight] = {}
+        self._coalesced: int = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def _forget(self, key: Hashable, flight: Flight) -> None:
+        """Forget the computation of *flight*, such that a next call with *key* starts a computation of its own."""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _land(self, key: Hashable, flight: Flight, task: asyncio.Task) -> None:
+        """Forget the computation of *flight* once its *task* has finished."""
+        self._forget(key, flight)
+        if not task.cancelled():
+            task.exception()  # retrieved, also if all callers have been cancelled
+
+    @property
+    def coalesced(self) -> int:
+        """Return the number of calls that attached to a computation in flight."""
+        return self._coalesced
+
+    async def run(self, key: Hashable, function: Callable[[], Awaitable[T]]) -> T:
+        """
+        Return the result of the computation in flight with *key* or, if there is none, of the awaitable returned by
+        *function*. The exception of the computation is raised in all its callers.
+        """
+        flight: Optional[Flight] = self._flights.get(key)
+        if flight is None:
+            flight = Flight(asyncio.ensure_future(function()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._land(key, flight, task))
+        else:
+            self._coalesced += 1
+
+        flight.callers += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.callers -= 1
+            if flight.callers == 0 and not flight.task.done():  # all callers have been cancelled
+                # the task may take a while to finish (e.g. a worker thread can't be interrupted), so a next call
+                # mustn't attach to it
+                self._forget(key, flight)
+                flight.task.cancel()
@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+from app import analysis, main
+from cptlib.probetools.probe_cache import ProbeCache
+
+
+@pytest.fixture(scope='session', autouse=True)
+def probe_cache(tmp_path_factory: pytest.TempPathFactory):
+    """Publish the probes of the tests in a temporary probe cache instead of the one of the server."""
+    cache_dir: str = str(tmp_path_factory.mktemp('probe_cache'))
+    cache = ProbeCache(cache_dir)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('CPT_PROBE_CACHE', cache_dir)  # inherited by the worker processes of the jobs
+        patch.setattr(analysis, 'probe_cache', cache)
+        patch.setattr(main, 'probe_cache', cache)
+        yield cache
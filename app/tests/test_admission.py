@@ -0,0 +1,108 @@
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import closing
+from unittest import IsolatedAsyncioTestCase, mock
+
+from fastapi import HTTPException
+
+from app import main
+from app.admission import MB, AdmissionRejected, MemoryBudget, process_start
+
+
+class TestMemoryBudget(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._db_path: str = os.path.join(self._dir.name, 'admission.sqlite3')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _budget(self, budget: int = 100*MB, max_wait: float = 5.0) -> MemoryBudget:
+        budget = MemoryBudget(budget, db_path=self._db_path, max_wait=max_wait)
+        budget.open()
+        return budget
+
+    def _insert(self, owner: int, started) -> None:
+        with closing(sqlite3.connect(self._db_path, isolation_level=None)) as connection:
+            connection.execute("INSERT INTO reservations (id, kind, cost, status, owner, created, started) "
+                               "VALUES (?, 'zones', ?, 'admitted', ?, ?, ?)",
+                               (f'{owner}-{started}', 90*MB, owner, time.time(), started))
+
+    async def test_over_budget(self):
+        budget = self._budget()
+        with self.assertRaises(AdmissionRejected) as context:
+            await budget.admit('graph', 101*MB)
+
+        self.assertIsNone(context.exception.retry_after)
+        self.assertEqual(budget.usage()["# rejected"], 1)
+
+    async def test_first_in_first_out(self):
+        budget = self._budget()
+        order: list[str] = []
+
+        async def request(name: str, cost: int) -> None:
+            with await budget.admit(name, cost):
+                order.append(name)
+                await asyncio.sleep(0.3)
+
+        first = asyncio.ensure_future(request('first', 60*MB))
+        await asyncio.sleep(0.1)
+        large = asyncio.ensure_future(request('large', 60*MB))
+        await asyncio.sleep(0.1)
+        small = asyncio.ensure_future(request('small', 10*MB))  # fits next to the first one, but waits its turn
+        await asyncio.sleep(0.1)
+        self.assertEqual(budget.usage()["# queued"], 2)
+
+        await asyncio.gather(first, large, small)
+        self.assertListEqual(order, ['first', 'large', 'small'])
+        self.assertEqual(budget.usage()["peak MB"], 70)
+
+    async def test_queue_timeout(self):
+        budget = self._budget(max_wait=0.3)
+        with await budget.admit('zones', 80*MB):
+            with self.assertRaises(AdmissionRejected) as context:
+                await budget.admit('zones', 30*MB)
+        self.assertEqual(context.exception.retry_after, 1)
+        self.assertEqual(budget.usage()["# queued"], 0)
+
+        with await budget.admit('zones', 80*MB), mock.patch.object(main, 'memory_budget', budget), \
+                mock.patch.object(main, 'estimate_memory', return_value=30*MB):
+            with self.assertRaises(HTTPException) as http_context:
+                await main.admit('probes', main.ProbeFilter(), 'zones')
+        self.assertEqual(http_context.exception.status_code, 503)
+        self.assertEqual(http_context.exception.headers, {"Retry-After": "1"})
+
+    async def test_release_and_transfer(self):
+        budget = self._budget()
+        reservation = await budget.admit('layers', 40*MB)
+        streamed = reservation.transfer()
+        reservation.release()  # released by the stream instead
+        self.assertEqual(budget.usage()["in use MB"], 40)
+
+        streamed.release()
+        streamed.release()
+        self.assertEqual(budget.usage()["in use MB"], 0)
+
+        with budget.reserve('layers', 100*MB) as whole:
+            self.assertEqual(whole.cost, 100*MB)
+        self.assertEqual(budget.usage()["# in flight"], 0)
+
+    async def test_dead_owners(self):
+        budget = self._budget()
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        self._insert(process.pid, None)  # ended
+        started = process_start(os.getpid())
+        if started is not None:
+            self._insert(os.getpid(), started + 1)  # an earlier process with the same id
+        self.assertEqual(budget.usage()["# in flight"], 0)  # not counted
+
+        with await budget.admit('zones', 90*MB):  # the reservations are released by the next request
+            with closing(sqlite3.connect(self._db_path)) as connection:
+                (no_reservations,) = connection.execute('SELECT COUNT(*) FROM reservations').fetchone()
+            self.assertEqual(no_reservations, 1)
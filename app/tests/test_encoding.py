@@ -0,0 +1,200 @@
+import gzip
+import json
+import os
+import shutil
+import struct
+import tempfile
+from unittest import TestCase, mock, skipIf
+
+import numpy as np
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app import encoding, main
+from app.admission import MemoryBudget
+from app.encoding import (ALIGNMENT, MAGIC, MEDIA_TYPE_ARROW, MEDIA_TYPE_COLUMNS, MEDIA_TYPE_JSON, MEDIA_TYPE_MSGPACK,
+                          MEDIA_TYPE_NDJSON, MIN_COMPRESS_SIZE, compressed_response, decode_columns, encode,
+                          encode_columns, ndjson_lines, negotiate_encoding, negotiate_media_type)
+
+INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe.json'
+
+
+class TestColumns(TestCase):
+    def test_round_trip(self):
+        columns: dict[str, np.ndarray] = {
+            'depth': np.array([0.1, 0.2, np.nan], dtype=np.float32),
+            'zone number': np.array([1, 2, 3, 4, 5], dtype=np.int8),  # not a multiple of the alignment
+            'qc': np.linspace(0, 1, 7),
+            'empty': np.array([], dtype=np.float32)
+        }
+        content: bytes = encode_columns(columns, {'probe number': 'S1', 'units': {'depth': 'm'}})
+
+        decoded, metadata = decode_columns(content)
+        self.assertDictEqual(metadata, {'probe number': 'S1', 'units': {'depth': 'm'}})
+        self.assertListEqual(list(decoded), list(columns))
+        for name, column in columns.items():
+            self.assertEqual(decoded[name].dtype, column.dtype)
+            np.testing.assert_array_equal(decoded[name], column)
+
+    def test_alignment(self):
+        content: bytes = encode_columns({'a': np.arange(3, dtype=np.int8), 'b': np.arange(3, dtype=np.float64)},
+                                        {'name': 'odd'})
+
+        (header_length,) = struct.unpack_from('<I', content, len(MAGIC))
+        data_start: int = len(MAGIC) + 4 + header_length
+        header: dict = json.loads(content[len(MAGIC) + 4:data_start])
+        self.assertEqual(data_start % ALIGNMENT, 0)
+        for column in header['columns']:
+            self.assertEqual((data_start + column['offset']) % ALIGNMENT, 0)
+        self.assertEqual(len(content) % ALIGNMENT, 0)
+        columns, _ = decode_columns(content)
+        self.assertTrue(columns['b'].flags.aligned)
+        np.testing.assert_array_equal(columns['b'], [0.0, 1.0, 2.0])
+
+    def test_not_encoded(self):
+        with self.assertRaises(ValueError):
+            decode_columns(b'{"depth": []}')
+
+
+def request(accept_encoding: str) -> Request:
+    return Request({'type': 'http', 'headers': [(b'accept-encoding', accept_encoding.encode())]})
+
+
+class TestNegotiation(TestCase):
+    CONTENT: dict[str, list] = {'probe number': ['S1', 'S2'], 'top TL': [1.5, '/'], 'SBTs': [{'Sands', 'Clays'}, set()]}
+
+    def test_media_type(self):
+        self.assertEqual(negotiate_media_type(None), MEDIA_TYPE_JSON)
+        self.assertEqual(negotiate_media_type('text/html, */*;q=0.8'), MEDIA_TYPE_JSON)
+        self.assertEqual(negotiate_media_type('image/png'), MEDIA_TYPE_JSON)  # the fallback
+        self.assertEqual(negotiate_media_type('application/jsonl'), MEDIA_TYPE_NDJSON)
+        self.assertEqual(negotiate_media_type(f'{MEDIA_TYPE_NDJSON};q=0, application/json'), MEDIA_TYPE_JSON)
+
+    @skipIf(encoding.msgpack is None or encoding.pa is None, "msgpack or pyarrow is not installed")
+    def test_binary_media_type(self):
+        self.assertEqual(negotiate_media_type('application/x-msgpack'), MEDIA_TYPE_MSGPACK)
+        self.assertEqual(negotiate_media_type(f'application/json;q=0.5, {MEDIA_TYPE_ARROW}, {MEDIA_TYPE_MSGPACK}'),
+                         MEDIA_TYPE_ARROW)  # the first of the highest quality
+
+    def test_encoding(self):
+        preferred: str = 'zstd' if encoding.zstandard is not None else 'gzip'
+        self.assertIsNone(negotiate_encoding(None))
+        self.assertIsNone(negotiate_encoding('br, identity'))
+        self.assertEqual(negotiate_encoding('gzip, deflate, br, zstd'), 'gzip')
+        self.assertEqual(negotiate_encoding('gzip;q=0.5, zstd'), preferred)
+        self.assertEqual(negotiate_encoding('*'), preferred)
+        self.assertIsNone(negotiate_encoding('gzip;q=0'))
+
+    def test_compressed_response(self):
+        body: bytes = b'[' + b'1.0,'*MIN_COMPRESS_SIZE + b'1.0]'
+        response = compressed_response(body, MEDIA_TYPE_JSON, request('gzip'))
+        self.assertEqual(response.headers['content-encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.body), body)
+
+        response = compressed_response(b'[1.0]', MEDIA_TYPE_JSON, request('gzip'))  # too small to compress
+        self.assertNotIn('content-encoding', response.headers)
+        self.assertEqual(response.body, b'[1.0]')
+
+    @skipIf(encoding.zstandard is None, "zstandard is not installed")
+    def test_zstd(self):
+        body: bytes = b'[' + b'1.0,'*MIN_COMPRESS_SIZE + b'1.0]'
+        response = compressed_response(body, MEDIA_TYPE_JSON, request('gzip;q=0.9, zstd'))
+        self.assertEqual(response.headers['content-encoding'], 'zstd')
+        self.assertEqual(encoding.zstandard.ZstdDecompressor().decompress(response.body), body)
+
+    def test_encode_json(self):
+        expected: dict = {'probe number': ['S1', 'S2'], 'top TL': [1.5, '/'], 'SBTs': [['Clays', 'Sands'], []]}
+        self.assertDictEqual(json.loads(encode(self.CONTENT, MEDIA_TYPE_JSON)), expected)
+        with mock.patch.object(encoding, 'orjson', None):  # the standard library fallback
+            self.assertDictEqual(json.loads(encode(self.CONTENT, MEDIA_TYPE_JSON)), expected)
+
+    @skipIf(encoding.msgpack is None, "msgpack is not installed")
+    def test_encode_msgpack(self):
+        self.assertDictEqual(encoding.msgpack.unpackb(encode(self.CONTENT, MEDIA_TYPE_MSGPACK)),
+                             {'probe number': ['S1', 'S2'], 'top TL': [1.5, '/'], 'SBTs': [['Clays', 'Sands'], []]})
+
+    @skipIf(encoding.pa is None, "pyarrow is not installed")
+    def test_encode_arrow(self):
+        table = encoding.pa.ipc.open_stream(encode(self.CONTENT, MEDIA_TYPE_ARROW)).read_all()
+        self.assertDictEqual(table.to_pydict(),
+                             {'probe number': ['S1', 'S2'], 'top TL': [1.5, None], 'SBTs': [['Clays', 'Sands'], []]})
+
+    def test_ndjson_lines(self):
+        computed: list[int] = []
+
+        def rows():
+            for number in range(3):
+                computed.append(number)
+                yield {'probe number': f'S{number}', 'SBTs': {'Sands'}}
+
+        lines = ndjson_lines(rows())
+        self.assertDictEqual(json.loads(next(lines)), {'probe number': 'S0', 'SBTs': ['Sands']})
+        self.assertListEqual(computed, [0])  # computed while the lines are read
+        self.assertListEqual([json.loads(line)['probe number'] for line in lines], ['S1', 'S2'])
+
+
+class TestEndpoints(TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._probes_file: str = os.path.join(self._dir.name, 'probes')
+        shutil.copy(INPUT_FILE, self._probes_file + '.json')  # the index of the probes is written next to them
+        budget = MemoryBudget(db_path=os.path.join(self._dir.name, 'admission.sqlite3'))
+        budget.open()
+        patch = mock.patch.object(main, 'memory_budget', budget)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self._client = TestClient(main.app, client=(self.id(), 50000))  # rate limited per test, without running jobs
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_plot_data(self):
+        response = self._client.get(f'/probes/plot-data/{self._probes_file}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['content-type'], MEDIA_TYPE_COLUMNS)
+        columns, metadata = decode_columns(response.content)
+        self.assertListEqual(list(columns), ['depth', 'qc', 'Rf', 'zone top', 'zone bottom', 'zone number'])
+        self.assertEqual(columns['depth'].dtype, np.float32)
+        self.assertEqual(columns['zone number'].dtype, np.int8)
+        self.assertEqual(len(columns['zone top']), len(columns['zone number']))
+        self.assertEqual(len(metadata['SBT']), 10)
+
+        content: dict = self._client.get(f'/probes/plot-data/{self._probes_file}', params={'format': 'json'}).json()
+        self.assertEqual(content['probe number'], metadata['probe number'])
+        np.testing.assert_allclose(np.array(content['depth'], dtype=float), columns['depth'], rtol=1e-6)
+        self.assertListEqual(content['zone number'], columns['zone number'].tolist())
+
+    def test_formats(self):
+        expected: dict = self._client.get(f'/probes/zones/{self._probes_file}').json()
+        self.assertListEqual(expected['probe number'], ['2000912_S1', '2000912_S2'])
+
+        if encoding.msgpack is not None:
+            response = self._client.get(f'/probes/zones/{self._probes_file}', headers={'Accept': MEDIA_TYPE_MSGPACK})
+            self.assertEqual(response.headers['content-type'], MEDIA_TYPE_MSGPACK)
+            self.assertDictEqual(encoding.msgpack.unpackb(response.content), expected)
+        if encoding.pa is not None:
+            response = self._client.get(f'/probes/layers/{self._probes_file}', headers={'Accept': MEDIA_TYPE_ARROW})
+            self.assertEqual(response.headers['content-type'], MEDIA_TYPE_ARROW)
+            table = encoding.pa.ipc.open_stream(response.content).read_all()
+            self.assertListEqual(table.column_names[:3], ['probe number', '# measurements', '# layers'])
+            self.assertEqual(table.num_rows, 2)
+
+    def test_compression(self):
+        response = self._client.get(f'/probes/zones/{self._probes_file}', params={'statistics': True},
+                                    headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['content-encoding'], 'gzip')
+        self.assertEqual(response.headers['vary'], 'Accept, Accept-Encoding')
+        self.assertListEqual(response.json()['probe number'], ['2000912_S1', '2000912_S2'])  # decompressed
+
+    def test_ndjson(self):
+        expected: dict = self._client.get(f'/probes/zones/{self._probes_file}').json()
+        response = self._client.get(f'/probes/zones/{self._probes_file}', headers={'Accept': MEDIA_TYPE_NDJSON})
+        self.assertEqual(response.headers['content-type'], MEDIA_TYPE_NDJSON)
+        rows: list[dict] = [json.loads(line) for line in response.text.splitlines()]
+        self.assertDictEqual({name: [row[name] for row in rows] for name in expected}, expected)
+
+        with self._client.stream('GET', f'/probes/layers/{self._probes_file}',
+                                 headers={'Accept': 'application/jsonl'}) as response:
+            line: str = next(response.iter_lines())  # stop reading after the first probe
+        self.assertEqual(json.loads(line)['probe number'], '2000912_S1')
+        self.assertEqual(main.memory_budget.usage()["# in flight"], 0)  # released by the stream
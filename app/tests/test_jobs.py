@@ -0,0 +1,156 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from unittest import TestCase, mock
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.admission import MemoryBudget
+from app.jobs import JobRunner, JobStore, run_job
+from app.validation import JobRequest
+
+INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe.json'
+
+
+class TestJobs(TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._probes_file: str = os.path.join(self._dir.name, 'probes')
+        shutil.copy(INPUT_FILE, self._probes_file + '.json')  # the index of the probes is written next to them
+        self._store = JobStore(os.path.join(self._dir.name, 'jobs.sqlite3'))
+        self._store.open()
+        self._admission_db: str = os.path.join(self._dir.name, 'admission.sqlite3')
+        MemoryBudget(db_path=self._admission_db).open()
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _request(self, kind: str = 'zones') -> JobRequest:
+        return JobRequest(kind=kind, json_probes_file=self._probes_file)
+
+    def _wait(self, job_id: str, timeout: float = 60.0) -> str:
+        """Return the status of the job with id *job_id* once it has finished."""
+        deadline: float = time.monotonic() + timeout
+        while self._store.get(job_id)['status'] in ('queued', 'running') and time.monotonic() < deadline:
+            time.sleep(0.1)
+        return self._store.get(job_id)['status']
+
+    def test_store(self):
+        job_id: str = self._store.submit(self._request('layers'))
+        self.assertEqual(self._store.get(job_id)['status'], 'queued')
+        self.assertEqual(self._store.request(job_id), self._request('layers'))
+        self.assertIsNone(self._store.get('unknown'))
+
+        self.assertIsNone(self._store.claim(0, os.getpid()))  # no worker available
+        self.assertEqual(self._store.claim(1, os.getpid()), job_id)
+        self.assertIsNone(self._store.claim(1, os.getpid()))  # already running
+        self.assertFalse(self._store.report_progress(job_id, 0.5))
+        self.assertEqual(self._store.get(job_id)['progress'], 0.5)
+        self.assertIsNone(self._store.result(job_id))
+
+        self._store.finish(job_id, 'done', b'{}', 'application/json')
+        self.assertEqual(self._store.get(job_id)['progress'], 1)
+        self.assertTupleEqual(self._store.result(job_id), (b'{}', 'application/json'))
+        self.assertEqual([job['id'] for job in self._store.list('done')], [job_id])
+        self.assertListEqual(self._store.list('queued'), [])
+
+    def test_cancel(self):
+        queued: str = self._store.submit(self._request())
+        running: str = self._store.submit(self._request())
+        self.assertEqual(self._store.claim(1, os.getpid()), queued)
+        self.assertEqual(self._store.cancel(running), 'cancelled')  # at once
+
+        self.assertEqual(self._store.cancel(queued), 'running')  # at the next progress update
+        self.assertTrue(self._store.report_progress(queued, 0.5))
+        self.assertIsNone(self._store.cancel('unknown'))
+
+        run_job(self._store.db_path, queued)
+        self.assertEqual(self._store.get(queued)['status'], 'cancelled')
+
+    def test_requeue(self):
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        first: str = self._store.submit(self._request())
+        second: str = self._store.submit(self._request())
+        own: str = self._store.submit(self._request())
+        for job_id, owner in [(first, process.pid), (second, process.pid), (own, os.getpid())]:
+            self.assertEqual(self._store.claim(3, owner), job_id)
+        self._store.cancel(second)
+
+        self.assertEqual(self._store.requeue(), 2)  # of the process that has ended
+        self.assertEqual(self._store.get(first)['status'], 'queued')
+        self.assertEqual(self._store.get(second)['status'], 'cancelled')
+        self.assertEqual(self._store.get(own)['status'], 'running')
+
+        self.assertEqual(self._store.requeue(owner=os.getpid()), 1)
+        self.assertEqual(self._store.get(own)['status'], 'queued')
+
+    def test_run_job(self):
+        job_id: str = self._store.submit(self._request())
+        self._store.claim(1, os.getpid())
+        with mock.patch.dict(os.environ, {'CPT_ADMISSION_DB': self._admission_db}):
+            run_job(self._store.db_path, job_id)
+
+        self.assertEqual(self._store.get(job_id)['status'], 'done')
+        result, media_type = self._store.result(job_id)
+        self.assertEqual(media_type, 'application/json')
+        self.assertEqual(len(json.loads(result)['probe number']), 2)
+
+        failing: str = self._store.submit(JobRequest(kind='zones', json_probes_file=self._probes_file + '_missing'))
+        self._store.claim(1, os.getpid())
+        with mock.patch.dict(os.environ, {'CPT_ADMISSION_DB': self._admission_db}):
+            run_job(self._store.db_path, failing)
+        self.assertEqual(self._store.get(failing)['status'], 'failed')
+        self.assertIsNotNone(self._store.get(failing)['error'])
+
+    def test_runner(self):
+        job_id: str = self._store.submit(self._request())
+        runner = JobRunner(self._store, max_workers=1)
+        with mock.patch.dict(os.environ, {'CPT_ADMISSION_DB': self._admission_db}):  # inherited by the workers
+            runner.start()
+            try:
+                self.assertEqual(self._wait(job_id), 'done')
+            finally:
+                runner.stop()
+
+    def _client(self) -> ExitStack:
+        """Return the context in which the app runs the jobs of the store of the test."""
+        stack = ExitStack()
+        stack.enter_context(mock.patch.dict(os.environ, {'CPT_ADMISSION_DB': self._admission_db}))
+        stack.enter_context(mock.patch.object(main, 'job_store', self._store))
+        stack.enter_context(mock.patch.object(main, 'job_runner', JobRunner(self._store, max_workers=1)))
+        stack.enter_context(mock.patch.object(main, 'memory_budget', MemoryBudget(db_path=self._admission_db)))
+        return stack
+
+    def test_endpoints(self):
+        with self._client(), TestClient(main.app, client=(self.id(), 50000)) as client:  # rate limited per test
+            response = client.post('/jobs/', json={'kind': 'zones', 'json_probes_file': self._probes_file})
+            self.assertEqual(response.status_code, 202)
+            job_id: str = response.json()['id']
+            self.assertEqual(client.post('/jobs/', json={'kind': 'zones'}).status_code, 422)
+
+            self.assertEqual(self._wait(job_id), 'done')
+            self.assertEqual(client.get(f'/jobs/{job_id}').json()['status'], 'done')
+            self.assertEqual([job['id'] for job in client.get('/jobs/', params={'status': 'done'}).json()], [job_id])
+            response = client.get(f'/jobs/{job_id}/result')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['probe number']), 2)
+            self.assertEqual(client.delete(f'/jobs/{job_id}').status_code, 409)  # already done
+
+    def test_endpoints_cancel(self):
+        with self._client(), TestClient(main.app, client=(self.id(), 50000)) as client:  # rate limited per test
+            response = client.post('/jobs/', json={'kind': 'zones', 'json_probes_file': self._probes_file})
+            job_id: str = response.json()['id']
+            self.assertIn(client.delete(f'/jobs/{job_id}').json()['status'], ['cancelled', 'running'])
+            self.assertEqual(self._wait(job_id), 'cancelled')
+            self.assertEqual(client.get(f'/jobs/{job_id}/result').status_code, 409)
+
+            for path in ['/jobs/unknown', '/jobs/unknown/result']:
+                self.assertEqual(client.get(path).status_code, 404)
+            self.assertEqual(client.delete('/jobs/unknown').status_code, 404)
@@ -0,0 +1,76 @@
+import threading
+from unittest import TestCase, mock
+
+from app.load_test import FakeWFS, MemorySampler, Sample, format_report, parse_mix, summarize
+from cptlib.probetools import probe_location_list
+from cptlib.probetools.probe_location_list import ProbeLocationList
+
+BBOX: tuple[float, float, float, float] = (107600.0, 171600.0, 112100.0, 174200.0)
+
+
+class TestLoadTest(TestCase):
+    def test_parse_mix(self):
+        self.assertDictEqual(parse_mix('zones=4, graph=0.5,dov'), {'zones': 4.0, 'graph': 0.5, 'dov': 1.0})
+        for mix in ['zones=4,chart=1', 'zones=-1,graph=2', 'zones=0', 'zones=many']:
+            with self.assertRaises(ValueError):
+                parse_mix(mix)
+
+    def test_summarize(self):
+        samples: list[Sample] = [Sample('zones', 0.0, 0.1, 200), Sample('zones', 0.0, 0.3, 200),
+                                 Sample('zones', 0.1, 0.2, 503), Sample('graph', 0.2, 0.4, 0)]
+        sampler = MemorySampler(0)
+        sampler.times, sampler.rss = [0.05, 0.15, 0.35], [100*2**20, 300*2**20, 200*2**20]
+
+        report: dict[str, dict] = summarize(samples, 2.0, sampler)
+
+        self.assertListEqual(list(report), ['zones', 'graph', 'all'])
+        self.assertEqual(report['zones']['requests'], 3)
+        self.assertEqual(report['zones']['errors'], 1)
+        self.assertAlmostEqual(report['zones']['throughput'], 1.5)
+        self.assertAlmostEqual(report['zones']['p50'], 200.0)
+        self.assertEqual(report['zones']['peak_rss_mb'], 300.0)
+        self.assertIsNone(report['graph']['p95'])  # without successful requests
+        self.assertEqual(report['all']['requests'], 4)
+        self.assertIsNone(summarize(samples, 2.0, None)['all']['peak_rss_mb'])
+
+        lines: list[str] = format_report(report).splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertListEqual(lines[1].split(), ['zones', '3', '1', '1.5', '200.0', '290.0', '298.0', '300.0'])
+        self.assertListEqual(lines[2].split(), ['graph', '1', '1', '0.5', '-', '-', '-', '200.0'])
+
+    def test_peak(self):
+        sampler = MemorySampler(0)
+        self.assertIsNone(sampler.peak(0.0, 1.0))
+
+        sampler.times, sampler.rss = [1.0, 2.0, 3.0], [10, 30, 20]
+        self.assertEqual(sampler.peak(0.5, 3.5), 30)
+        self.assertEqual(sampler.peak(2.5, 3.0), 20)
+        self.assertEqual(sampler.peak(1.2, 1.8), 30)  # between two measurements: the next one
+        self.assertEqual(sampler.peak(4.0, 5.0), 20)  # after the last measurement
+
+    def test_features(self):
+        wfs = FakeWFS(density=10.0, seed=1)
+        try:
+            features: bytes = wfs.features(BBOX)
+            self.assertEqual(features.count(b'<gml:featureMember>'), 117)  # 10 probes per km² in 11.7 km²
+            self.assertEqual(wfs.features(BBOX), features)  # reproducible
+            self.assertNotEqual(wfs.features((*BBOX[:2], BBOX[2] + 1.0, BBOX[3])), features)
+            self.assertNotIn(b'<gml:featureMember>', wfs.features((0.0, 0.0, 0.0, 0.0)))
+        finally:
+            wfs.server_close()
+
+    def test_probe_location_list(self):
+        wfs = FakeWFS(density=10.0)
+        thread = threading.Thread(target=wfs.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with mock.patch.object(probe_location_list, 'DOV_URL', wfs.url):
+                locations = ProbeLocationList(BBOX[:2], BBOX[2:])
+        finally:
+            wfs.shutdown()
+            wfs.server_close()
+
+        self.assertEqual(len(locations), 117)
+        self.assertEqual(locations[0].number, 'GEO-LT/00000-S1')
+        for location in locations:
+            self.assertTrue(BBOX[0] <= location.x_coord <= BBOX[2] and BBOX[1] <= location.y_coord <= BBOX[3])
@@ -0,0 +1,94 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from app.single_flight import SingleFlight
+
+
+class TestSingleFlight(IsolatedAsyncioTestCase):
+    async def test_call_after_cancellation(self):
+        flights = SingleFlight()
+        release = asyncio.Event()
+        runs: list[int] = []
+
+        async def compute(number: int) -> int:
+            runs.append(number)
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                await release.wait()  # finishes slowly, like a worker thread
+                raise
+            return number
+
+        first = asyncio.ensure_future(flights.run('key', lambda: compute(1)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(flights), 0)  # forgotten while the cancelled computation still runs
+
+        second = asyncio.ensure_future(flights.run('key', lambda: asyncio.sleep(0.01, result=2)))
+        release.set()
+        self.assertEqual(await second, 2)
+        self.assertFalse(second.cancelled())
+        self.assertTrue(first.cancelled())
+        self.assertListEqual(runs, [1])
+
+    async def test_shared(self):
+        flights = SingleFlight()
+        runs: list[int] = []
+
+        async def compute(number: int) -> int:
+            runs.append(number)
+            await asyncio.sleep(0.01)
+            return number
+
+        results = await asyncio.gather(*(flights.run('key', lambda number=number: compute(number))
+                                         for number in range(5)))
+
+        self.assertListEqual(results, [0]*5)
+        self.assertListEqual(runs, [0])
+        self.assertEqual(flights.coalesced, 4)
+
+    async def test_exception(self):
+        flights = SingleFlight()
+
+        async def fail() -> None:
+            await asyncio.sleep(0.01)
+            raise ValueError("failed")
+
+        results = await asyncio.gather(*(flights.run('key', fail) for _ in range(3)), return_exceptions=True)
+
+        self.assertEqual(len(results), 3)
+        for result in results:
+            self.assertIsInstance(result, ValueError)
+
+    async def test_one_caller_cancelled(self):
+        flights = SingleFlight()
+        first = asyncio.ensure_future(flights.run('key', lambda: asyncio.sleep(0.05, result=1)))
+        second = asyncio.ensure_future(flights.run('key', lambda: asyncio.sleep(0.05, result=2)))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        self.assertEqual(await second, 1)
+        self.assertTrue(first.cancelled())
+
+    async def test_all_callers_cancelled(self):
+        flights = SingleFlight()
+        callers = [asyncio.ensure_future(flights.run('key', lambda: asyncio.sleep(10))) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        task: asyncio.Task = flights._flights['key'].task
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        self.assertTrue(task.cancelled())
+        self.assertEqual(len(flights), 0)
+
+    async def test_forgotten_after_completion(self):
+        flights = SingleFlight()
+        self.assertEqual(await flights.run('key', lambda: asyncio.sleep(0, result=1)), 1)
+        await asyncio.sleep(0)
+
+        self.assertEqual(len(flights), 0)
+        self.assertEqual(await flights.run('key', lambda: asyncio.sleep(0, result=2)), 2)  # not cached
+        self.assertEqual(flights.coalesced, 0)
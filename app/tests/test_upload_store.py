@@ -0,0 +1,72 @@
+import gzip
+import os
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase, mock
+
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+
+from app import main
+from app.upload_store import OBJECTS_DIR, UploadStore
+from cptlib.probetools.json_source import json_file_path
+
+CONTENT: bytes = b'[{"sondeernummer": "S1", "diepte": 1.0, "qc": 1.0, "fs": 10.0}]'
+
+
+def upload(name: str, content: bytes = CONTENT) -> UploadFile:
+    return UploadFile(file=BytesIO(content), filename=name)
+
+
+class TestUploadStore(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._root: Path = Path(self._dir.name)
+        self._store = UploadStore(self._root)
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    async def test_duplicate(self):
+        alias, digest, duplicate = await self._store.save(upload('foo.json'))
+        self.assertFalse(duplicate)
+        self.assertEqual(alias, self._root / 'foo.json')
+        self.assertEqual(alias.read_bytes(), CONTENT)
+
+        other, other_digest, duplicate = await self._store.save(upload('bar.json'))
+        self.assertTrue(duplicate)
+        self.assertEqual(other_digest, digest)
+        self.assertTrue(os.path.samefile(alias, other))  # aliases of the same stored content
+        self.assertListEqual(os.listdir(self._root / OBJECTS_DIR), [f'{digest}.json'])
+
+        await self._store.save(upload('foo.json', CONTENT.replace(b'S1', b'S2')))
+        self.assertFalse(os.path.samefile(alias, other))  # the alias refers to the new content
+        self.assertEqual(other.read_bytes(), CONTENT)
+
+    async def test_invalid_names(self):
+        for name in ['..', '.', '/', 'dir/..', '.hidden.json', OBJECTS_DIR]:
+            with self.assertRaises(ValueError):
+                await self._store.save(upload(name))
+        self.assertListEqual(os.listdir(self._root), [OBJECTS_DIR])  # without temporary files
+        self.assertListEqual(os.listdir(self._root / OBJECTS_DIR), [])
+
+        alias, _, _ = await self._store.save(upload('dir/../foo.json'))  # without directories
+        self.assertEqual(alias, self._root / 'foo.json')
+
+    def test_invalid_name_rejected(self):
+        client = TestClient(main.app, client=(self.id(), 50000))  # rate limited per test, without running the jobs
+        with mock.patch.object(main, 'upload_store', self._store):
+            response = client.post('/probes/upload/', files={'json_probes_file': (OBJECTS_DIR, CONTENT)})
+        self.assertEqual(response.status_code, 422)
+
+    async def test_other_extension(self):
+        await self._store.save(upload('foo.json'))
+        alias, _, _ = await self._store.save(upload('foo.json.gz', gzip.compress(CONTENT)))
+
+        self.assertFalse((self._root / 'foo.json').exists())
+        self.assertEqual(json_file_path(str(self._root / 'foo')), str(alias))
+
+        await self._store.save(upload('foo.json'))
+        self.assertFalse(alias.exists())
+        self.assertEqual(json_file_path(str(self._root / 'foo')), str(self._root / 'foo.json'))
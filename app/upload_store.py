@@ -0,0 +1,108 @@
+import hashlib
+import os
+import shutil
+from pathlib import Path
+from typing import BinaryIO
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from cptlib.probetools.json_source import EXTENSIONS, split_extension
+
+CHUNK_SIZE: int = 1 << 20  # bytes read from the upload at a time
+OBJECTS_DIR: str = 'objects'
+
+
+def check_name(name: str) -> None:
+    """
+    Raise a ValueError if the file name *name* can't be an alias in the store: if it is empty, starts with a dot (like
+    '..' and the temporary files) or is the directory of the stored content.
+    """
+    if not name or name.startswith('.') or name == OBJECTS_DIR:
+        raise ValueError(f"'{name}' is not a valid file name for an upload.")
+
+
+class UploadStore:
+    """
+    A content-addressed store of the uploaded files in the directory *root*.
+
+    The content of each upload is stored once under its SHA-256 digest in *root*/objects, with the extension of the
+    upload if it is a compressed json file (.json.gz, .json.zst) or a zip archive, which are stored as they are and only
+    decompressed while they are read. The file name of the upload
+    is an alias in *root*: a hard link to the stored content, so it can be analysed by its name as before. Identical
+    uploads share the same file, hence its parsed probes in the probe cache, which are keyed by the file rather than
+    its name. The index of the probes is stored next to each alias, so it is built once per name. All files are written
+    under a temporary name and renamed atomically, so concurrent uploads never corrupt each other.
+    """
+
+    def __init__(self, root: Path):
+        self._root: Path = root
+        self._objects: Path = root / OBJECTS_DIR
+        self._objects.mkdir(parents=True, exist_ok=True)
+
+    def _temporary_path(self, directory: Path) -> Path:
+        return directory / f'.{os.getpid()}.{os.urandom(8).hex()}.tmp'
+
+    def object_path(self, digest: str, extension: str = '.json') -> Path:
+        """Return the path of the content with SHA-256 digest *digest* and file extension *extension*."""
+        return self._objects / f'{digest}{extension}'
+
+    def _save(self, file: BinaryIO, name: str) -> tuple[Path, str, bool]:
+        """Store the content of the file *file* and link the file name *name* to it, see save."""
+        extension: str = split_extension(name)[1] or '.json'
+        temporary_path: Path = self._temporary_path(self._objects)
+        sha256 = hashlib.sha256()
+        try:
+            with open(temporary_path, 'wb') as buffer:
+                while chunk := file.read(CHUNK_SIZE):
+                    sha256.update(chunk)
+                    buffer.write(chunk)
+            digest: str = sha256.hexdigest()
+            object_path: Path = self.object_path(digest, extension)
+            duplicate: bool = object_path.exists()
+            if duplicate:  # keep the stored file, so its derived data remains valid
+                temporary_path.unlink()
+            else:
+                os.replace(temporary_path, object_path)
+        except BaseException:
+            temporary_path.unlink(missing_ok=True)
+            raise
+
+        return self.alias(name, digest), digest, duplicate
+
+    async def save(self, upload: UploadFile) -> tuple[Path, str, bool]:
+        """
+        Store the content of *upload* and link its file name to it. Return the path of the alias, the digest of the
+        content and whether the content had already been stored before. A ValueError is raised if the file name is
+        invalid, see check_name. The content is hashed and written in a thread, so the event loop isn't blocked.
+        """
+        name: str = Path(upload.filename or 'upload.json').name  # no directories
+        check_name(name)
+        return await run_in_threadpool(self._save, upload.file, name)
+
+    def alias(self, name: str, digest: str) -> Path:
+        """
+        Let the file name *name* refer to the content with digest *digest* and return the path of the alias. The
+        aliases of the same name with another of the EXTENSIONS are removed, as they would be read instead otherwise.
+        """
+        alias_path: Path = self._root / name
+        stem, extension = split_extension(name)
+        object_path: Path = self.object_path(digest, extension or '.json')
+        temporary_path: Path = self._temporary_path(self._root)
+        try:
+            os.link(object_path, temporary_path)
+        except OSError:  # the file system doesn't support hard links
+            shutil.copy2(object_path, temporary_path)
+        os.replace(temporary_path, alias_path)
+        if extension:
+            for other in EXTENSIONS:
+                if other != extension:
+                    (self._root / (stem + other)).unlink(missing_ok=True)
+        return alias_path
+
+    def clear(self) -> None:
+        """Remove all the aliases, the stored content and the files derived from it in the store."""
+        for directory in (self._root, self._objects):
+            for file in directory.iterdir():
+                if file.is_file():
+                    file.unlink()
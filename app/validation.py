@@ -1,4 +1,7 @@
-from pydantic import BaseModel
+from datetime import date, datetime, time, timezone
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 
 class Polygon(BaseModel):
@@ -15,3 +18,98 @@ class Polygon(BaseModel):
                              (107680, 171681))
             }
         }
+
+
+class SectionLine(BaseModel):
+    vertices: list[tuple[float, float]] = Field(..., min_length=2)
+    max_offset: float = Field(100.0, gt=0)  # m
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "vertices": ((152150, 207450), (152400, 207200), (153000, 206950)),
+                "max_offset": 100.0
+            }
+        }
+
+
+class DepthQuery(BaseModel):
+    probe: str
+    depth: Optional[float] = None
+    top: Optional[float] = None
+    bottom: Optional[float] = None
+
+    @model_validator(mode='after')
+    def check_depth_or_range(self) -> 'DepthQuery':
+        if (self.depth is None) == (self.top is None or self.bottom is None):
+            raise ValueError("Either 'depth' or both 'top' and 'bottom' must be given.")
+        if self.top is not None and self.bottom is not None and self.bottom < self.top:
+            raise ValueError("'top' must be smaller than 'bottom'.")
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {"probe": "GEO-10/019-S1", "top": 2.0, "bottom": 4.5}
+        }
+
+
+class ProbeFilter(BaseModel):
+    probe: list[str] = []
+    bbox: Optional[str] = None  # x_min,y_min,x_max,y_max
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    method: Optional[str] = None
+    offset: int = Field(0, ge=0)
+    limit: Optional[int] = Field(None, ge=1)
+
+    @field_validator('bbox')
+    @classmethod
+    def check_bbox(cls, bbox: Optional[str]) -> Optional[str]:
+        if bbox is not None:
+            coordinates: list[str] = bbox.split(',')
+            if len(coordinates) != 4:
+                raise ValueError("'bbox' must consist of four comma separated numbers x_min,y_min,x_max,y_max.")
+            for coordinate in coordinates:
+                float(coordinate)  # raises a ValueError if not a number
+        return bbox
+
+    def bounding_box(self) -> Optional[tuple[float, float, float, float]]:
+        if self.bbox is None:
+            return None
+        return tuple(float(coordinate) for coordinate in self.bbox.split(','))
+
+    def date_range(self) -> tuple[Optional[int], Optional[int]]:
+        """Return the date range as timestamps in milliseconds, like 'datum_aanvang'. The end date is included."""
+        def timestamp(day: date, at: time) -> int:
+            return int(datetime.combine(day, at, tzinfo=timezone.utc).timestamp()*1000)
+
+        return (timestamp(self.date_from, time.min) if self.date_from is not None else None,
+                timestamp(self.date_to, time.max) if self.date_to is not None else None)
+
+    def is_empty(self) -> bool:
+        """Return True if no probes are filtered out."""
+        return self == ProbeFilter()
+
+
+class JobRequest(BaseModel):
+    kind: Literal['zones', 'layers', 'graph', 'dov']
+    json_probes_file: Optional[str] = None
+    selection: ProbeFilter = ProbeFilter()
+    zone_number: int = Field(0, ge=0, le=9)
+    normalized: bool = False
+    fast_rendering: bool = False
+    polygon: Optional[Polygon] = None
+
+    @model_validator(mode='after')
+    def check_input(self) -> 'JobRequest':
+        if self.kind == 'dov' and self.polygon is None:
+            raise ValueError("A 'polygon' must be given to retrieve probes from DOV.")
+        if self.kind != 'dov' and self.json_probes_file is None:
+            raise ValueError(f"A 'json_probes_file' must be given to analyse {self.kind}.")
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {"kind": "layers", "json_probes_file": "uploaded_files/opdracht1", "zone_number": 3,
+                        "selection": {"method": "continu elektrisch", "limit": 100}}
+        }
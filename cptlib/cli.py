@@ -0,0 +1,276 @@
+import argparse
+import glob
+import importlib.util
+import math
+import multiprocessing
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import contextmanager, redirect_stdout
+from typing import Iterator, Optional
+
+import pandas as pd
+
+from cptlib.layertools.layers_probe import LayersProbe
+from cptlib.layertools.zones_probe import ZonesProbe
+from cptlib.probetools.json_source import EXTENSIONS, is_compressed, json_file_path, split_extension
+from cptlib.probetools.probe_index import ProbeIndex
+from cptlib.probetools.probe_list import ProbeList
+from cptlib.setuptools.graph_set_up import GraphSetUp
+
+ANALYSES: tuple[str, ...] = ('zones', 'layers', 'graphs')
+FORMATS: tuple[str, ...] = ('csv', 'parquet')
+COLUMNS: dict[str, list[str]] = {
+  'zones': ["probe number", "top", "bottom", "zone number", "Soil behaviour type"],
+  'layers': ["probe number", "# measurements", "# layers", "Soil behaviour type", "top TL", "bottom TL"],
+  'graphs': ["probe number", "graph"]
+}
+CHUNK_SIZE: int = 8 # probes analysed per task
+
+# The input file named *json_file_name* (without the file extension) and the output file of each analysis
+FileTask = namedtuple('FileTask', ['json_file_name', 'outputs'])
+
+# The settings of the analyses that are sent to the worker processes
+Settings = namedtuple('Settings', ['analyses', 'zone_number', 'normalized', 'fast_rendering', 'verbose'])
+
+
+def find_input_files(paths: list[str]) -> list[str]:
+  """
+  Return the names (without the file extension) of the json files in *paths*, which are file names, glob patterns or directories that are searched recursively. The json files may be compressed (see json_source.EXTENSIONS). The index files of the ProbeIndex are skipped and each file is listed once.
+  """
+  file_names: list[str] = []
+  for path in paths:
+    if os.path.isdir(path):
+      matches: list[str] = [match for extension in EXTENSIONS
+                            for match in glob.glob(os.path.join(glob.escape(path), '**', '*' + extension),
+                                                   recursive = True)]
+    else:
+      matches = glob.glob(path, recursive = True)
+    file_names.extend(sorted(match for match in matches if split_extension(match)[1]
+                             and not match.endswith('.index.json') and os.path.isfile(match)))
+
+  unique: dict[str, str] = {}
+  for file_name in file_names:
+    unique.setdefault(os.path.realpath(file_name), split_extension(file_name)[0])
+  return list(dict.fromkeys(unique.values())) # a json file and its compressed copy are the same input
+
+def input_path(json_file_name: str) -> str:
+  """Return the path of the json file named *json_file_name*, or the path of a plain json file if there is none."""
+  try:
+    return json_file_path(json_file_name)
+  except FileNotFoundError:
+    return json_file_name + ".json"
+
+def output_files(json_file_name: str, output_dir: str, settings: Settings, file_format: str) -> dict[str, str]:
+  """
+  Return the name of the output file of each analysis in *settings* for the json file named *json_file_name*. The settings that change the result are part of the name, such that each output is only up to date for the settings with which it has been made.
+  """
+  stem: str = os.path.join(output_dir, os.path.basename(json_file_name))
+  normalized: str = '-normalized' if settings.normalized else ''
+  names: dict[str, str] = {
+    'zones': f'{stem}.zones{normalized}.{file_format}',
+    'layers': f'{stem}.layers-zone{settings.zone_number}.{file_format}',
+    'graphs': f'{stem}.graphs{normalized}.{file_format}'
+  }
+  return {analysis: names[analysis] for analysis in settings.analyses}
+
+def graph_dir(output_file: str) -> str:
+  """Return the directory of the png files listed in the graphs output file *output_file*."""
+  return os.path.splitext(output_file)[0]
+
+def is_up_to_date(json_file_name: str, output_file: str) -> bool:
+  """Return True if the file *output_file* exists and is not older than the json file named *json_file_name*."""
+  try:
+    return os.path.getmtime(output_file) >= os.path.getmtime(json_file_path(json_file_name))
+  except OSError:
+    return False
+
+def probe_numbers(json_file_name: str, verbose: bool = False) -> list[str]:
+  """Return the numbers of the probes in the json file named *json_file_name* by means of its ProbeIndex."""
+  with quiet(verbose):
+    return ProbeIndex(json_file_name).numbers
+
+def analyse_probes(json_file_name: str, numbers: list[str], settings: Settings,
+                   outputs: dict[str, str]) -> dict[str, list[list]]:
+  """
+  Run the analyses in *settings* on the probes with number in *numbers* of the json file named *json_file_name*. Return the rows of the output table of each analysis. The graphs are stored as png files in the directory of the graphs output file in *outputs*.
+  """
+  rows: dict[str, list[list]] = {analysis: [] for analysis in settings.analyses}
+  with quiet(settings.verbose):
+    for probe in ProbeList(json_file_name, probe_numbers = numbers):
+      if 'zones' in settings.analyses or 'graphs' in settings.analyses:
+        zones = ZonesProbe(probe, settings.normalized)
+      if 'zones' in settings.analyses:
+        rows['zones'].extend([probe.number, zone.top, zone.bottom, zone.number, ZonesProbe.SBT(zone.number)]
+                             for zone in zones)
+      if 'layers' in settings.analyses:
+        layers = LayersProbe(probe, settings.zone_number)
+        thickest_layer = layers.thickest()
+        rows['layers'].append([probe.number, len(probe.measurements), len(layers),
+                               ZonesProbe.SBT(settings.zone_number),
+                               thickest_layer.top if thickest_layer else None,
+                               thickest_layer.bottom if thickest_layer else None])
+      if 'graphs' in settings.analyses:
+        file_name: str = os.path.join(graph_dir(outputs['graphs']), probe.number.replace(os.sep, '_'))
+        graph = GraphSetUp(file_name = file_name, indep_variable = 'depth', title = probe.number,
+                           legend_font_size = 'xx-small', fast_rendering = settings.fast_rendering)
+        probe.visualize(graph, ('qc',''), (ZonesProbe.friction_ratio,'Rf','%','red'))
+        zones.visualize(graph)
+        graph.save()
+        graph.close('all')
+        rows['graphs'].append([probe.number, file_name + '.png'])
+
+  return rows
+
+@contextmanager
+def quiet(verbose: bool) -> Iterator[None]:
+  """Suppress the progress messages that cptlib prints inside the context, unless *verbose* is True."""
+  if verbose:
+    yield
+    return
+  with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+    yield
+
+def write_table(rows: list[list], columns: list[str], output_file: str, file_format: str) -> None:
+  """
+  Write *rows* with *columns* to the csv or parquet file *output_file*. The file is written under a temporary name and renamed, such that an interrupted run never leaves an output that seems up to date.
+  """
+  table = pd.DataFrame(rows, columns = columns)
+  temporary_file: str = f'{output_file}.{os.getpid()}.tmp'
+  if file_format == 'parquet':
+    table.to_parquet(temporary_file, index = False)
+  else:
+    table.to_csv(temporary_file, index = False)
+  os.replace(temporary_file, output_file)
+
+def parse_arguments(argv: Optional[list[str]]) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(
+    prog = 'cptlib',
+    description = "Classify the soil behaviour types (zones), find the layers and draw the graphs of all the probes "
+                  "in json files of CPT measurements. The files and probes are analysed in parallel and files whose "
+                  "outputs are up to date are skipped, such that an interrupted run can be resumed.")
+  parser.add_argument('paths', nargs = '+', help = "json files, glob patterns or directories (searched recursively)")
+  parser.add_argument('-a', '--analyses', nargs = '+', choices = ANALYSES, default = ['zones', 'layers'],
+                      help = "the analyses to run (default: zones layers)")
+  parser.add_argument('-o', '--output-dir', default = 'output_files',
+                      help = "the directory of the output files (default: output_files)")
+  parser.add_argument('-f', '--format', choices = FORMATS, default = 'csv', dest = 'file_format',
+                      help = "the format of the output tables (default: csv)")
+  parser.add_argument('-z', '--zone-number', type = int, choices = range(10), default = 0, metavar = '{0-9}',
+                      help = "only find layers inside this zone, 0 for all zones (default: 0)")
+  parser.add_argument('-n', '--normalized', action = 'store_true',
+                      help = "classify on the normalized cone resistance and friction ratio")
+  parser.add_argument('--fast-rendering', action = 'store_true', help = "decimate the curves in the graphs")
+  parser.add_argument('-j', '--workers', type = int, default = os.cpu_count() or 1,
+                      help = "the number of worker processes (default: the number of CPU cores)")
+  parser.add_argument('--chunk-size', type = int, default = CHUNK_SIZE,
+                      help = f"the number of probes analysed per task (default: {CHUNK_SIZE})")
+  parser.add_argument('--force', action = 'store_true', help = "also analyse the files whose outputs are up to date")
+  parser.add_argument('-v', '--verbose', action = 'store_true', help = "show the progress messages of every probe")
+
+  arguments = parser.parse_args(argv)
+  if arguments.workers < 1 or arguments.chunk_size < 1:
+    parser.error("the number of workers and the chunk size must be positive")
+  if arguments.file_format == 'parquet' and importlib.util.find_spec('pyarrow') is None \
+     and importlib.util.find_spec('fastparquet') is None:
+    parser.error("parquet output requires the optional package pyarrow, e.g., poetry install --extras parquet")
+  return arguments
+
+def main(argv: Optional[list[str]] = None) -> int:
+  """
+  Run the command line interface with the arguments *argv* (default: sys.argv). Return the exit status: 0 if all the files have been analysed, 1 if any of them failed and 2 if no json files were found.
+  """
+  arguments = parse_arguments(argv)
+  settings = Settings(tuple(analysis for analysis in ANALYSES if analysis in arguments.analyses),
+                      arguments.zone_number, arguments.normalized, arguments.fast_rendering, arguments.verbose)
+
+  json_file_names: list[str] = find_input_files(arguments.paths)
+  if not json_file_names:
+    print("No json files found in", " ".join(arguments.paths), file = sys.stderr)
+    return 2
+
+  stems: dict[str, str] = {}
+  for json_file_name in json_file_names: # the outputs are named after the input files
+    other: Optional[str] = stems.setdefault(os.path.basename(json_file_name), json_file_name)
+    if other != json_file_name:
+      print(f"The files {input_path(other)} and {input_path(json_file_name)} would write to the same outputs. Analyse them into "
+            "separate output directories.", file = sys.stderr)
+      return 2
+
+  os.makedirs(arguments.output_dir, exist_ok = True)
+  NO_FILES: int = len(json_file_names)
+  tasks: list[FileTask] = []
+  no_done: int = 0
+  no_failed: int = 0
+  for json_file_name in json_file_names:
+    outputs: dict[str, str] = output_files(json_file_name, arguments.output_dir, settings, arguments.file_format)
+    outputs = {analysis: output_file for analysis, output_file in outputs.items()
+               if arguments.force or not is_up_to_date(json_file_name, output_file)}
+    if outputs:
+      tasks.append(FileTask(json_file_name, outputs))
+    else:
+      no_done += 1
+      print(f"[{no_done}/{NO_FILES}] {input_path(json_file_name)}: up to date")
+
+  context = multiprocessing.get_context('spawn')
+  with ProcessPoolExecutor(max_workers = arguments.workers, mp_context = context) as executor:
+    pending: dict[Future, tuple[FileTask, int]] = {}
+    chunks: dict[str, list[Optional[dict[str, list[list]]]]] = {} # the results of the chunks of each file
+    no_probes: dict[str, int] = {}
+    for task in tasks:
+      pending[executor.submit(probe_numbers, task.json_file_name, settings.verbose)] = (task, -1)
+
+    try:
+      while pending:
+        finished, _ = wait(pending, return_when = FIRST_COMPLETED)
+        for future in finished:
+          task, index = pending.pop(future)
+          if task.json_file_name not in chunks and index >= 0: # the file failed already
+            continue
+          try:
+            result = future.result()
+          except Exception as error:
+            no_done += 1
+            no_failed += 1
+            chunks.pop(task.json_file_name, None)
+            no_probes.pop(task.json_file_name, None)
+            print(f"[{no_done}/{NO_FILES}] {input_path(task.json_file_name)}: failed ({type(error).__name__}: {error})",
+                  file = sys.stderr)
+            continue
+
+          if index < 0: # the probe numbers: split the probes of the file into chunks
+            numbers: list[str] = result
+            if 'graphs' in task.outputs:
+              os.makedirs(graph_dir(task.outputs['graphs']), exist_ok = True)
+            no_probes[task.json_file_name] = len(numbers)
+            chunk_size: int = arguments.chunk_size
+            if is_compressed(input_path(task.json_file_name)): # read sequentially, so only once
+              chunk_size = max(len(numbers), 1)
+            NO_CHUNKS: int = math.ceil(len(numbers)/chunk_size)
+            chunks[task.json_file_name] = [None]*NO_CHUNKS
+            for chunk in range(NO_CHUNKS):
+              chunk_numbers: list[str] = numbers[chunk*chunk_size:(chunk + 1)*chunk_size]
+              pending[executor.submit(analyse_probes, task.json_file_name, chunk_numbers, settings,
+                                      task.outputs)] = (task, chunk)
+            if NO_CHUNKS > 0:
+              continue
+          else:
+            chunks[task.json_file_name][index] = result
+            if any(chunk is None for chunk in chunks[task.json_file_name]):
+              continue
+
+          results: list[dict[str, list[list]]] = chunks.pop(task.json_file_name)
+          for analysis, output_file in task.outputs.items():
+            write_table([row for result in results for row in result[analysis]], COLUMNS[analysis], output_file,
+                        arguments.file_format)
+          no_done += 1
+          print(f"[{no_done}/{NO_FILES}] {input_path(task.json_file_name)}: {no_probes.pop(task.json_file_name)} probes -> "
+                + ", ".join(task.outputs.values()))
+    except KeyboardInterrupt:
+      executor.shutdown(wait = False, cancel_futures = True)
+      print("\nInterrupted: the files that have been completed are skipped when the command is run again.",
+            file = sys.stderr)
+      return 130
+
+  return 1 if no_failed else 0
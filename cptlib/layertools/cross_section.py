@@ -0,0 +1,232 @@
+from collections import namedtuple
+from collections.abc import Hashable, Iterable, Iterator
+from math import inf
+from typing import Optional
+
+import numpy as np
+from matplotlib.collections import PolyCollection
+
+from cptlib.layertools.interval_index import IntervalIndex
+from cptlib.layertools.interval_table import IntervalTable
+from cptlib.layertools.zones_cache import ZonesCache
+from cptlib.layertools.zones_probe import COLORS, ZonesProbe
+from cptlib.probetools.preprocessing import PreprocessingPolicy
+from cptlib.probetools.probe import Probe
+from cptlib.probetools.probe_index import ProbeIndex
+from cptlib.setuptools.graph_set_up import GraphSetUp
+from cptlib.setuptools.measurement import UNITS
+
+# A probe in a cross-section: its distance along the section line (chainage), its distance to the line (offset), the
+# elevation of the surface (mTAW, None if unknown) and its zones
+SectionProbe = namedtuple('SectionProbe', ['number', 'chainage', 'offset', 'surface', 'zones'])
+
+COLUMN_WIDTH: float = 0.01 # the width of the zone column of a probe relative to the length of the section
+
+
+def project_onto_polyline(points: np.ndarray, vertices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+  """
+  Project the points with coordinates *points* (shape (n, 2)) onto the polyline through *vertices* (shape (m, 2)). Return the distance along the polyline of the nearest point on the polyline (the chainage) and the distance to it (the offset) of each point.
+  """
+  points = np.asarray(points, dtype = float).reshape(-1, 2)
+  vertices = np.asarray(vertices, dtype = float)
+  starts: np.ndarray = vertices[:-1]
+  vectors: np.ndarray = np.diff(vertices, axis = 0)
+  lengths: np.ndarray = np.hypot(vectors[:, 0], vectors[:, 1])
+  squared_lengths: np.ndarray = np.where(lengths > 0, lengths**2, 1.0)
+
+  relative: np.ndarray = points[:, None, :] - starts[None, :, :] # shape (n, m - 1, 2)
+  fractions: np.ndarray = np.clip(np.sum(relative*vectors, axis = 2)/squared_lengths, 0.0, 1.0)
+  distances: np.ndarray = np.linalg.norm(relative - fractions[:, :, None]*vectors, axis = 2)
+
+  segments: np.ndarray = np.argmin(distances, axis = 1)
+  rows: np.ndarray = np.arange(len(points))
+  chainages: np.ndarray = np.concatenate(([0.0], np.cumsum(lengths)))[segments] \
+    + fractions[rows, segments]*lengths[segments]
+  return chainages, distances[rows, segments]
+
+def section_probe_numbers(index: ProbeIndex, vertices: np.ndarray, max_offset: float) -> list[str]:
+  """
+  Return the numbers of the probes in *index* that lay within *max_offset* of the polyline through *vertices*, ordered along the polyline. Only the PROBE_FIELDS in the index are read, not the measurements.
+  """
+  vertices = np.asarray(vertices, dtype = float)
+  (x_min, y_min), (x_max, y_max) = vertices.min(axis = 0) - max_offset, vertices.max(axis = 0) + max_offset
+  numbers: list[str] = index.select(bbox = (x_min, y_min, x_max, y_max))
+  if not numbers:
+    return []
+
+  points: np.ndarray = np.array([(index[number].info['x'], index[number].info['y']) for number in numbers])
+  chainages, offsets = project_onto_polyline(points, vertices)
+  return [numbers[k] for k in np.argsort(chainages, kind = 'stable').tolist() if offsets[k] <= max_offset]
+
+
+class CrossSection:
+  """
+  A stratigraphic cross-section along the polyline through *vertices*. The probes among *probes* within *max_offset* of the line are projected onto it and their zones are connected between neighbouring probes: zones with the same SBT that overlap in elevation are joined by interpolating their boundaries linearly, the other zones pinch out halfway between the probes.
+
+  The vertical coordinate is the elevation (mTAW) if the surface elevation ('start_sondering_mtaw') of all probes is known, otherwise the depth below the surface.
+
+  A ValueError exception is raised during the initialization if fewer than two vertices are given.
+  """
+  def __init__(self, probes: Iterable[Probe], vertices: np.ndarray, max_offset: float = inf,
+               normalized: bool = False, cache: Optional[ZonesCache] = None, source: Hashable = None,
+               preprocessing: PreprocessingPolicy = PreprocessingPolicy()):
+    """
+    Parameters
+    __________
+    probes: Iterable[Probe]
+      The probes that may lay along the section line. Probes without coordinates are skipped.
+    vertices: numpy.ndarray
+      The coordinates (x, y) of the vertices of the section line.
+    max_offset: float, default: inf
+      The maximum distance between a probe and the section line.
+    normalized: bool, default: False
+      The zones are determined from the normalized Soil Behaviour Type Index if its value is True.
+    cache: ZonesCache, optional
+      A cache of the zones of the probes. The probes are classified again if not provided.
+    source: Hashable, optional
+      Identifies the version of the file of the probes in *cache*.
+    preprocessing: PreprocessingPolicy, default: PreprocessingPolicy()
+      How the measurements are processed before and the zones after the classification.
+    """
+    self._vertices: np.ndarray = np.asarray(vertices, dtype = float).reshape(-1, 2)
+    if len(self._vertices) < 2:
+      raise ValueError("A cross-section requires a section line of at least two vertices.")
+
+    located: list[Probe] = [probe for probe in probes
+                            if probe.info.get('x') is not None and probe.info.get('y') is not None]
+    chainages, offsets = project_onto_polyline(np.array([(probe.info['x'], probe.info['y']) for probe in located]),
+                                               self._vertices)
+    self._probes: list[SectionProbe] = []
+    for k in np.argsort(chainages, kind = 'stable').tolist():
+      if offsets[k] > max_offset:
+        continue
+      probe: Probe = located[k]
+      zones: IntervalTable = cache.zones(probe, normalized, source, preprocessing) if cache is not None else \
+        ZonesProbe(probe, normalized, preprocessing).interval_table
+      if len(zones):
+        self._probes.append(SectionProbe(probe.number, float(chainages[k]), float(offsets[k]),
+                                         probe.info.get('start_sondering_mtaw'), zones))
+
+    self._elevation: bool = bool(self._probes) and all(probe.surface is not None for probe in self._probes)
+
+  def __iter__(self) -> Iterator[SectionProbe]:
+    return iter(self._probes)
+
+  def __len__(self) -> int:
+    return len(self._probes)
+
+  def __repr__(self) -> str:
+    return f'{self.__class__.__name__} < {len(self._probes)} probes, length={self.length:.1f} >'
+
+  # ========== PRIVATE METHODS ==========
+
+  def __reference(self, probe: SectionProbe) -> float:
+    """Return the vertical coordinate of the surface at *probe*."""
+    return probe.surface if self._elevation else 0.0
+
+  def __levels(self, probe: SectionProbe) -> tuple[np.ndarray, np.ndarray]:
+    """Return the vertical coordinates of the tops and bottoms of the zones of *probe*."""
+    reference: float = self.__reference(probe)
+    return reference - probe.zones.tops, reference - probe.zones.bottoms
+
+  def __connect(self, left: SectionProbe, right: SectionProbe) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the vertices (shape (k, 4, 2)) of the quadrilaterals between the neighbouring probes *left* and *right* and their zone numbers. Each pair of zones with the same SBT that overlap in elevation is joined by a quadrilateral, each zone without such a partner by a wedge to halfway.
+    """
+    left_tops, left_bottoms = self.__levels(left)
+    right_tops, right_bottoms = self.__levels(right)
+    left_numbers, right_numbers = left.zones.numbers, right.zones.numbers
+
+    # the zones of the right probe that overlap each zone of the left probe, as depths below the right probe
+    starts, stops = IntervalIndex(right.zones).overlapping_slices(self.__reference(right) - left_tops,
+                                                                  self.__reference(right) - left_bottoms)
+    counts: np.ndarray = stops - starts
+    left_indices: np.ndarray = np.repeat(np.arange(len(left_numbers)), counts)
+    right_indices: np.ndarray = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - starts, counts)
+    same: np.ndarray = left_numbers[left_indices] == right_numbers[right_indices]
+    left_indices, right_indices = left_indices[same], right_indices[same]
+
+    x_left, x_right = left.chainage, right.chainage
+    x_middle: float = 0.5*(x_left + right.chainage)
+    lonely_left: np.ndarray = np.bincount(left_indices, minlength = len(left_numbers)) == 0
+    lonely_right: np.ndarray = np.bincount(right_indices, minlength = len(right_numbers)) == 0
+    middle_left: np.ndarray = 0.5*(left_tops[lonely_left] + left_bottoms[lonely_left])
+    middle_right: np.ndarray = 0.5*(right_tops[lonely_right] + right_bottoms[lonely_right])
+
+    def quadrilaterals(xs: tuple[float, float, float, float], ys: tuple[np.ndarray, ...]) -> np.ndarray:
+      return np.stack([np.stack((np.full_like(y, x), y), axis = 1) for x, y in zip(xs, ys, strict = True)], axis = 1)
+
+    vertices: np.ndarray = np.concatenate((
+      quadrilaterals((x_left, x_right, x_right, x_left), (left_tops[left_indices], right_tops[right_indices],
+                                                          right_bottoms[right_indices], left_bottoms[left_indices])),
+      quadrilaterals((x_left, x_middle, x_middle, x_left), (left_tops[lonely_left], middle_left, middle_left,
+                                                            left_bottoms[lonely_left])),
+      quadrilaterals((x_right, x_middle, x_middle, x_right), (right_tops[lonely_right], middle_right, middle_right,
+                                                              right_bottoms[lonely_right]))))
+    numbers: np.ndarray = np.concatenate((left_numbers[left_indices], left_numbers[lonely_left],
+                                          right_numbers[lonely_right]))
+    return vertices, numbers
+
+  # ========== PUBLIC METHODS ==========
+
+  @property
+  def elevation(self) -> bool:
+    """Return True if the vertical coordinate is the elevation (mTAW), False if it is the depth below the surface."""
+    return self._elevation
+
+  @property
+  def length(self) -> float:
+    """Return the length of the section line."""
+    return float(np.sum(np.hypot(*np.diff(self._vertices, axis = 0).T)))
+
+  def polygons(self) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the vertices (shape (k, 4, 2), the horizontal coordinate is the chainage) and the zone numbers of the quadrilaterals that fill the section between the probes, followed by the columns of the zones of each probe.
+    """
+    parts: list[tuple[np.ndarray, np.ndarray]] = [self.__connect(left, right)
+                                                  for left, right in zip(self._probes[:-1], self._probes[1:])]
+    half_width: float = 0.5*COLUMN_WIDTH*max(self.length, 1.0)
+    for probe in self._probes:
+      tops, bottoms = self.__levels(probe)
+      x_left, x_right = np.full_like(tops, probe.chainage - half_width), np.full_like(tops, probe.chainage + half_width)
+      parts.append((np.stack((np.stack((x_left, tops), axis = 1), np.stack((x_right, tops), axis = 1),
+                              np.stack((x_right, bottoms), axis = 1), np.stack((x_left, bottoms), axis = 1)),
+                             axis = 1), probe.zones.numbers))
+
+    if not parts:
+      return np.empty((0, 4, 2)), np.empty(0, dtype = np.int8)
+    return np.concatenate([part[0] for part in parts]), np.concatenate([part[1] for part in parts])
+
+  def visualize(self, graph: GraphSetUp) -> None:
+    """
+    Draw the cross-section in *graph*: the zones of each SBT as one collection, the probes as vertical lines labelled with their number. A runtime error is raised if *graph.indep_variable* doesn't equal 'depth' or if the section contains no probes.
+    """
+    if graph.indep_variable != 'depth':
+      raise RuntimeError("graph.indep_variable must equal 'depth', but has the value"\
+                         f" '{graph.indep_variable}'.")
+    if not self._probes:
+      raise RuntimeError("The cross-section contains no probes.")
+
+    vertices, numbers = self.polygons()
+    for zone_nr in np.unique(numbers).tolist():
+      graph.axes.add_collection(PolyCollection(vertices[numbers == zone_nr], facecolors = COLORS[zone_nr],
+                                               edgecolors = 'none', label = ZonesProbe.SBT(zone_nr)))
+
+    top: float = float(vertices[:, :, 1].max())
+    bottom: float = float(vertices[:, :, 1].min())
+    margin: float = 0.15*(top - bottom) # room for the probe numbers
+    for probe in self._probes:
+      tops, bottoms = self.__levels(probe)
+      graph.axes.vlines(probe.chainage, bottoms[-1], tops[0], colors = 'k', linewidths = 0.8)
+      graph.axes.text(probe.chainage, tops[0] + 0.02*(top - bottom), probe.number, rotation = 90,
+                      ha = 'center', va = 'bottom', fontsize = 'xx-small')
+
+    half_width: float = 0.5*COLUMN_WIDTH*max(self.length, 1.0)
+    graph.xlim(min(0.0, self._probes[0].chainage - half_width), max(self.length, self._probes[-1].chainage + half_width))
+    graph.ylim(bottom, top + margin)
+    graph.axes.set_xlabel('distance along the section [' + UNITS['depth'] + ']')
+    if self._elevation:
+      graph.axes.set_ylabel('elevation [mTAW]')
+    else:
+      graph.free_yticklabels_from_minus()
+    graph.legend(True)
@@ -0,0 +1,85 @@
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterator, Sequence
+from typing import Optional
+
+import numpy as np
+
+from cptlib.layertools.interval_table import IntervalTable
+from cptlib.layertools.layer import Layer
+
+
+class IntervalIndex:
+  """
+  An index over non-overlapping layers (or zones) sorted by depth that answers depth queries by a binary search over the
+  tops and bottoms of the layers. A layer contains the depths in the half-open interval [top, bottom).
+
+  The methods *locate* and *overlapping_slices* answer a batch of queries at once.
+  """
+  def __init__(self, layers: Sequence[Layer]):
+    """
+    Parameter
+    _________
+    layers: Sequence[Layer]
+      The layers sorted by depth. They are not allowed to overlap. The columns of an IntervalTable are used as they
+      are, without creating the layers.
+    """
+    if isinstance(layers, IntervalTable):
+      self._layers: Sequence[Layer] = layers
+      self._top_array: np.ndarray = layers.tops
+      self._bottom_array: np.ndarray = layers.bottoms
+    else:
+      self._layers = list(layers)
+      self._top_array = np.array([layer.top for layer in self._layers], dtype=float)
+      self._bottom_array = np.array([layer.bottom for layer in self._layers], dtype=float)
+    self._tops: list[float] = self._top_array.tolist()
+    self._bottoms: list[float] = self._bottom_array.tolist()
+
+  def __getitem__(self, index: int | slice) -> Layer | Sequence[Layer]:
+    return self._layers[index]
+
+  def __iter__(self) -> Iterator[Layer]:
+    return iter(self._layers)
+
+  def __len__(self) -> int:
+    return len(self._layers)
+
+  def __repr__(self) -> str:
+    return f'{self.__class__.__name__} < {len(self._layers)} layers >'
+
+  # ========== PUBLIC METHODS ==========
+
+  def find(self, depth: float) -> Optional[Layer]:
+    """Return the layer that contains *depth* or None if no layer contains it."""
+    index: int = bisect_right(self._tops, depth) - 1
+    if index >= 0 and depth < self._bottoms[index]:
+      return self._layers[index]
+
+    return None
+
+  def locate(self, depths: np.ndarray) -> np.ndarray:
+    """
+    Return for each depth in *depths* the index of the layer that contains it or -1 if no layer contains it.
+    """
+    depths = np.asarray(depths, dtype=float)
+    indices: np.ndarray = np.searchsorted(self._top_array, depths, side='right') - 1
+    inside: np.ndarray = indices >= 0
+    inside[inside] = depths[inside] < self._bottom_array[indices[inside]]
+    return np.where(inside, indices, -1)
+
+  def overlapping(self, top: float, bottom: float) -> list[Layer]:
+    """Return the layers that overlap the depth range from *top* to *bottom*."""
+    return list(self._layers[bisect_right(self._bottoms, top):bisect_left(self._tops, bottom)])
+
+  def overlapping_slices(self, tops: np.ndarray, bottoms: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return for each depth range from *tops[i]* to *bottoms[i]* the start and stop index of the slice of layers that
+    overlap it. The slice is empty if no layer overlaps the depth range. A depth range with ``tops[i] == bottoms[i]``
+    is a single depth and its slice contains the layer that contains that depth.
+    """
+    tops = np.asarray(tops, dtype=float)
+    bottoms = np.asarray(bottoms, dtype=float)
+    starts: np.ndarray = np.searchsorted(self._bottom_array, tops, side='right')
+    stops: np.ndarray = np.where(tops == bottoms,
+                                 np.searchsorted(self._top_array, bottoms, side='right'),
+                                 np.searchsorted(self._top_array, bottoms, side='left'))
+    return starts, np.maximum(starts, stops)
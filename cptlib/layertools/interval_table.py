@@ -0,0 +1,137 @@
+from collections.abc import Iterator, Sequence
+from typing import Optional, overload
+
+import numpy as np
+
+from cptlib.layertools.layer import Layer
+from cptlib.layertools.zone import Zone
+
+
+class IntervalTable(Sequence):
+  """
+  A table of layers stored as the columns *tops*, *bottoms* and, for zones, *numbers* instead of one object per layer. The Layer (or Zone if *numbers* is given) objects are only created when the table is indexed or iterated.
+
+  A ValueError exception is raised during the initialization if a top is negative or a bottom lays above its top.
+  """
+  def __init__(self, tops: np.ndarray, bottoms: np.ndarray, numbers: Optional[np.ndarray] = None):
+    """
+    Parameters
+    __________
+    tops: numpy.ndarray
+      The depths at which the layers start in the soil.
+    bottoms: numpy.ndarray
+      The depths at which the layers end in the soil.
+    numbers: numpy.ndarray, optional
+      The zone numbers of the layers if they are zones.
+    """
+    self._tops: np.ndarray = np.asarray(tops, dtype = float)
+    self._bottoms: np.ndarray = np.asarray(bottoms, dtype = float)
+    self._numbers: Optional[np.ndarray] = None if numbers is None else np.asarray(numbers, dtype = np.int8)
+    if self._tops.shape != self._bottoms.shape or (self._numbers is not None and self._numbers.shape != self._tops.shape):
+      raise ValueError("The columns of an IntervalTable are required to have the same length.")
+    if np.any((self._tops < 0) | (self._bottoms < self._tops)):
+      raise ValueError("The columns 'tops' and 'bottoms' of an IntervalTable are required to be non-negative and "\
+                       "each top to be at most its bottom.")
+
+  @overload
+  def __getitem__(self, index: int) -> Layer: ...
+
+  @overload
+  def __getitem__(self, index: slice) -> "IntervalTable": ...
+
+  def __getitem__(self, index: int | slice) -> "Layer | IntervalTable":
+    if isinstance(index, slice): # a view of the rows
+      return IntervalTable(self._tops[index], self._bottoms[index],
+                           None if self._numbers is None else self._numbers[index])
+
+    top, bottom = float(self._tops[index]), float(self._bottoms[index])
+    if self._numbers is None:
+      return Layer(top, bottom)
+    return Zone(int(self._numbers[index]), top, bottom)
+
+  def __iter__(self) -> Iterator[Layer]:
+    if self._numbers is None:
+      return (Layer(top, bottom) for top, bottom in zip(self._tops.tolist(), self._bottoms.tolist()))
+    return (Zone(number, top, bottom) for number, top, bottom in zip(self._numbers.tolist(), self._tops.tolist(),
+                                                                     self._bottoms.tolist()))
+
+  def __len__(self) -> int:
+    return len(self._tops)
+
+  def __repr__(self) -> str:
+    return f'{self.__class__.__name__} < {len(self._tops)} {"layers" if self._numbers is None else "zones"} >'
+
+  # ========== PUBLIC METHODS ==========
+
+  @property
+  def bottoms(self) -> np.ndarray:
+    return self._bottoms
+
+  @property
+  def numbers(self) -> Optional[np.ndarray]:
+    return self._numbers
+
+  @property
+  def thicknesses(self) -> np.ndarray:
+    """Return the difference in depth between the bottom and top of each layer."""
+    return self._bottoms - self._tops
+
+  @property
+  def tops(self) -> np.ndarray:
+    return self._tops
+
+  def thickest(self) -> Optional[Layer]:
+    """Return the thickest layer, i.e., the first one if several are equally thick, or None if the table is empty."""
+    if len(self._tops) == 0:
+      return None
+
+    return self[int(np.argmax(self.thicknesses))]
+
+  def merge_thin(self, min_thickness: float) -> "IntervalTable":
+    """
+    Return the zones in which each zone thinner than *min_thickness* takes the zone number of the thicker one of the nearest zones above and below that aren't thin, and consecutive zones with the same number are joined. A ValueError exception is raised if the table has no zone numbers.
+    """
+    if self._numbers is None:
+      raise ValueError("Only zones with a zone number can be merged.")
+    thicknesses: np.ndarray = self.thicknesses
+    thick: np.ndarray = thicknesses >= min_thickness
+    if thick.all() or not thick.any():
+      return self
+
+    NO_ROWS: int = len(self._tops)
+    rows: np.ndarray = np.arange(NO_ROWS)
+    above: np.ndarray = np.maximum.accumulate(np.where(thick, rows, -1))
+    below: np.ndarray = np.minimum.accumulate(np.where(thick, rows, NO_ROWS)[::-1])[::-1]
+    use_above: np.ndarray = (below == NO_ROWS) | ((above >= 0) & (thicknesses[np.maximum(above, 0)] >=
+                                                                  thicknesses[np.minimum(below, NO_ROWS - 1)]))
+    numbers: np.ndarray = self._numbers[np.where(use_above, above, below)]
+
+    starts: np.ndarray = np.flatnonzero(np.concatenate(([True], numbers[1:] != numbers[:-1])))
+    stops: np.ndarray = np.append(starts[1:], NO_ROWS) - 1
+    return IntervalTable(self._tops[starts], self._bottoms[stops], numbers[starts])
+
+  @classmethod
+  def merge(cls, depths: np.ndarray, zone_nrs: np.ndarray) -> "IntervalTable":
+    """
+    Merge the consecutive measurements at *depths* with the same zone number in *zone_nrs* into zones. A zone boundary lays halfway between two measurements, the first zone starts and the last zone ends half a measurement interval beyond the outer measurements.
+    """
+    depths = np.asarray(depths, dtype = float)
+    zone_nrs = np.asarray(zone_nrs)
+    LEN_MEAS: int = len(depths)
+    if LEN_MEAS == 0:
+      return cls(np.empty(0), np.empty(0), np.empty(0, dtype = np.int8))
+    if LEN_MEAS == 1:
+      bottom: float = depths[0] if depths[0] == 0 else depths[0] + 0.5*depths[0]
+      return cls(depths[:1], np.array([bottom]), zone_nrs[:1])
+
+    changes: np.ndarray = np.flatnonzero(zone_nrs[1:] != zone_nrs[:-1]) + 1 # first measurement of each next zone
+    boundaries: np.ndarray = 0.5*(depths[changes - 1] + depths[changes])
+    tops: np.ndarray = np.concatenate(([depths[0] - 0.5*(depths[1] - depths[0])], boundaries))
+
+    # the last zone is truncated half a measurement interval below the last measurement
+    last_depth: float = depths[-1]
+    previous_end: float = boundaries[-1] if changes.size and changes[-1] == LEN_MEAS - 1 else depths[-2]
+    last_bottom: float = 2*last_depth - tops[-1] if tops[-1] == previous_end else \
+      last_depth + 0.5*(last_depth - previous_end)
+
+    return cls(tops, np.append(boundaries, last_bottom), zone_nrs[np.concatenate(([0], changes))])
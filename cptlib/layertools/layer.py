@@ -9,6 +9,8 @@ class Layer:
 
   Layer objects can also be compared based on their thickness.
   """
+  __slots__ = ('_top', '_bottom')
+
   def __init__(self, top: float, bottom: float):
     """
     Parameters
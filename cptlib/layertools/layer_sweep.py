@@ -0,0 +1,127 @@
+from collections import namedtuple
+from collections.abc import Iterable, Iterator
+
+import numpy as np
+
+from cptlib.layertools.interval_table import IntervalTable
+from cptlib.layertools.scan_kernels import zone_numbers as classify
+from cptlib.probetools.probe import Probe
+
+# The layers of a probe for one combination of a sweep: the maximum cone resistance, the zone number, the number of
+# layers and the top and bottom of the thickest layer (NaN if there are no layers)
+SweepLayers = namedtuple('SweepLayers', ['qc_max', 'zone_number', 'no_layers', 'top', 'bottom'])
+
+
+class LayerSweep:
+  """
+  The layers of *probe* for every combination of a maximum cone resistance in *qc_maxima* and a zone number in *zone_numbers*, i.e., the layers that LayersProbe(probe, zone_number, qc_max) determines for each combination separately.
+
+  The measurements are classified once, after which the layers of all the *qc_maxima* of a zone number are found at once with array operations: whether a measurement lays in a layer is the outcome of the last measurement with a valid qc at or above it. A layer boundary lays halfway between two measurements, the first layer starts and the last layer ends half a measurement interval beyond the outer measurements, as in LayersProbe.
+  """
+  def __init__(self, probe: Probe, qc_maxima: Iterable[float], zone_numbers: Iterable[int] = (0,)):
+    """
+    Parameters
+    __________
+    probe: Probe
+      The probe of which the layers need to be determined.
+    qc_maxima: Iterable[float]
+      The maximum allowable values of qc in a layer.
+    zone_numbers: Iterable[int], default: (0,)
+      The zone numbers of the layers, 0 if the layers aren't constrained to a zone.
+    """
+    self._number: str = probe.number
+    self._qc_maxima: np.ndarray = np.asarray(list(qc_maxima), dtype = float)
+    self._zone_numbers: tuple[int, ...] = tuple(int(zone_nr) for zone_nr in zone_numbers)
+    self._rows: np.ndarray # the combination of each layer, qc_maxima vary fastest
+    self._tops: np.ndarray
+    self._bottoms: np.ndarray
+    self._counts: np.ndarray # the number of layers of each combination
+    self._thickest: np.ndarray # the index of the thickest layer of each combination, -1 if it has no layers
+    self.__sweep(probe)
+
+  def __iter__(self) -> Iterator[SweepLayers]:
+    columns: dict[str, np.ndarray] = self.columns()
+    return (SweepLayers(*row) for row in zip(*(column.tolist() for column in columns.values())))
+
+  def __len__(self) -> int:
+    return len(self._qc_maxima)*len(self._zone_numbers)
+
+  def __repr__(self) -> str:
+    return f'{self.__class__.__name__} <qc_maxima={self._qc_maxima.tolist()}, '\
+    f'zone_numbers={list(self._zone_numbers)}, probe: {self._number}>'
+
+  # ========== PRIVATE METHODS ==========
+
+  def __sweep(self, probe: Probe) -> None:
+    """
+    Determine the layers of all the combinations in *probe* and assign them to the properties _rows, _tops and _bottoms. The number of layers and the thickest layer of each combination are assigned to _counts and _thickest.
+    """
+    depth, qc, fs = probe.columns()
+    validity = probe.validity()
+    LEN_MEAS: int = len(depth)
+    NO_QC_MAXIMA: int = len(self._qc_maxima)
+    zone_nrs: np.ndarray = classify(qc, fs, validity.measurement)
+    qc_available: np.ndarray = np.isfinite(qc) # as in LayersProbe, also a qc that isn't positive is checked
+    # the last measurement with an available qc at or above each measurement, -1 if there is none
+    last_valid: np.ndarray = np.maximum.accumulate(np.where(qc_available, np.arange(LEN_MEAS), -1))
+    with np.errstate(invalid = 'ignore'):
+      below_max: np.ndarray = (qc[None, :] < self._qc_maxima[:, None]) & qc_available # shape (qc_maxima, measurements)
+
+    # the boundaries of a layer that is entered at (or left before) each measurement and of the first and last layer
+    previous: np.ndarray = np.concatenate(([0.0], depth[:-1]))
+    halfway: np.ndarray = 0.5*(previous + depth)
+    if LEN_MEAS > 1:
+      halfway[0] = depth[0] - 0.5*(depth[1] - depth[0])
+    last_bottom: float = depth[-1] + 0.5*(depth[-1] - previous[-1]) if LEN_MEAS else 0.0
+
+    rows: list[np.ndarray] = []
+    tops: list[np.ndarray] = []
+    bottoms: list[np.ndarray] = []
+    for counter, zone_nr in enumerate(self._zone_numbers):
+      target: np.ndarray = below_max if zone_nr == 0 else below_max & (zone_nrs == zone_nr)
+      inside: np.ndarray = np.zeros((NO_QC_MAXIMA, LEN_MEAS + 2), dtype = np.int8)
+      inside[:, 1:-1] = np.where(last_valid >= 0, target[:, np.maximum(last_valid, 0)], False)
+      steps: np.ndarray = np.diff(inside, axis = 1) # +1: the layer is entered, -1: the layer was left
+      entry_rows, entries = np.nonzero(steps == 1)
+      _, exits = np.nonzero(steps == -1)
+      rows.append(entry_rows + counter*NO_QC_MAXIMA)
+      tops.append(halfway[entries])
+      bottoms.append(np.where(exits < LEN_MEAS, halfway[np.minimum(exits, LEN_MEAS - 1)], last_bottom))
+
+    self._rows = np.concatenate(rows) if rows else np.empty(0, dtype = int)
+    self._tops = np.concatenate(tops) if tops else np.empty(0)
+    self._bottoms = np.concatenate(bottoms) if bottoms else np.empty(0)
+    self._counts = np.bincount(self._rows, minlength = len(self))
+
+    # the first of the thickest layers of each combination
+    order: np.ndarray = np.lexsort((np.arange(len(self._rows)), self._tops - self._bottoms, self._rows))
+    firsts: np.ndarray = np.searchsorted(self._rows[order], np.arange(len(self)))
+    self._thickest = np.where(self._counts > 0, order[np.minimum(firsts, max(len(order) - 1, 0))], -1) \
+      if len(order) else np.full(len(self), -1)
+
+  # ========== PUBLIC METHODS ==========
+
+  def columns(self) -> dict[str, np.ndarray]:
+    """
+    Return the maximum cone resistance ('qc_max'), the zone number ('zone_number'), the number of layers ('no_layers') and the top and bottom of the thickest layer ('top' and 'bottom', NaN if there are no layers) of each combination.
+    """
+    has_layers: np.ndarray = self._thickest >= 0
+    thickest: np.ndarray = np.maximum(self._thickest, 0)
+    return {
+      "qc_max": np.tile(self._qc_maxima, len(self._zone_numbers)),
+      "zone_number": np.repeat(np.array(self._zone_numbers, dtype = int), len(self._qc_maxima)),
+      "no_layers": self._counts,
+      "top": np.where(has_layers, self._tops[thickest] if len(self._tops) else np.nan, np.nan),
+      "bottom": np.where(has_layers, self._bottoms[thickest] if len(self._bottoms) else np.nan, np.nan)
+    }
+
+  def layers(self, qc_max: float, zone_number: int = 0) -> IntervalTable:
+    """
+    Return the layers of the combination of *qc_max* and *zone_number*. A KeyError exception is raised if the sweep doesn't contain this combination.
+    """
+    matches: np.ndarray = np.flatnonzero(self._qc_maxima == qc_max)
+    if not matches.size or zone_number not in self._zone_numbers:
+      raise KeyError(f"The sweep contains no layers with qc_max {qc_max} in Zone {zone_number}.")
+
+    in_combination: np.ndarray = self._rows == self._zone_numbers.index(zone_number)*len(self._qc_maxima) + matches[0]
+    return IntervalTable(self._tops[in_combination], self._bottoms[in_combination])
@@ -1,9 +1,13 @@
 from collections.abc import Iterator
+from typing import Optional
 
+import numpy as np
+
+from cptlib.layertools.interval_index import IntervalIndex
+from cptlib.layertools.interval_table import IntervalTable
 from cptlib.layertools.layer import Layer
-from cptlib.layertools.zones_probe import ZonesProbe
+from cptlib.layertools.scan_kernels import layer_bounds
 from cptlib.probetools.probe_list import Probe
-from cptlib.setuptools.measurement import Measurement
 
 
 class LayersProbe:
@@ -24,11 +28,12 @@ class LayersProbe:
     self._qc_max: float = qc_max
     self._number: str = probe.number
     self._zone_number: int = zone_number
-    self._layers: list[Layer] = []
-    self.__find_layers(probe.measurements)
+    self._layers: IntervalTable
+    self._interval_index: Optional[IntervalIndex] = None
+    self.__find_layers(probe)
 
   def __iter__(self) -> Iterator[Layer]:
-    return iter(self._layers)
+    return iter(self._layers) # the Layer objects are created on the fly
 
   def __len__(self) -> int:
     return len(self._layers)
@@ -43,46 +48,28 @@ class LayersProbe:
 
   # ========== PRIVATE METHODS ==========
 
-  def __find_layers(self, measurements: list[Measurement]) -> None:
+  def __find_layers(self, probe: Probe) -> None:
     """
-    Determine the layers of type Zone *zone_number* for which ``qc < 2 MPa`` in the probe that has supplied *measurements* and assign them in a list to the property _layers.
+    Determine the layers of type Zone *zone_number* for which ``qc < 2 MPa`` in *probe* and assign them in an IntervalTable to the property _layers. Every available qc is checked, also a qc that isn't positive, while the ValidityMasks of *probe* tell which measurements can be classified into zones.
     """
-    LEN_MEAS: int = len(measurements)
-    in_layer: bool = False
-    start_layer: float = 0
-    end_layer: float = 0
-    in_zone: bool = True
-    m_zone_nr: int = self._zone_number
-    for counter, m in enumerate(measurements, start = 1):
-      if counter == 2 and in_layer:
-        start_layer = end_layer - 0.5*(m.depth - end_layer)
+    depth, qc, fs = probe.columns()
+    validity = probe.validity()
+    tops, bottoms = layer_bounds(depth, qc, fs, np.isfinite(qc), validity.measurement, self._zone_number, self._qc_max)
+    self._layers = IntervalTable(tops, bottoms)
+
+  # ========== PUBLIC METHODS ==========
+
+  def columns(self) -> tuple[np.ndarray, np.ndarray]:
+    """Return the tops and bottoms of the layers as two arrays."""
+    return self._layers.tops, self._layers.bottoms
 
-      if m_zone_nr > 0:
-        try: # measurement can have NoneType
-          m_Rf: float = ZonesProbe.friction_ratio(m)
-        except TypeError:
-          in_zone = False
-        else:
-          m_ISBT: float = ZonesProbe.SBT_index(m_Rf, m.qc)
-          m_zone_nr: int = ZonesProbe.zone_number(m_Rf, m.qc, m_ISBT)
-          in_zone = bool(m_zone_nr == self._zone_number)
+  def interval_index(self) -> IntervalIndex:
+    """Return an index over the layers that answers depth queries in logarithmic time."""
+    if self._interval_index is None:
+      self._interval_index = IntervalIndex(self._layers)
 
-      check_in_layer: bool = False
-      try: # m.qc can have NoneType
-        check_in_layer = m.qc < self._qc_max
-      except TypeError:
-        pass
-      else:
-        if check_in_layer and in_zone and not in_layer: # enter the layer
-          in_layer = True
-          start_layer = 0.5*(end_layer + m.depth)
-        elif (not check_in_layer or not in_zone) and in_layer: # leave the layer
-          in_layer = False
-          end_layer = 0.5*(end_layer + m.depth)
-          self._layers.append(Layer(start_layer, end_layer))
-      
-      if counter == LEN_MEAS and in_layer: # last measurement: truncate the layer
-        end_layer = m.depth + 0.5*(m.depth - end_layer)
-        self._layers.append(Layer(start_layer, end_layer))
+    return self._interval_index
 
-      end_layer = m.depth
+  def thickest(self) -> Optional[Layer]:
+    """Return the thickest layer, i.e., the first one if several are equally thick, or None if there are no layers."""
+    return self._layers.thickest()
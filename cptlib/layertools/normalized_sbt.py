@@ -0,0 +1,102 @@
+from collections import namedtuple
+from typing import Optional
+
+import numpy as np
+
+ATM_PRESS: float = 100.0 # kPa
+UNIT_WEIGHT_SOIL: float = 18.0 # kN/m3
+UNIT_WEIGHT_WATER: float = 9.81 # kN/m3
+
+NormalizedSBT = namedtuple('NormalizedSBT', ['Qtn', 'Fr', 'Ic', 'n', 'valid', 'converged'])
+
+def normalized_SBT(depth: np.ndarray, qc: np.ndarray, fs: np.ndarray, gw_depth: Optional[float] = None,
+                   unit_weight: float = UNIT_WEIGHT_SOIL, tolerance: float = 0.01,
+                   max_iterations: int = 20) -> NormalizedSBT:
+  """
+  Return the normalized cone resistance Qtn, the normalized friction ratio Fr (%), the normalized Soil Behaviour Type
+  Index Ic and the stress exponent n of each measurement according to Robertson (2009).
+
+  The stress exponent n depends on Ic, which in turn depends on n. This fixed-point problem is solved for all
+  measurements at once: every iteration updates the arrays of the measurements that haven't converged yet, i.e., for
+  which n changed more than *tolerance* in the previous iteration. The iteration stops when all measurements have
+  converged or after *max_iterations* iterations.
+
+  Parameters
+  __________
+  depth: np.ndarray
+    The depth (m) of the measurements.
+  qc: np.ndarray
+    The cone resistance (MPa) of the measurements. No pore pressures are available, so qt is taken equal to qc.
+  fs: np.ndarray
+    The sleeve friction (kPa) of the measurements.
+  gw_depth: float, optional
+    The depth (m) of the groundwater table. If unavailable, the groundwater table is assumed to be at the surface.
+  unit_weight: float, default: UNIT_WEIGHT_SOIL
+    The unit weight (kN/m3) of the soil used to determine the vertical stress.
+  tolerance: float, default: 0.01
+    The maximum change of n between two iterations for a measurement to have converged.
+  max_iterations: int, default: 20
+    The maximum number of iterations.
+
+  The mask *valid* is False for measurements that cannot be normalized (unavailable or non-positive qc or fs and
+  non-positive net cone resistance) and *converged* is False for valid measurements that didn't converge.
+  """
+  qt: np.ndarray = 1000*qc # convert from MPa to kPa
+  sigma_v0: np.ndarray = unit_weight*depth
+  u0: np.ndarray = UNIT_WEIGHT_WATER*np.maximum(depth - (gw_depth or 0.0), 0.0)
+  sigma_v0_eff: np.ndarray = sigma_v0 - u0
+  q_net: np.ndarray = qt - sigma_v0
+
+  with np.errstate(invalid='ignore'):
+    valid: np.ndarray = (qc > 0) & (fs > 0) & (q_net > 0) & (sigma_v0_eff > 0)
+
+  # Replace the invalid entries by harmless values such that no warnings are raised
+  q_net = np.where(valid, q_net, ATM_PRESS)
+  sigma_v0_eff = np.where(valid, sigma_v0_eff, ATM_PRESS)
+  Fr: np.ndarray = np.where(valid, fs, 1.0)*100/q_net
+  log_Fr: np.ndarray = np.log10(Fr)
+  log_q_net: np.ndarray = np.log10(q_net/ATM_PRESS)
+  log_stress_ratio: np.ndarray = np.log10(ATM_PRESS/sigma_v0_eff)
+
+  n: np.ndarray = np.ones_like(q_net)
+  Ic: np.ndarray = np.zeros_like(q_net)
+  active: np.ndarray = valid.copy()
+  for _ in range(max_iterations):
+    if not active.any():
+      break
+
+    log_Qtn: np.ndarray = log_q_net[active] + n[active]*log_stress_ratio[active]
+    Ic[active] = np.sqrt((3.47 - log_Qtn)**2 + (log_Fr[active] + 1.22)**2)
+    n_new: np.ndarray = np.minimum(0.381*Ic[active] + 0.05*sigma_v0_eff[active]/ATM_PRESS - 0.15, 1.0)
+
+    converged_now: np.ndarray = np.abs(n_new - n[active]) < tolerance
+    n[active] = n_new
+    active[active] = ~converged_now
+
+  Qtn: np.ndarray = 10**(log_q_net + n*log_stress_ratio)
+  Ic = np.sqrt((np.log10(Qtn) - 3.47)**2 + (log_Fr + 1.22)**2)
+
+  return NormalizedSBT(Qtn = np.where(valid, Qtn, np.nan), Fr = np.where(valid, Fr, np.nan),
+                       Ic = np.where(valid, Ic, np.nan), n = np.where(valid, n, np.nan), valid = valid,
+                       converged = valid & ~active)
+
+def normalized_zone_numbers(sbt: NormalizedSBT) -> np.ndarray:
+  """
+  Determine the SBTs of the normalized measurements in *sbt* using the updated Robertson method and return the
+  corresponding zone numbers. Measurements that could not be normalized belong to Zone 0.
+  """
+  with np.errstate(divide='ignore', invalid='ignore'):
+    threshold: np.ndarray = 1.0/(0.005*(sbt.Fr-1) - 0.0003*(sbt.Fr-1)**2 - 0.002)
+    conditions: list[np.ndarray] = [
+      ~sbt.valid,
+      (sbt.Fr > 4.5) & (sbt.Qtn >= threshold),
+      (sbt.Fr > 1.5) & (sbt.Fr <= 4.5) & (sbt.Qtn >= threshold),
+      sbt.Qtn < 12*np.exp(-1.4*sbt.Fr),
+      sbt.Ic > 3.6,
+      sbt.Ic > 2.95,
+      sbt.Ic > 2.6,
+      sbt.Ic > 2.05,
+      sbt.Ic > 1.31
+    ]
+
+  return np.select(conditions, [0, 9, 8, 1, 2, 3, 4, 5, 6], default = 7)
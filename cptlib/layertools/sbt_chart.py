@@ -0,0 +1,147 @@
+from collections.abc import Iterable
+from functools import lru_cache
+
+import numpy as np
+from matplotlib.colors import LogNorm
+
+from cptlib.layertools.normalized_sbt import ATM_PRESS
+from cptlib.layertools.scan_kernels import zone_numbers
+from cptlib.probetools.probe import Probe
+from cptlib.setuptools.graph_set_up import GraphSetUp
+
+# The extent of the Robertson chart: the friction ratio (%) and the cone resistance normalized by the atmospheric
+# pressure, both on a logarithmic scale
+RF_RANGE: tuple[float, float] = (0.1, 10.0)
+QC_RANGE: tuple[float, float] = (1.0, 1000.0)
+BINS: tuple[int, int] = (200, 200) # along the friction ratio and the normalized cone resistance
+CHUNK_SIZE: int = 1 << 16 # measurements binned at a time
+BOUNDARY_RESOLUTION: int = 600 # the points per axis at which the zone numbers are evaluated for the boundaries
+
+
+def log_edges(value_range: tuple[float, float], no_bins: int) -> np.ndarray:
+  """Return the *no_bins* + 1 edges of the bins that split *value_range* evenly on a logarithmic scale."""
+  return np.logspace(np.log10(value_range[0]), np.log10(value_range[1]), no_bins + 1)
+
+@lru_cache(maxsize = 4)
+def zone_grid(no_points: int = BOUNDARY_RESOLUTION) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+  """
+  Return the friction ratios and normalized cone resistances of a grid of *no_points* by *no_points* points spread evenly over the chart on a logarithmic scale, together with the zone number of each point (shape (no_points, no_points), the friction ratio along the second axis) according to ZonesProbe.zone_number. The grid is computed once per *no_points*, so the arrays are read-only.
+  """
+  Rf: np.ndarray = np.logspace(np.log10(RF_RANGE[0]), np.log10(RF_RANGE[1]), no_points)
+  qc_norm: np.ndarray = np.logspace(np.log10(QC_RANGE[0]), np.log10(QC_RANGE[1]), no_points)
+  qc_grid, Rf_grid = np.meshgrid(qc_norm*ATM_PRESS/1000, Rf, indexing = 'ij') # qc in MPa
+  fs_grid: np.ndarray = Rf_grid*1000*qc_grid/100 # kPa
+  numbers: np.ndarray = zone_numbers(qc_grid.ravel(), fs_grid.ravel(), np.ones(qc_grid.size, dtype = bool))
+  numbers = numbers.reshape(no_points, no_points)
+  for array in (Rf, qc_norm, numbers):
+    array.flags.writeable = False
+  return Rf, qc_norm, numbers
+
+
+class SBTChart:
+  """
+  The Robertson chart of the soil behaviour types: the measurements of any number of probes are counted in a histogram of *bins* bins over the friction ratio and the normalized cone resistance on a logarithmic scale (see RF_RANGE and QC_RANGE). The measurements are binned in chunks as they are added, such that the memory and the time to render the chart don't depend on the number of measurements.
+
+  The measurements outside the chart are counted separately. Only the valid measurements of a probe are added.
+  """
+  def __init__(self, bins: tuple[int, int] = BINS):
+    """
+    Parameters
+    __________
+    bins: tuple[int, int], default: BINS
+      The number of bins along the friction ratio and along the normalized cone resistance.
+    """
+    self._bins: tuple[int, int] = bins
+    self._counts: np.ndarray = np.zeros(bins, dtype = np.int64)
+    self._no_outside: int = 0
+    self._no_probes: int = 0
+    self._log_Rf_range: tuple[float, float] = (np.log10(RF_RANGE[0]), np.log10(RF_RANGE[1]))
+    self._log_qc_range: tuple[float, float] = (np.log10(QC_RANGE[0]), np.log10(QC_RANGE[1]))
+
+  def __len__(self) -> int:
+    return int(self._counts.sum())
+
+  def __repr__(self) -> str:
+    return f'{self.__class__.__name__}(bins={self._bins}, measurements={len(self)}, outside={self._no_outside})'
+
+  # ========== PRIVATE METHODS ==========
+
+  def __bin_indices(self, values: np.ndarray, log_range: tuple[float, float], no_bins: int) -> np.ndarray:
+    """Return the bin of each value in *values* along an axis, -1 if it lays outside *log_range*."""
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+      positions: np.ndarray = (np.log10(values) - log_range[0])/(log_range[1] - log_range[0])*no_bins
+    inside: np.ndarray = (positions >= 0) & (positions <= no_bins) # the upper edge belongs to the last bin
+    return np.where(inside, np.minimum(np.floor(np.where(inside, positions, 0)), no_bins - 1), -1).astype(np.int64)
+
+  # ========== PUBLIC METHODS ==========
+
+  @property
+  def counts(self) -> np.ndarray:
+    """Return the number of measurements in each bin (shape *bins*)."""
+    return self._counts
+
+  @property
+  def no_probes(self) -> int:
+    """Return the number of probes that have been added."""
+    return self._no_probes
+
+  @property
+  def no_outside(self) -> int:
+    """Return the number of measurements that lay outside the chart."""
+    return self._no_outside
+
+  def add(self, qc: np.ndarray, fs: np.ndarray) -> None:
+    """
+    Count the measurements with cone resistance *qc* (MPa) and friction *fs* (kPa) in the bins of the chart. The measurements are required to be valid.
+    """
+    qc, fs = np.asarray(qc, dtype = float), np.asarray(fs, dtype = float)
+    NO_Rf_BINS, NO_QC_BINS = self._bins
+    for start in range(0, len(qc), CHUNK_SIZE):
+      qc_chunk: np.ndarray = qc[start:start + CHUNK_SIZE]
+      Rf: np.ndarray = fs[start:start + CHUNK_SIZE]*100/(1000*qc_chunk)
+      Rf_bins: np.ndarray = self.__bin_indices(Rf, self._log_Rf_range, NO_Rf_BINS)
+      qc_bins: np.ndarray = self.__bin_indices(1000*qc_chunk/ATM_PRESS, self._log_qc_range, NO_QC_BINS)
+      inside: np.ndarray = (Rf_bins >= 0) & (qc_bins >= 0)
+      self._counts += np.bincount(Rf_bins[inside]*NO_QC_BINS + qc_bins[inside],
+                                  minlength = NO_Rf_BINS*NO_QC_BINS).reshape(self._bins)
+      self._no_outside += int(len(qc_chunk) - inside.sum())
+
+  def add_probe(self, probe: Probe) -> None:
+    """Count the valid measurements of *probe* in the bins of the chart."""
+    _, qc, fs = probe.columns()
+    valid: np.ndarray = probe.validity().measurement
+    self.add(qc[valid], fs[valid])
+    self._no_probes += 1
+
+  def add_probes(self, probes: Iterable[Probe]) -> None:
+    """Count the valid measurements of all *probes* in the bins of the chart."""
+    for probe in probes:
+      self.add_probe(probe)
+
+  def visualize(self, graph: GraphSetUp) -> None:
+    """
+    Draw the chart in *graph*: the number of measurements in each bin as a density image on a logarithmic color scale, overlaid with the boundaries of the zones of ZonesProbe.zone_number and their zone numbers.
+    """
+    Rf_edges: np.ndarray = log_edges(RF_RANGE, self._bins[0])
+    qc_edges: np.ndarray = log_edges(QC_RANGE, self._bins[1])
+    counts: np.ma.MaskedArray = np.ma.masked_equal(self._counts.T, 0) # empty bins are transparent
+    if counts.count():
+      image = graph.axes.pcolormesh(Rf_edges, qc_edges, counts, norm = LogNorm(vmin = 1, vmax = counts.max()),
+                                    cmap = 'viridis', shading = 'flat', rasterized = True)
+      graph.colorbar(image, ax = graph.axes, label = '# measurements')
+
+    Rf, qc_norm, numbers = zone_grid()
+    graph.axes.contour(Rf, qc_norm, numbers, levels = np.arange(0.5, 9.5), colors = 'k', linewidths = 0.8)
+    log_Rf, log_qc = np.meshgrid(np.log10(Rf), np.log10(qc_norm))
+    for zone_nr in np.unique(numbers).tolist(): # the label at the centre of the zone on the chart
+      in_zone: np.ndarray = numbers == zone_nr
+      graph.axes.text(10**np.median(log_Rf[in_zone]), 10**np.median(log_qc[in_zone]), str(zone_nr),
+                      ha = 'center', va = 'center', fontsize = 'small', fontweight = 'bold',
+                      bbox = {'facecolor': 'white', 'alpha': 0.6, 'edgecolor': 'none', 'pad': 1})
+
+    graph.axes.set_xscale('log')
+    graph.axes.set_yscale('log')
+    graph.axes.set_xlim(*RF_RANGE)
+    graph.axes.set_ylim(*QC_RANGE)
+    graph.axes.set_xlabel('Rf [%]')
+    graph.axes.set_ylabel('qc/pa [-]')
@@ -0,0 +1,142 @@
+from math import exp, log10, sqrt
+
+import numpy as np
+
+from cptlib.layertools.normalized_sbt import ATM_PRESS
+
+try: # the kernels are compiled to machine code if numba is installed
+  from numba import njit
+  from numba.extending import register_jitable
+except ImportError:
+  njit = register_jitable = None
+
+# The sequential scans over the columns of a probe. Each kernel is written once in plain Python over indexable columns:
+# it runs as it is on lists and, if numba is installed, compiled on numpy arrays. Both give identical results.
+COMPILED: bool = njit is not None
+
+def jitable(function):
+  """Return *function* such that it can be called both from Python and from a compiled kernel."""
+  return function if register_jitable is None else register_jitable(function)
+
+@jitable
+def SBT_index(Rf: float, qc: float) -> float:
+  """Return the non-normalized Soil Behaviour Type Index of a measurement with friction ratio *Rf* and cone resistance *qc*."""
+  qc_kPa = 1000*qc # convert from MPa to kPa
+  a = 3.47 - log10(qc_kPa/ATM_PRESS)
+  b = 1.22 + log10(Rf)
+
+  return sqrt(a**2 + b**2)
+
+@jitable
+def zone_number(Rf: float, qc: float, SBT_index: float) -> int:
+  """
+  Determine the SBT using the updated Robertson method and return the corresponding zone number.
+  """
+  qc_kPa = 1000*qc # convert from MPa to kPa
+  threshold = 1.0/(0.006*(Rf-0.9)-0.004*(Rf-0.9)**2-0.005)
+  if Rf > 4.5 and qc_kPa/ATM_PRESS >= threshold:
+    return 9
+  elif Rf > 1.5 and Rf <= 4.5 and qc_kPa/ATM_PRESS >= threshold:
+    return 8
+  elif qc_kPa/ATM_PRESS < 12*exp(-1.4*Rf):
+    return 1
+  elif SBT_index > 3.6:
+    return 2
+  elif SBT_index > 2.95:
+    return 3
+  elif SBT_index > 2.6:
+    return 4
+  elif SBT_index > 2.05:
+    return 5
+  elif SBT_index > 1.31:
+    return 6
+  else:
+    return 7
+
+@jitable
+def classify(qc, fs, indices, zone_nrs) -> None:
+  """
+  Assign the zone number of each measurement with an index in *indices* to *zone_nrs*.
+  """
+  for index in indices:
+    m_Rf = fs[index]*100/(1000*qc[index]) # the friction ratio in percent
+    zone_nrs[index] = zone_number(m_Rf, qc[index], SBT_index(m_Rf, qc[index]))
+
+@jitable
+def scan_layers(depth, qc, fs, qc_valid, valid, zone_nr: int, qc_max: float, tops, bottoms) -> int:
+  """
+  Assign the tops and bottoms of the layers over which ``qc < *qc_max*``, constrained to Zone *zone_nr* if it isn't 0, to *tops* and *bottoms* and return the number of layers. A layer boundary lays halfway between two measurements, the first layer starts and the last layer ends half a measurement interval beyond the outer measurements. Only the qc values that are valid according to *qc_valid* and the zone numbers of the measurements that are valid according to *valid* are checked.
+  """
+  LEN_MEAS = len(depth)
+  no_layers = 0
+  in_layer = False
+  start_layer = 0.0
+  end_layer = 0.0
+  in_zone = True
+  m_zone_nr = zone_nr
+  for index in range(LEN_MEAS):
+    m_depth = depth[index]
+    if index == 1 and in_layer:
+      start_layer = end_layer - 0.5*(m_depth - end_layer)
+
+    if m_zone_nr > 0:
+      if valid[index]:
+        m_Rf = fs[index]*100/(1000*qc[index]) # the friction ratio in percent
+        m_zone_nr = zone_number(m_Rf, qc[index], SBT_index(m_Rf, qc[index]))
+        in_zone = m_zone_nr == zone_nr
+      else:
+        in_zone = False
+
+    if qc_valid[index]:
+      check_in_layer = qc[index] < qc_max
+      if check_in_layer and in_zone and not in_layer: # enter the layer
+        in_layer = True
+        start_layer = 0.5*(end_layer + m_depth)
+      elif (not check_in_layer or not in_zone) and in_layer: # leave the layer
+        in_layer = False
+        end_layer = 0.5*(end_layer + m_depth)
+        tops[no_layers] = start_layer
+        bottoms[no_layers] = end_layer
+        no_layers += 1
+
+    if index == LEN_MEAS - 1 and in_layer: # last measurement: truncate the layer
+      end_layer = m_depth + 0.5*(m_depth - end_layer)
+      tops[no_layers] = start_layer
+      bottoms[no_layers] = end_layer
+      no_layers += 1
+
+    end_layer = m_depth
+
+  return no_layers
+
+_classify_compiled = None if njit is None else njit(cache = True)(classify)
+_scan_layers_compiled = None if njit is None else njit(cache = True)(scan_layers)
+
+def zone_numbers(qc: np.ndarray, fs: np.ndarray, valid: np.ndarray, compiled: bool = COMPILED) -> np.ndarray:
+  """
+  Return the zone numbers of the measurements with columns *qc* and *fs*. The measurements that aren't *valid* belong to Zone 0 (Unknown). The compiled kernel is used if *compiled* is True and numba is installed.
+  """
+  zone_nrs: np.ndarray = np.zeros(len(qc), dtype = np.int8)
+  if compiled and _classify_compiled is not None:
+    _classify_compiled(np.asarray(qc, dtype = float), np.asarray(fs, dtype = float), np.flatnonzero(valid), zone_nrs)
+  else: # python floats are faster to compute with one at a time than numpy scalars
+    classify(qc.tolist(), fs.tolist(), np.flatnonzero(valid).tolist(), zone_nrs)
+
+  return zone_nrs
+
+def layer_bounds(depth: np.ndarray, qc: np.ndarray, fs: np.ndarray, qc_valid: np.ndarray, valid: np.ndarray,
+                 zone_nr: int, qc_max: float, compiled: bool = COMPILED) -> tuple[np.ndarray, np.ndarray]:
+  """
+  Return the tops and bottoms of the layers found by *scan_layers* in the measurements with columns *depth*, *qc* and *fs*. The compiled kernel is used if *compiled* is True and numba is installed.
+  """
+  MAX_LAYERS: int = len(depth)//2 + 1 # a measurement outside separates two layers
+  tops, bottoms = np.empty(MAX_LAYERS), np.empty(MAX_LAYERS)
+  if compiled and _scan_layers_compiled is not None:
+    no_layers: int = _scan_layers_compiled(np.asarray(depth, dtype = float), np.asarray(qc, dtype = float),
+                                           np.asarray(fs, dtype = float), np.asarray(qc_valid, dtype = bool),
+                                           np.asarray(valid, dtype = bool), zone_nr, qc_max, tops, bottoms)
+  else:
+    no_layers = scan_layers(depth.tolist(), qc.tolist(), fs.tolist(), qc_valid.tolist(), valid.tolist(), zone_nr,
+                            qc_max, tops, bottoms)
+
+  return tops[:no_layers].copy(), bottoms[:no_layers].copy()
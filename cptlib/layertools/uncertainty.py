@@ -0,0 +1,164 @@
+from collections import namedtuple
+
+import numpy as np
+
+from cptlib.layertools.interval_table import IntervalTable
+from cptlib.layertools.normalized_sbt import ATM_PRESS
+from cptlib.probetools.probe import Probe
+
+# The measurement error of a column: with the 'normal' *distribution*, a value is perturbed by a normally distributed
+# error with a standard deviation of *relative* times the value and *absolute* (in the unit of the column) combined;
+# with the 'lognormal' *distribution*, a value is multiplied by a lognormal factor with mean 1 and log standard deviation
+# *relative*, such that its sign is kept, after which the normally distributed *absolute* error is added
+ErrorModel = namedtuple('ErrorModel', ['relative', 'absolute', 'distribution'], defaults = (0.0, 0.0, 'normal'))
+
+# The Monte Carlo classification of a probe: the error models of qc (MPa) and fs (kPa), the number of realizations of
+# the probe and the seed of the random number generator, such that a classification can be reproduced
+UncertaintyPolicy = namedtuple('UncertaintyPolicy', ['qc', 'fs', 'realizations', 'seed'],
+                               defaults = (ErrorModel(0.05), ErrorModel(0.10), 100, 0))
+
+DISTRIBUTIONS: tuple[str, ...] = ('normal', 'lognormal')
+NO_ZONES: int = 10 # Zone 0 (Unknown) to Zone 9
+BATCH_SIZE: int = 1 << 19 # values of the realizations classified at a time
+INDEX_BOUNDS: np.ndarray = np.array([1.31, 2.05, 2.6, 2.95, 3.6]) # the SBT indices that bound Zone 7 to Zone 2
+
+
+def check_uncertainty(policy: UncertaintyPolicy) -> None:
+  """Raise a ValueError if *policy* isn't a valid UncertaintyPolicy."""
+  for name, model in (('qc', policy.qc), ('fs', policy.fs)):
+    if not (model.relative >= 0 and model.absolute >= 0): # NaN isn't allowed either
+      raise ValueError(f"The relative and absolute errors of {name} must be non-negative.")
+    if model.distribution not in DISTRIBUTIONS:
+      raise ValueError(f"The distribution of the errors of {name} must be one of {', '.join(DISTRIBUTIONS)}.")
+  if policy.realizations < 1:
+    raise ValueError("realizations must be at least 1.")
+
+def perturb(values: np.ndarray, model: ErrorModel, no_realizations: int, rng: np.random.Generator) -> np.ndarray:
+  """
+  Return *no_realizations* realizations of the column *values* (shape (no_realizations, len(values))) according to the error model *model*, drawn from *rng*.
+  """
+  realizations: np.ndarray = np.broadcast_to(values, (no_realizations, len(values)))
+  if model.distribution == 'lognormal':
+    if model.relative > 0:
+      realizations = realizations*np.exp(rng.normal(-0.5*model.relative**2, model.relative, realizations.shape))
+    if model.absolute > 0:
+      realizations = realizations + rng.normal(0.0, model.absolute, realizations.shape)
+  elif model.relative > 0 or model.absolute > 0:
+    scale: np.ndarray = np.sqrt((model.relative*values)**2 + model.absolute**2)
+    realizations = realizations + scale*rng.standard_normal(realizations.shape)
+  return realizations
+
+def batch_zone_numbers(qc: np.ndarray, fs: np.ndarray) -> np.ndarray:
+  """
+  Return the zone numbers of the measurements with cone resistance *qc* (MPa) and friction *fs* (kPa) of any shape, as ZonesProbe.zone_number determines them one by one. The measurements of which qc or fs isn't finite and positive belong to Zone 0 (Unknown).
+  """
+  with np.errstate(divide = 'ignore', invalid = 'ignore', over = 'ignore'):
+    qc_kPa: np.ndarray = 1000*qc # convert from MPa to kPa
+    Rf: np.ndarray = fs*100/qc_kPa # the friction ratio in percent
+    qc_norm: np.ndarray = qc_kPa/ATM_PRESS
+    index: np.ndarray = np.sqrt((3.47 - np.log10(qc_norm))**2 + (1.22 + np.log10(Rf))**2)
+    threshold: np.ndarray = 1.0/(0.006*(Rf-0.9)-0.004*(Rf-0.9)**2-0.005)
+    zone_nrs: np.ndarray = 7 - np.searchsorted(INDEX_BOUNDS, index).astype(np.int8) # Zone 2 to 7 by the index
+    zone_nrs[qc_norm < 12*np.exp(-1.4*Rf)] = 1
+    stiff: np.ndarray = (Rf > 1.5) & (qc_norm >= threshold)
+    zone_nrs[stiff] = np.where(Rf[stiff] > 4.5, 9, 8)
+    valid: np.ndarray = np.isfinite(qc) & np.isfinite(fs) & (qc > 0) & (fs > 0)
+  zone_nrs[~valid] = 0
+  return zone_nrs
+
+
+class UncertainZones:
+  """
+  The soil behaviour types of *probe* under measurement uncertainty: the qc and fs columns of the probe are perturbed *policy.realizations* times according to the error models of *policy* and the realizations are classified as ZonesProbe classifies the probe. The realizations are classified together with array operations, in batches of about BATCH_SIZE values, such that thousands of realizations stay practical.
+
+  The share of the realizations in which a measurement belongs to a zone is its probability to belong to that zone. The most likely zone of each measurement gives the most likely zonation of the probe. The measurements that aren't valid belong to Zone 0 (Unknown) in every realization.
+  """
+  def __init__(self, probe: Probe, policy: UncertaintyPolicy = UncertaintyPolicy()):
+    """
+    Parameters
+    __________
+    probe: Probe
+      The probe of which the SBTs need to be determined.
+    policy: UncertaintyPolicy, default: UncertaintyPolicy()
+      The error models of qc and fs, the number of realizations and the seed of the random number generator.
+    """
+    check_uncertainty(policy)
+    self._number: str = probe.number
+    self._policy: UncertaintyPolicy = policy
+    self._depth: np.ndarray
+    self._counts: np.ndarray # the number of realizations in which each measurement belongs to each zone
+    self._zones: IntervalTable
+    self.__classify(probe)
+
+  def __len__(self) -> int:
+    return len(self._zones)
+
+  def __repr__(self) -> str:
+    return f'{self.__class__.__name__} <realizations={self._policy.realizations}, probe: {self._number}>'
+
+  # ========== PRIVATE METHODS ==========
+
+  def __classify(self, probe: Probe) -> None:
+    """
+    Classify the realizations of *probe* in batches and assign the depth of the measurements, the number of realizations per measurement and zone and the most likely zones to the properties _depth, _counts and _zones.
+    """
+    self._depth, qc, fs = probe.columns()
+    valid: np.ndarray = probe.validity().measurement
+    LEN_MEAS: int = len(self._depth)
+    qc, fs = qc[valid], fs[valid] # only the valid measurements are perturbed
+    rng: np.random.Generator = np.random.default_rng(self._policy.seed)
+    offsets: np.ndarray = NO_ZONES*np.flatnonzero(valid) # the first bin of each valid measurement
+    counts: np.ndarray = np.zeros(LEN_MEAS*NO_ZONES, dtype = np.int64)
+    counts[NO_ZONES*np.flatnonzero(~valid)] = self._policy.realizations # Zone 0 in every realization
+    batch_realizations: int = max(1, BATCH_SIZE//max(len(qc), 1))
+    for start in range(0, self._policy.realizations if len(qc) else 0, batch_realizations):
+      no_realizations: int = min(batch_realizations, self._policy.realizations - start)
+      zone_nrs: np.ndarray = batch_zone_numbers(perturb(qc, self._policy.qc, no_realizations, rng),
+                                                perturb(fs, self._policy.fs, no_realizations, rng))
+      counts += np.bincount((zone_nrs + offsets).ravel(), minlength = LEN_MEAS*NO_ZONES)
+
+    self._counts = counts.reshape(LEN_MEAS, NO_ZONES)
+    self._zones = IntervalTable.merge(self._depth, self.most_likely()[0])
+
+  # ========== PUBLIC METHODS ==========
+
+  def columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the tops, bottoms and zone numbers of the most likely zones as three arrays."""
+    return self._zones.tops, self._zones.bottoms, self._zones.numbers
+
+  @property
+  def depth(self) -> np.ndarray:
+    """Return the depth of the measurements."""
+    return self._depth
+
+  @property
+  def interval_table(self) -> IntervalTable:
+    """Return the most likely zones as columns."""
+    return self._zones
+
+  def most_likely(self) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the most likely zone number of each measurement and its probability. Of equally likely zones, the lowest zone number is taken.
+    """
+    zone_nrs: np.ndarray = np.argmax(self._counts, axis = 1).astype(np.int8)
+    return zone_nrs, self.probabilities[np.arange(len(zone_nrs)), zone_nrs]
+
+  @property
+  def policy(self) -> UncertaintyPolicy:
+    return self._policy
+
+  @property
+  def probabilities(self) -> np.ndarray:
+    """Return the probability of each measurement to belong to each zone (shape (measurements, NO_ZONES))."""
+    return self._counts/self._policy.realizations
+
+  def zone_probabilities(self) -> np.ndarray:
+    """
+    Return the mean probability of the measurements in each most likely zone to belong to the zone.
+    """
+    zone_nrs, probabilities = self.most_likely()
+    changes: np.ndarray = np.flatnonzero(zone_nrs[1:] != zone_nrs[:-1]) + 1 # the first measurement of each next zone
+    starts: np.ndarray = np.concatenate(([0], changes)) if len(zone_nrs) else np.empty(0, dtype = int)
+    if not len(starts):
+      return np.empty(0)
+    return np.add.reduceat(probabilities, starts)/np.diff(np.append(starts, len(zone_nrs)))
@@ -0,0 +1,276 @@
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from collections.abc import Hashable, Iterable
+from math import ceil, inf
+from typing import Optional
+
+import numpy as np
+
+from cptlib.layertools.interval_index import IntervalIndex
+from cptlib.layertools.interval_table import IntervalTable
+from cptlib.layertools.zones_cache import ZonesCache
+from cptlib.layertools.zones_probe import ZonesProbe
+from cptlib.probetools.preprocessing import PreprocessingPolicy
+from cptlib.probetools.probe import Probe
+
+try: # a KD-tree answers the neighbour queries faster than comparing each cell with all probes (the extra 'kdtree')
+  from scipy.spatial import cKDTree
+except ImportError:
+  cKDTree = None
+
+# The coordinates of the centres of the cells along the x, y and depth axes of a voxel model
+VoxelAxes = namedtuple('VoxelAxes', ['x', 'y', 'depth'])
+
+NO_DATA: int = -1 # the value of the cells that no probe reaches
+NO_ZONES: int = 10
+METHODS: tuple[str, ...] = ('nearest', 'idw')
+MAX_CHUNK_CELLS: int = 1 << 22 # cells interpolated at a time, which bounds the memory in use
+OPEN_ATTEMPTS: int = 10 # to open a model of which the files are being replaced by a new build
+
+
+def resample_zones(zones: IntervalTable, depths: np.ndarray) -> np.ndarray:
+  """Return the zone number at each depth in *depths*, or NO_DATA if no zone contains the depth."""
+  indices: np.ndarray = IntervalIndex(zones).locate(depths)
+  return np.where(indices >= 0, zones.numbers[np.maximum(indices, 0)], NO_DATA).astype(np.int8)
+
+def nearest_neighbours(points: np.ndarray, queries: np.ndarray, k: int,
+                       max_distance: float = inf) -> tuple[np.ndarray, np.ndarray]:
+  """
+  Return the distances and the indices of the *k* points among *points* (shape (n, 2)) that are nearest to each query point in *queries* (shape (m, 2)), both of shape (m, k) and sorted by distance. Neighbours further than *max_distance* and missing neighbours if *k* > n get an infinite distance and the index n.
+  """
+  NO_POINTS: int = len(points)
+  if cKDTree is not None:
+    distances, indices = cKDTree(points).query(queries, k = k, distance_upper_bound = max_distance)
+    return distances.reshape(len(queries), k), indices.reshape(len(queries), k)
+
+  QUERIES_PER_CHUNK: int = max(1, MAX_CHUNK_CELLS//NO_POINTS) # compare all the points with a chunk of queries
+  if len(queries) > QUERIES_PER_CHUNK:
+    chunks: list[tuple[np.ndarray, np.ndarray]] = [
+      nearest_neighbours(points, queries[start:start + QUERIES_PER_CHUNK], k, max_distance)
+      for start in range(0, len(queries), QUERIES_PER_CHUNK)]
+    return np.concatenate([chunk[0] for chunk in chunks]), np.concatenate([chunk[1] for chunk in chunks])
+
+  distances = np.hypot(queries[:, None, 0] - points[None, :, 0], queries[:, None, 1] - points[None, :, 1])
+  if k < NO_POINTS:
+    indices = np.argpartition(distances, k - 1, axis = 1)[:, :k]
+  else:
+    indices = np.broadcast_to(np.arange(NO_POINTS), (len(queries), NO_POINTS))
+  distances = np.take_along_axis(distances, indices, axis = 1)
+  order: np.ndarray = np.argsort(distances, axis = 1, kind = 'stable')
+  distances, indices = np.take_along_axis(distances, order, axis = 1), np.take_along_axis(indices, order, axis = 1)
+
+  if k > NO_POINTS: # pad like the KD-tree
+    distances = np.pad(distances, ((0, 0), (0, k - NO_POINTS)), constant_values = inf)
+    indices = np.pad(indices, ((0, 0), (0, k - NO_POINTS)), constant_values = NO_POINTS)
+  far: np.ndarray = distances > max_distance
+  return np.where(far, inf, distances), np.where(far, NO_POINTS, indices)
+
+
+class VoxelModel:
+  """
+  A 3D model of the soil behaviour types on a regular grid of cells (depth, y, x) stored in the memory-mapped array *file_name*.npy with its axes in *file_name*.json. The zone number of each cell is NO_DATA if the neighbouring probes don't reach its depth.
+
+  A model is built from probes by *build* and opened by the constructor. Slices by depth, x or y only read the cells they need from the file. The axes record the size and modification time of the file of the cells they belong to, such that a model that is being rebuilt is never opened with the cells of one build and the axes of another.
+  """
+  def __init__(self, file_name: str):
+    """
+    Parameter
+    _________
+    file_name: str
+      The name of the files of the model without the extension.
+    """
+    self._file_name: str = file_name
+    for _ in range(OPEN_ATTEMPTS):
+      with open(file_name + ".json", 'r') as file:
+        self._meta: dict = json.load(file)
+      self._cells, version = self.__open_cells(file_name + ".npy")
+      if self._meta.get("cells", version) == version:
+        break
+      time.sleep(0.01) # the cells of a new build have replaced the old ones before its axes
+    else:
+      raise ValueError(f"The cells in {file_name}.npy don't belong to the axes in {file_name}.json.")
+    self._axes = VoxelAxes(*(np.asarray(self._meta["axes"][name], dtype = float) for name in VoxelAxes._fields))
+
+  def __repr__(self) -> str:
+    return f'{self.__class__.__name__}(file_name={self._file_name}, shape={self._cells.shape}, '\
+    f'method={self._meta["method"]})'
+
+  # ========== PRIVATE METHODS ==========
+
+  @staticmethod
+  def __open_cells(path: str) -> tuple[np.ndarray, dict]:
+    """Memory-map the cells in the npy file at *path* and return them together with the size and modification time of the file."""
+    with open(path, 'rb') as file: # the version belongs to the mapped file, also if the file is replaced meanwhile
+      stat = os.fstat(file.fileno())
+      version: tuple[int, int] = np.lib.format.read_magic(file)
+      read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+      shape, fortran_order, dtype = read_header(file)
+      cells = np.memmap(file, dtype = dtype, mode = 'r', shape = shape, order = 'F' if fortran_order else 'C',
+                        offset = file.tell())
+    return cells, {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+  @staticmethod
+  def __nearest_index(axis: np.ndarray, value: float) -> int:
+    """Return the index of the cell along *axis* that contains *value*. A ValueError is raised if it is outside."""
+    step: float = axis[1] - axis[0] if len(axis) > 1 else 1.0
+    index: int = int(np.floor((value - axis[0])/step + 0.5))
+    if not 0 <= index < len(axis):
+      raise ValueError(f"The value {value} lays outside the model, which spans from {axis[0] - 0.5*step} "\
+                       f"to {axis[-1] + 0.5*step}.")
+    return index
+
+  # ========== PUBLIC METHODS ==========
+
+  @property
+  def axes(self) -> VoxelAxes:
+    """Return the coordinates of the centres of the cells along the x, y and depth axes."""
+    return self._axes
+
+  @property
+  def cells(self) -> np.ndarray:
+    """Return the memory-mapped zone numbers of the cells, of shape (depth, y, x)."""
+    return self._cells
+
+  @property
+  def probes(self) -> list[str]:
+    """Return the numbers of the probes from which the model has been built."""
+    return self._meta["probes"]
+
+  def column(self, x: float, y: float) -> np.ndarray:
+    """Return the zone numbers of the cells below the point (*x*, *y*) from the top down."""
+    return np.array(self._cells[:, self.__nearest_index(self._axes.y, y), self.__nearest_index(self._axes.x, x)])
+
+  def depth_slice(self, depth: float) -> np.ndarray:
+    """Return the zone numbers of the cells at *depth* as an array of shape (y, x)."""
+    return np.array(self._cells[self.__nearest_index(self._axes.depth, depth)])
+
+  def x_slice(self, x: float) -> np.ndarray:
+    """Return the zone numbers of the cells in the vertical plane at *x* as an array of shape (depth, y)."""
+    return np.array(self._cells[:, :, self.__nearest_index(self._axes.x, x)])
+
+  def y_slice(self, y: float) -> np.ndarray:
+    """Return the zone numbers of the cells in the vertical plane at *y* as an array of shape (depth, x)."""
+    return np.array(self._cells[:, self.__nearest_index(self._axes.y, y), :])
+
+  @classmethod
+  def build(cls, probes: Iterable[Probe], file_name: str, cell_size: float, depth_step: float,
+            method: str = 'nearest', k: int = 8, power: float = 2.0, max_distance: float = inf,
+            bbox: Optional[tuple[float, float, float, float]] = None, max_depth: Optional[float] = None,
+            normalized: bool = False, cache: Optional[ZonesCache] = None, source: Hashable = None,
+            max_chunk_cells: int = MAX_CHUNK_CELLS,
+            preprocessing: PreprocessingPolicy = PreprocessingPolicy()) -> "VoxelModel":
+    """
+    Build the voxel model of *probes*, store it in the files *file_name*.npy and *file_name*.json and return it. The zones of each probe are resampled at the centres of the depth cells. Each column of cells takes its zone numbers from the *k* nearest probes with coordinates: from the nearest probe that reaches the depth if *method* is 'nearest', or by a vote weighted by the inverse distance to the power *power* if *method* is 'idw'. The columns are interpolated in chunks of at most *max_chunk_cells* cells and written to the memory-mapped array, such that the memory in use doesn't grow with the size of the model.
+
+    Parameters
+    __________
+    probes: Iterable[Probe]
+      The probes of the area. Probes without coordinates are skipped.
+    file_name: str
+      The name of the files of the model without the extension. They are written under a temporary name and renamed.
+    cell_size: float
+      The horizontal size of the cells (m).
+    depth_step: float
+      The vertical size of the cells (m).
+    method: str, default: 'nearest'
+      The lateral interpolation: 'nearest' or 'idw' (inverse distance weighting).
+    k: int, default: 8
+      The number of neighbouring probes of each column.
+    power: float, default: 2.0
+      The power of the inverse distance weights.
+    max_distance: float, default: inf
+      The maximum distance between a column and its neighbouring probes.
+    bbox: tuple[float, float, float, float], optional
+      The area (x_min, y_min, x_max, y_max) of the model. By default, the area of the probes.
+    max_depth: float, optional
+      The depth of the model. By default, the depth of the deepest zone.
+    normalized: bool, default: False
+      The zones are determined from the normalized Soil Behaviour Type Index if its value is True.
+    cache: ZonesCache, optional
+      A cache of the zones of the probes.
+    source: Hashable, optional
+      Identifies the version of the file of the probes in *cache*.
+    max_chunk_cells: int, default: MAX_CHUNK_CELLS
+      The maximum number of cells interpolated at a time.
+    preprocessing: PreprocessingPolicy, default: PreprocessingPolicy()
+      How the measurements are processed before and the zones after the classification.
+    """
+    if method not in METHODS:
+      raise ValueError(f"method must be one of {METHODS}, but has the value '{method}'.")
+    if cell_size <= 0 or depth_step <= 0 or k < 1:
+      raise ValueError("cell_size, depth_step and k are required to be positive.")
+
+    numbers: list[str] = []
+    points: list[tuple[float, float]] = []
+    tables: list[IntervalTable] = []
+    for probe in probes:
+      if probe.info.get('x') is None or probe.info.get('y') is None:
+        continue
+      zones: IntervalTable = cache.zones(probe, normalized, source, preprocessing) if cache is not None else \
+        ZonesProbe(probe, normalized, preprocessing).interval_table
+      if len(zones):
+        numbers.append(probe.number)
+        points.append((probe.info['x'], probe.info['y']))
+        tables.append(zones)
+    if not tables:
+      raise ValueError("A voxel model requires at least one probe with coordinates and zones.")
+
+    xy: np.ndarray = np.array(points, dtype = float)
+    x_min, y_min, x_max, y_max = bbox if bbox is not None else (*xy.min(axis = 0), *xy.max(axis = 0))
+    if max_depth is None:
+      max_depth = max(float(zones.bottoms[-1]) for zones in tables)
+    axes = VoxelAxes(x_min + (np.arange(max(ceil((x_max - x_min)/cell_size), 1)) + 0.5)*cell_size,
+                     y_min + (np.arange(max(ceil((y_max - y_min)/cell_size), 1)) + 0.5)*cell_size,
+                     (np.arange(max(ceil(max_depth/depth_step), 1)) + 0.5)*depth_step)
+    NX, NY, NZ = len(axes.x), len(axes.y), len(axes.depth)
+
+    # the resampled probes, with a last row of NO_DATA for the missing neighbours
+    profiles: np.ndarray = np.full((len(tables) + 1, NZ), NO_DATA, dtype = np.int8)
+    for row, zones in enumerate(tables):
+      profiles[row] = resample_zones(zones, axes.depth)
+
+    suffix: str = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+    cells: np.ndarray = np.lib.format.open_memmap(file_name + ".npy" + suffix, mode = 'w+', dtype = np.int8,
+                                                  shape = (NZ, NY, NX))
+    K: int = min(k, len(tables))
+    rows_per_chunk: int = max(1, max_chunk_cells//(NX*NZ*K))
+    for y_start in range(0, NY, rows_per_chunk):
+      y_stop: int = min(y_start + rows_per_chunk, NY)
+      grid_x, grid_y = np.meshgrid(axes.x, axes.y[y_start:y_stop])
+      distances, indices = nearest_neighbours(xy, np.column_stack((grid_x.ravel(), grid_y.ravel())), K, max_distance)
+      values: np.ndarray = profiles[indices] # shape (columns, K, NZ)
+      valid: np.ndarray = values != NO_DATA
+
+      if method == 'nearest': # the nearest neighbour that reaches the depth
+        first: np.ndarray = np.argmax(valid, axis = 1)
+        chunk: np.ndarray = np.take_along_axis(values, first[:, None, :], axis = 1)[:, 0, :]
+      else: # the zone number with the largest sum of inverse distance weights
+        with np.errstate(divide = 'ignore'):
+          weights: np.ndarray = np.where(np.isfinite(distances), 1.0/np.maximum(distances, 1e-9)**power, 0.0)
+        NO_COLUMNS: int = len(values)
+        bins: np.ndarray = ((np.arange(NO_COLUMNS)[:, None, None]*NZ + np.arange(NZ)[None, None, :])*NO_ZONES
+                            + np.maximum(values, 0))
+        votes: np.ndarray = np.bincount(bins[valid], weights = np.broadcast_to(weights[:, :, None], values.shape)[valid],
+                                        minlength = NO_COLUMNS*NZ*NO_ZONES).reshape(NO_COLUMNS, NZ, NO_ZONES)
+        chunk = np.where(valid.any(axis = 1), np.argmax(votes, axis = 2), NO_DATA).astype(np.int8)
+
+      cells[:, y_start:y_stop, :] = chunk.reshape(y_stop - y_start, NX, NZ).transpose(2, 0, 1)
+
+    cells.flush()
+    del cells
+    stat = os.stat(file_name + ".npy" + suffix) # kept by the rename
+    meta: dict = {"axes": {name: axis.tolist() for name, axis in zip(VoxelAxes._fields, axes, strict = True)},
+                  "method": method, "k": k, "power": power, "normalized": normalized,
+                  "preprocessing": preprocessing._asdict(), "probes": numbers,
+                  "cells": {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}}
+    with open(file_name + ".json" + suffix, 'w') as file:
+      json.dump(meta, file)
+    # Both files are complete before either replaces the old model, the axes last
+    os.replace(file_name + ".npy" + suffix, file_name + ".npy")
+    os.replace(file_name + ".json" + suffix, file_name + ".json")
+
+    print(f"\nBuilt a voxel model of {NX} x {NY} x {NZ} cells from {len(numbers)} probes in file {file_name}.npy")
+    return cls(file_name)
@@ -10,6 +10,8 @@ class Zone(Layer):
 
   Zone objects can also be compared based on their thickness.
   """
+  __slots__ = ('_number',)
+
   def __init__(self, number: int, top: float, bottom: float):
     """
     Parameters
@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+
+from cptlib.layertools.interval_table import IntervalTable
+from cptlib.layertools.zones_probe import ZonesProbe
+from cptlib.probetools.preprocessing import PreprocessingPolicy
+from cptlib.probetools.probe import Probe
+
+MAX_ENTRIES: int = 4096
+
+
+class ZonesCache:
+  """
+  A cache of the zones of the probes that have been classified, such that analyses that combine many probes, e.g., a CrossSection, only classify each probe once. At most *max_entries* classifications are kept, the least recently used ones are dropped first.
+
+  A probe is identified by its number together with a *source* that changes whenever the measurements may have changed, e.g., the name and modification time of its json file.
+  """
+  def __init__(self, max_entries: int = MAX_ENTRIES):
+    """
+    Parameter
+    _________
+    max_entries: int, default: MAX_ENTRIES
+      The maximum number of classifications in the cache.
+    """
+    self._max_entries: int = max_entries
+    self._entries: OrderedDict[tuple, IntervalTable] = OrderedDict()
+    self._lock = threading.Lock()
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def __repr__(self) -> str:
+    return f'{self.__class__.__name__}(entries={len(self._entries)}, max_entries={self._max_entries})'
+
+  # ========== PUBLIC METHODS ==========
+
+  def zones(self, probe: Probe, normalized: bool = False, source: Hashable = None,
+            preprocessing: PreprocessingPolicy = PreprocessingPolicy()) -> IntervalTable:
+    """
+    Return the zones of *probe* from the cache, or classify the probe as ZonesProbe(*probe*, *normalized*, *preprocessing*) and store them if they aren't in the cache yet.
+    """
+    key: tuple = (source, probe.number, normalized, tuple(preprocessing))
+    with self._lock:
+      if key in self._entries:
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    zones: IntervalTable = ZonesProbe(probe, normalized, preprocessing).interval_table
+    with self._lock:
+      self._entries[key] = zones
+      self._entries.move_to_end(key)
+      while len(self._entries) > self._max_entries:
+        self._entries.popitem(last = False)
+    return zones
@@ -1,14 +1,23 @@
 from collections.abc import Iterator
-from math import exp, floor, log10, sqrt
+from math import floor
+from typing import Optional
 
+import numpy as np
+from matplotlib.collections import PolyCollection
 from matplotlib.pyplot import Rectangle
 
+from cptlib.layertools.interval_index import IntervalIndex
+from cptlib.layertools.interval_table import IntervalTable
+from cptlib.layertools import scan_kernels
+from cptlib.layertools.normalized_sbt import NormalizedSBT, normalized_SBT, normalized_zone_numbers
 from cptlib.layertools.zone import Zone
+from cptlib.probetools.preprocessing import PreprocessingPolicy, check_preprocessing, preprocess
 from cptlib.probetools.probe_list import Probe
 from cptlib.setuptools.graph_set_up import GraphSetUp
-from cptlib.setuptools.measurement import UNITS, Measurement
+from cptlib.setuptools.measurement import UNITS, Measurement, ValidityMasks, validity_masks
 
-ATM_PRESS: float = 100.0 # kPa
+# The colors of Zone 0 to Zone 9 in the graphs, see https://www.learnui.design/tools/data-color-picker.html
+COLORS: tuple[str, ...] = ('w','k','#003f5c','#2f4b7c','#665191','#a05195','#d45087','#f95d6a','#ff7c43','#ffa600')
 
 class ZonesProbe:
   """
@@ -16,21 +25,40 @@ class ZonesProbe:
 
   The different SBTs are Sensitive Fine-Grained, Organic Soils, Clays, Silt Mixtures, Sand Mixtures, Sands, Gravelly to Dense Sand, Stiff Sand to Clayed Sand, Stiff Fine-Grained. These are labelled as Zone 1 to Zone 9 respectively.
 
-  An update to the Robertson method (1986), see Roberton et al. (2010), is used to determine the SBTs.
+  An update to the Robertson method (1986), see Roberton et al. (2010), is used to determine the SBTs. Optionally, the SBTs are determined from the normalized cone resistance and friction ratio, see Robertson (2009).
   """
-  def __init__(self, probe: Probe):
+  def __init__(self, probe: Probe, normalized: bool = False,
+               preprocessing: PreprocessingPolicy = PreprocessingPolicy()):
     """
-    Parameter
-    _________
+    Parameters
+    __________
     probe: Probe
       The probe of which the SBTs need to be determined.
+    normalized: bool, default: False
+      The normalized Soil Behaviour Type Index is used to determine the SBTs if its value is True.
+    preprocessing: PreprocessingPolicy, default: PreprocessingPolicy()
+      How the qc and fs columns are processed before the classification and how thin zones are merged after it. By default, the measurements are classified as they are.
     """
+    check_preprocessing(preprocessing)
     self._number: str = probe.number
-    self._zones: list[Zone] = []
-    self.__classify(probe.measurements)
+    self._zones: IntervalTable
+    self._normalized_SBT: Optional[NormalizedSBT] = None
+    self._interval_index: Optional[IntervalIndex] = None
+
+    depth, qc, fs = probe.columns()
+    validity: ValidityMasks = probe.validity()
+    if preprocessing[:-1] != PreprocessingPolicy()[:-1]: # the columns are processed
+      qc, fs = preprocess(depth, qc, fs, preprocessing)
+      validity = validity_masks(qc, fs)
+    if normalized:
+      self.__classify_normalized(depth, qc, fs, probe.info.get('diepte_gw_m'))
+    else:
+      self.__classify(depth, qc, fs, validity)
+    if preprocessing.min_thickness > 0:
+      self._zones = self._zones.merge_thin(preprocessing.min_thickness)
 
   def __iter__(self) -> Iterator[Zone]:
-    return iter(self._zones)
+    return iter(self._zones) # the Zone objects are created on the fly
 
   def __len__(self) -> int:
     return len(self._zones)
@@ -44,58 +72,53 @@ class ZonesProbe:
 
   # ========== PRIVATE METHODS ==========
 
-  def __classify(self, measurements: list[Measurement]) -> None:
+  def __classify(self, depth: np.ndarray, qc: np.ndarray, fs: np.ndarray, validity: ValidityMasks) -> None:
+    """
+    Determine the zones of the measurements with columns *depth*, *qc* and *fs* and assign them in an IntervalTable to the property _zones. The measurements that aren't valid according to *validity* belong to Zone 0 (Unknown).
+    """
+    zone_nrs: np.ndarray = scan_kernels.zone_numbers(qc, fs, validity.measurement)
+    self._zones = IntervalTable.merge(depth, zone_nrs)
+
+  def __classify_normalized(self, depth: np.ndarray, qc: np.ndarray, fs: np.ndarray,
+                            gw_depth: Optional[float]) -> None:
     """
-    Determine the zones in the probe that supplies *measurements* and assign them in a list to the property _zones.
+    Determine the zones of the measurements with columns *depth*, *qc* and *fs* from the normalized Soil Behaviour Type Index of all the measurements at once and assign them in an IntervalTable to the property _zones. The groundwater lays at depth *gw_depth*.
     """
-    LEN_MEAS: int = len(measurements)
-    current_zone_nr: int = -1
-    start_zone: float = 0
-    end_zone: float = 0
-    for counter, m in enumerate(measurements, start = 1):
-      m_zone_nr: int = -1
-      try: # measurement can have NoneType
-        m_Rf: float = self.friction_ratio(m)
-      except TypeError:
-        m_zone_nr = 0
-      else:
-        m_ISBT: float = self.SBT_index(Rf = m_Rf, qc = m.qc)
-        m_zone_nr = self.zone_number(Rf = m_Rf, qc = m.qc, SBT_index = m_ISBT)
-      finally:
-        if counter == 1:
-          current_zone_nr = m_zone_nr
-          start_zone = m.depth
-        elif counter == 2:
-          start_zone = start_zone - 0.5*(m.depth - start_zone)
-          
-        if current_zone_nr != m_zone_nr: # current zone ends and new one begins
-          end_zone = 0.5*(end_zone + m.depth)
-          self._zones.append(Zone(current_zone_nr, start_zone, end_zone))
-          current_zone_nr = m_zone_nr
-          start_zone = end_zone
-          
-        if counter == LEN_MEAS: # last measurement: truncate the zone
-          end_zone = 2*m.depth - start_zone if start_zone == end_zone else \
-          m.depth + 0.5*(m.depth - end_zone)
-          self._zones.append(Zone(current_zone_nr, start_zone, end_zone))
-          
-        end_zone = m.depth
+    self._normalized_SBT = normalized_SBT(depth, qc, fs, gw_depth = gw_depth)
+    self._zones = IntervalTable.merge(depth, normalized_zone_numbers(self._normalized_SBT))
 
   # ========== PUBLIC METHODS ==========
 
+  def columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the tops, bottoms and zone numbers of the zones as three arrays."""
+    return self._zones.tops, self._zones.bottoms, self._zones.numbers
+
   @staticmethod
   def friction_ratio(measurement: Measurement) -> float:
     """Return the friction ratio in percent."""
     qc_kPa = 1000*measurement.qc # convert from MPa to kPa
     return measurement.fs*100/qc_kPa
 
+  @property
+  def interval_table(self) -> IntervalTable:
+    """Return the zones as columns."""
+    return self._zones
+
+  def interval_index(self) -> IntervalIndex:
+    """Return an index over the zones that answers depth queries in logarithmic time."""
+    if self._interval_index is None:
+      self._interval_index = IntervalIndex(self._zones)
+
+    return self._interval_index
+
+  @property
+  def normalized_SBT(self) -> Optional[NormalizedSBT]:
+    """Return the normalized quantities and the convergence mask of the measurements if they have been determined."""
+    return self._normalized_SBT
+
   def get_SBTs(self) -> set[str]:
     """Return the SBTs that occur in the probe."""
-    zone_nrs = []
-    for zone in self._zones:
-      zone_nrs.append(self.SBT(zone.number))
-      
-    return set(zone_nrs).difference({"Unknown"})
+    return {self.SBT(zone_nr) for zone_nr in np.unique(self._zones.numbers).tolist()}.difference({"Unknown"})
 
   @staticmethod
   def SBT(zone_number: int) -> str:
@@ -111,47 +134,52 @@ class ZonesProbe:
   @staticmethod
   def SBT_index(Rf: float, qc: float) -> float:
     """Return the non-normalized Soil Behaviour Type Index."""
-    qc_kPa = 1000*qc # convert from MPa to kPa
-    a = 3.47 - log10(qc_kPa/ATM_PRESS)
-    b = 1.22 + log10(Rf)
-
-    return sqrt(a**2 + b**2)
+    return scan_kernels.SBT_index(Rf, qc)
 
   def visualize(self, graph: GraphSetUp) -> None:
     """
     Add a visual representation of the SBTs in the soil to *graph*. A runtime error is raised if *graph.indep_variable* doesn't equal 'depth'.
 
     Since this is a 1D graph only using the vertical axis, this function should only be called after all the plots using the horizontal axis have been added to *graph*.
+
+    If *graph.fast_rendering* is True, the zones of each SBT are drawn as a single collection instead of a patch per zone.
     """
     if graph.indep_variable != 'depth':
       raise RuntimeError("graph.indep_variable must equal 'depth', but has the value"\
                          f" '{graph.indep_variable}'.")
     
-    # https://www.learnui.design/tools/data-color-picker.html
-    COLORS: tuple = ('w','k','#003f5c','#2f4b7c','#665191','#a05195','#d45087','#f95d6a'
-                     ,'#ff7c43','#ffa600')
-    
     X_MAX: float
     _ , X_MAX = graph.xlim()
     NO_ZONES: int = self.__len__()
     
-    for zone in self._zones:
-      graph.axes.add_patch(Rectangle((0, -zone.bottom), X_MAX, zone.thickness,
-                                     facecolor = COLORS[zone.number], 
-                                     label = self.SBT(zone.number)))
+    if graph.fast_rendering: # one collection of rectangles per SBT, in the order of their first occurrence
+      zone_nrs, first = np.unique(self._zones.numbers, return_index = True)
+      for zone_nr in zone_nrs[np.argsort(first)].tolist():
+        in_zone: np.ndarray = self._zones.numbers == zone_nr
+        tops, bottoms = -self._zones.tops[in_zone], -self._zones.bottoms[in_zone]
+        vertices: np.ndarray = np.stack((np.stack((np.zeros_like(tops), bottoms), axis = 1),
+                                         np.stack((np.full_like(tops, X_MAX), bottoms), axis = 1),
+                                         np.stack((np.full_like(tops, X_MAX), tops), axis = 1),
+                                         np.stack((np.zeros_like(tops), tops), axis = 1)), axis = 1)
+        graph.axes.add_collection(PolyCollection(vertices, facecolors = COLORS[zone_nr],
+                                                 label = self.SBT(zone_nr)))
+    else:
+      for zone in self._zones:
+        graph.axes.add_patch(Rectangle((0, -zone.bottom), X_MAX, zone.thickness,
+                                       facecolor = COLORS[zone.number], 
+                                       label = self.SBT(zone.number)))
 
-    graph.ylim(-self._zones[NO_ZONES-1].bottom, -floor(self._zones[0].top/10)*10)
+    graph.ylim(-self._zones.bottoms[NO_ZONES-1], -floor(self._zones.tops[0]/10)*10)
     graph.free_yticklabels_from_minus()
     graph.legend(True)
 
   def write(self, file_name: str) -> None:
     """Write the zone distribution of the soil to the text file *file_name*."""
     with open(file_name + ".txt", 'w') as file:
-      for zone in self._zones:
-        file.write("\n" + str("{:.3f}".format(zone.top)) + " " + UNITS['depth'] + 
-                   " - " + str("{:.3f}".format(zone.bottom)) + " " + UNITS['depth']
-                   +  " : " + self.SBT(zone.number) + " (Zone " + str(zone.number) +
-                   ")")
+      file.write("".join(f"\n{top:.3f} {UNITS['depth']} - {bottom:.3f} {UNITS['depth']} : {self.SBT(zone_nr)} "
+                         f"(Zone {zone_nr})" for top, bottom, zone_nr in zip(self._zones.tops.tolist(),
+                                                                              self._zones.bottoms.tolist(),
+                                                                              self._zones.numbers.tolist())))
 
     print("\nThe result of the SBT classification has been written to file",
           file_name + ".txt.")
@@ -161,23 +189,4 @@ class ZonesProbe:
     """
     Determine the SBT using the updated Robertson method and return the corresponding zone number.
     """
-    qc_kPa = 1000*qc # convert from MPa to kPa
-    threshold = 1.0/(0.006*(Rf-0.9)-0.004*(Rf-0.9)**2-0.005)
-    if Rf > 4.5 and qc_kPa/ATM_PRESS >= threshold:
-      return 9
-    elif Rf > 1.5 and Rf <= 4.5 and qc_kPa/ATM_PRESS >= threshold:
-      return 8
-    elif qc_kPa/ATM_PRESS < 12*exp(-1.4*Rf):
-      return 1
-    elif SBT_index > 3.6:
-      return 2
-    elif SBT_index > 2.95:
-      return 3
-    elif SBT_index > 2.6:
-      return 4
-    elif SBT_index > 2.05:
-      return 5
-    elif SBT_index > 1.31:
-      return 6
-    else:
-      return 7
+    return scan_kernels.zone_number(Rf, qc, SBT_index)
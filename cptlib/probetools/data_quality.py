@@ -0,0 +1,95 @@
+from collections import namedtuple
+
+import numpy as np
+
+from cptlib.setuptools.measurement import MeasurementColumns, validity_masks
+
+# How the measurements of a probe are cleaned when a ProbeList is imported:
+#   missing: 'mark' keeps the measurements with an invalid qc or fs, which are classified as Unknown (Zone 0), 'drop'
+#            removes them and 'interpolate' interpolates qc and fs linearly in depth across gaps of at most *max_gap*
+#            consecutive invalid values, longer gaps are marked
+#   max_gap: the maximum number of consecutive invalid values that is interpolated
+#   duplicates: 'keep' keeps all the measurements at the same depth, 'first' only the first one and 'mean' replaces
+#               them by one measurement with the mean of their valid qc and fs
+QualityPolicy = namedtuple('QualityPolicy', ['missing', 'max_gap', 'duplicates'], defaults = ('mark', 0, 'keep'))
+
+# The quality of the measurements of a probe before cleaning and what has been done about it
+QualityStats = namedtuple('QualityStats', ['no_measurements', 'no_invalid_qc', 'no_invalid_fs', 'no_duplicates',
+                                           'no_dropped', 'no_interpolated', 'sorted'])
+
+MISSING_POLICIES: tuple[str, ...] = ('mark', 'drop', 'interpolate')
+DUPLICATE_POLICIES: tuple[str, ...] = ('keep', 'first', 'mean')
+
+
+def check_policy(policy: QualityPolicy) -> None:
+  """Raise a ValueError if *policy* isn't a valid QualityPolicy."""
+  if policy.missing not in MISSING_POLICIES:
+    raise ValueError(f"missing must be one of {MISSING_POLICIES}, but has the value '{policy.missing}'.")
+  if policy.duplicates not in DUPLICATE_POLICIES:
+    raise ValueError(f"duplicates must be one of {DUPLICATE_POLICIES}, but has the value '{policy.duplicates}'.")
+  if policy.max_gap < 0:
+    raise ValueError(f"max_gap must be non-negative, but has the value {policy.max_gap}.")
+
+
+def short_gaps(valid: np.ndarray, max_gap: int) -> np.ndarray:
+  """
+  Return the mask of the invalid values that lay in a gap of at most *max_gap* consecutive invalid values between two valid values according to the mask *valid*.
+  """
+  valid_indices: np.ndarray = np.flatnonzero(valid)
+  NO_VALID: int = valid_indices.size
+  if NO_VALID < 2 or max_gap == 0:
+    return np.zeros(valid.size, dtype = bool)
+
+  gap_numbers: np.ndarray = np.cumsum(valid) # the gap after the k-th valid value has number k
+  gap_lengths: np.ndarray = np.zeros(NO_VALID + 1, dtype = int)
+  gap_lengths[1:NO_VALID] = np.diff(valid_indices) - 1
+  return ~valid & (gap_numbers >= 1) & (gap_numbers < NO_VALID) & (gap_lengths[gap_numbers] <= max_gap)
+
+
+def clean_columns(depth: np.ndarray, qc: np.ndarray, fs: np.ndarray,
+                  policy: QualityPolicy = QualityPolicy()) -> tuple[MeasurementColumns, QualityStats]:
+  """
+  Sort the measurements with columns *depth*, *qc* and *fs* (unavailable values are NaN) by depth, unless they are sorted already, and clean them according to *policy*. Return the cleaned measurements with their ValidityMasks and the QualityStats of the measurements.
+
+  The arrays are only copied if they need to be changed.
+  """
+  is_sorted: bool = bool(np.all(depth[1:] >= depth[:-1]))
+  if not is_sorted:
+    order: np.ndarray = np.argsort(depth, kind = 'stable') # keep the order of the records at the same depth
+    depth, qc, fs = depth[order], qc[order], fs[order]
+
+  validity = validity_masks(qc, fs)
+  duplicate: np.ndarray = depth[1:] == depth[:-1] # same depth as the previous measurement
+  stats = QualityStats(len(depth), int((~validity.qc).sum()), int((~validity.fs).sum()), int(duplicate.sum()), 0, 0,
+                       is_sorted)
+
+  if stats.no_duplicates and policy.duplicates != 'keep':
+    first: np.ndarray = np.concatenate(([True], ~duplicate))
+    if policy.duplicates == 'mean':
+      starts: np.ndarray = np.flatnonzero(first)
+      counts: tuple = tuple(np.add.reduceat(valid.astype(float), starts) for valid in validity[:2])
+      sums: tuple = tuple(np.add.reduceat(np.where(valid, values, 0.0), starts)
+                          for values, valid in zip((qc, fs), validity[:2]))
+      with np.errstate(invalid = 'ignore'): # no valid value at the depth
+        qc, fs = (np.where(count > 0, total/np.maximum(count, 1), np.nan) for total, count in zip(sums, counts))
+    else:
+      qc, fs = qc[first], fs[first]
+    depth = depth[first]
+    validity = validity_masks(qc, fs)
+
+  if policy.missing == 'drop' and not validity.measurement.all():
+    keep: np.ndarray = validity.measurement
+    stats = stats._replace(no_dropped = int((~keep).sum()))
+    depth, qc, fs = depth[keep], qc[keep], fs[keep]
+    validity = validity_masks(qc, fs)
+  elif policy.missing == 'interpolate' and not validity.measurement.all():
+    qc, fs = qc.copy(), fs.copy()
+    no_interpolated: int = 0
+    for values, valid in ((qc, validity.qc), (fs, validity.fs)):
+      fill: np.ndarray = short_gaps(valid, policy.max_gap)
+      values[fill] = np.interp(depth[fill], depth[valid], values[valid]) if fill.any() else values[fill]
+      no_interpolated += int(fill.sum())
+    stats = stats._replace(no_interpolated = no_interpolated)
+    validity = validity_masks(qc, fs)
+
+  return MeasurementColumns(depth, qc, fs, validity), stats
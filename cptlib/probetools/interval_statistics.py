@@ -0,0 +1,142 @@
+from math import ceil
+
+import numpy as np
+
+BLOCK_SIZE: int = 32
+
+
+class SparseTable:
+  """
+  The minimum (or maximum) of a column over any range of indices in constant time. The column is split into blocks of *block_size* values: a sparse table holds the extremes of 2**k consecutive blocks and the prefix and suffix extremes within each block cover the partial blocks at both ends of a range. A range inside a single block is scanned in at most *block_size* steps.
+
+  Unavailable values (NaN) are ignored, the extreme of a range without available values is NaN.
+  """
+  def __init__(self, values: np.ndarray, maximum: bool = False, block_size: int = BLOCK_SIZE):
+    """
+    Parameters
+    __________
+    values: numpy.ndarray
+      The column of which the extremes are queried.
+    maximum: bool, default: False
+      The table holds the maxima if its value is True, the minima otherwise.
+    block_size: int, default: BLOCK_SIZE
+      The number of values in a block.
+    """
+    self._extreme: np.ufunc = np.maximum if maximum else np.minimum
+    self._identity: float = -np.inf if maximum else np.inf
+    self._block_size: int = block_size
+
+    NO_BLOCKS: int = max(ceil(len(values)/block_size), 1)
+    self._values: np.ndarray = np.full(NO_BLOCKS*block_size, self._identity)
+    self._values[:len(values)] = np.where(np.isfinite(values), values, self._identity)
+    blocks: np.ndarray = self._values.reshape(NO_BLOCKS, block_size)
+    self._prefix: np.ndarray = self._extreme.accumulate(blocks, axis = 1).ravel()
+    self._suffix: np.ndarray = self._extreme.accumulate(blocks[:, ::-1], axis = 1)[:, ::-1].ravel()
+
+    self._levels: list[np.ndarray] = [self._extreme.reduce(blocks, axis = 1)] # level k: 2**k consecutive blocks
+    while 2**len(self._levels) <= NO_BLOCKS:
+      half: int = 2**(len(self._levels) - 1)
+      self._levels.append(self._extreme(self._levels[-1][:-half], self._levels[-1][half:]))
+
+  def __repr__(self) -> str:
+    return f'{self.__class__.__name__}(values={len(self._values)}, block_size={self._block_size})'
+
+  # ========== PUBLIC METHODS ==========
+
+  def query(self, starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """
+    Return the extreme of the values with indices from *starts* up to (but not including) *stops* for each range.
+    """
+    starts, stops = np.asarray(starts, dtype = int), np.asarray(stops, dtype = int)
+    lasts: np.ndarray = stops - 1
+    first_blocks, last_blocks = starts//self._block_size, lasts//self._block_size
+    extremes: np.ndarray = np.full(starts.shape, self._identity)
+
+    spanning: np.ndarray = (stops > starts) & (last_blocks > first_blocks)
+    extremes[spanning] = self._extreme(self._suffix[starts[spanning]], self._prefix[lasts[spanning]])
+    inner: np.ndarray = spanning & (last_blocks - first_blocks >= 2) # whole blocks between the partial ones
+    lows, highs = first_blocks[inner] + 1, last_blocks[inner]
+    levels: np.ndarray = np.log2(highs - lows).astype(int) if lows.size else lows
+    inner_extremes: np.ndarray = np.empty(lows.size)
+    for level in np.unique(levels).tolist():
+      selected: np.ndarray = levels == level
+      table: np.ndarray = self._levels[level]
+      inner_extremes[selected] = self._extreme(table[lows[selected]], table[highs[selected] - 2**level])
+    extremes[inner] = self._extreme(extremes[inner], inner_extremes)
+
+    single: np.ndarray = (stops > starts) & (last_blocks == first_blocks)
+    indices: np.ndarray = np.minimum(starts[single, None] + np.arange(self._block_size), len(self._values) - 1)
+    window: np.ndarray = np.where(indices <= lasts[single, None], self._values[indices], self._identity)
+    extremes[single] = self._extreme.reduce(window, axis = 1) if window.size else window.reshape(-1)
+
+    return np.where(extremes == self._identity, np.nan, extremes) # no available values
+
+
+class IntervalStatistics:
+  """
+  The mean, minimum and maximum of columns of measurements over any depth interval. The cumulative sums and SparseTables of the columns are built once, after which each interval is answered in constant time, no matter how many measurements it contains.
+
+  A measurement at depth d belongs to the interval [top, bottom) if top <= d < bottom. Unavailable values (NaN) are ignored.
+  """
+  def __init__(self, depth: np.ndarray, columns: dict[str, np.ndarray], block_size: int = BLOCK_SIZE):
+    """
+    Parameters
+    __________
+    depth: numpy.ndarray
+      The depths (sorted) of the measurements.
+    columns: dict[str, numpy.ndarray]
+      The columns of the measurements by their name, e.g., 'qc'.
+    block_size: int, default: BLOCK_SIZE
+      The number of values in a block of the SparseTables.
+    """
+    self._depth: np.ndarray = depth
+    self._references: dict[str, float] = {}
+    self._sums: dict[str, np.ndarray] = {}
+    self._counts: dict[str, np.ndarray] = {}
+    self._minima: dict[str, SparseTable] = {}
+    self._maxima: dict[str, SparseTable] = {}
+    for name, values in columns.items():
+      available: np.ndarray = np.isfinite(values)
+      # the deviations from the mean are summed, which keeps the rounding errors of the cumulative sums small
+      self._references[name] = float(values[available].mean()) if available.any() else 0.0
+      self._sums[name] = np.concatenate(([0.0], np.cumsum(np.where(available, values - self._references[name], 0.0))))
+      self._counts[name] = np.concatenate(([0], np.cumsum(available)))
+      self._minima[name] = SparseTable(values, maximum = False, block_size = block_size)
+      self._maxima[name] = SparseTable(values, maximum = True, block_size = block_size)
+
+  def __repr__(self) -> str:
+    return f'{self.__class__.__name__}(measurements={len(self._depth)}, columns={list(self._sums)})'
+
+  # ========== PUBLIC METHODS ==========
+
+  @property
+  def names(self) -> list[str]:
+    return list(self._sums)
+
+  def indices(self, tops: np.ndarray, bottoms: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the index of the first measurement in each interval [*tops*, *bottoms*) and the index following its last measurement.
+    """
+    return np.searchsorted(self._depth, tops, side = 'left'), np.searchsorted(self._depth, bottoms, side = 'left')
+
+  def summarize(self, tops: np.ndarray, bottoms: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Return the number of measurements ('# measurements') and the mean, minimum and maximum of each column (e.g., 'qc mean') in each interval [*tops*, *bottoms*). The statistics of a column without available values in an interval are NaN.
+    """
+    starts, stops = self.indices(np.atleast_1d(tops), np.atleast_1d(bottoms))
+    stops = np.maximum(stops, starts)
+    summary: dict[str, np.ndarray] = {"# measurements": stops - starts}
+    for name in self._sums:
+      counts: np.ndarray = self._counts[name][stops] - self._counts[name][starts]
+      with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        summary[f"{name} mean"] = self._references[name] + (self._sums[name][stops] - self._sums[name][starts])/counts
+      summary[f"{name} min"] = self._minima[name].query(starts, stops)
+      summary[f"{name} max"] = self._maxima[name].query(starts, stops)
+
+    return summary
+
+  def summary(self, top: float, bottom: float) -> dict[str, float]:
+    """
+    Return the statistics of *summarize* of the single interval [*top*, *bottom*).
+    """
+    return {key: values[0].item() for key, values in self.summarize(np.array([top]), np.array([bottom])).items()}
@@ -0,0 +1,107 @@
+import codecs
+import gzip
+import json
+import os
+import re
+import zipfile
+from collections.abc import Iterator
+from typing import BinaryIO
+
+try: # zstd compressed json files can only be read if zstandard is installed (the extra 'zstd')
+  import zstandard
+except ImportError:
+  zstandard = None
+
+# The extensions of a json file, in the order in which they are looked for: a plain json file, a gzip or zstd
+# compressed json file and a zip archive of json files
+EXTENSIONS: tuple[str, ...] = ('.json', '.json.gz', '.json.zst', '.zip')
+CHUNK_SIZE: int = 1 << 20 # bytes decompressed at a time
+SEPARATOR = re.compile(r'[ \t\n\r,]*') # between the records of the json array
+
+
+def json_file_path(json_file_name: str) -> str:
+  """
+  Return the path of the json file named *json_file_name* (without the file extension), i.e., the first existing file with one of the EXTENSIONS. A FileNotFoundError exception is raised if there is none.
+  """
+  for extension in EXTENSIONS:
+    if os.path.isfile(json_file_name + extension):
+      return json_file_name + extension
+
+  raise FileNotFoundError(f"There is no file {json_file_name} with one of the extensions {', '.join(EXTENSIONS)}.")
+
+def split_extension(path: str) -> tuple[str, str]:
+  """
+  Return the name of the json file at *path* without its extension and the extension, '' if it isn't one of the EXTENSIONS.
+  """
+  for extension in sorted(EXTENSIONS, key = len, reverse = True): # '.json.gz' before '.json'
+    if path.endswith(extension):
+      return path[:-len(extension)], extension
+
+  return path, ''
+
+def is_compressed(path: str) -> bool:
+  """Return True if the json file at *path* is compressed, such that it can only be read sequentially."""
+  return split_extension(path)[1] not in ('', '.json')
+
+def iter_json_array(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+  """
+  Yield the records of the json array in the binary *stream* one at a time. The stream is read and decoded in chunks of *chunk_size* bytes, such that only the records that haven't been parsed yet are kept in memory. A ValueError exception is raised if *stream* doesn't hold a json array.
+  """
+  decoder = json.JSONDecoder()
+  utf8 = codecs.getincrementaldecoder('utf-8-sig')()
+  text: str = ''
+  at_end: bool = False
+
+  def read() -> tuple[str, bool]:
+    chunk: bytes = stream.read(chunk_size)
+    return utf8.decode(chunk, final = not chunk), not chunk
+
+  while '[' not in text: # the start of the array
+    if text.strip() or at_end:
+      raise ValueError("The json file is required to hold an array of records.")
+    text, at_end = read()
+  position: int = text.index('[') + 1
+
+  while True:
+    position = SEPARATOR.match(text, position).end()
+    if position < len(text):
+      if text[position] == ']':
+        return
+      try:
+        record, position = decoder.raw_decode(text, position)
+        yield record
+        continue
+      except json.JSONDecodeError:
+        if at_end:
+          raise
+    elif at_end:
+      raise ValueError("The json array of records is incomplete.")
+
+    more, at_end = read() # the next record doesn't fit in the text that has been read
+    text, position = text[position:] + more, 0
+
+def iter_records(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+  """
+  Yield the records of the json file at *path* one at a time while it is being decompressed, such that the decompressed content is never stored on disk or in memory as a whole. The records of all the json files in a zip archive are yielded one file after the other.
+  """
+  _, extension = split_extension(path)
+  if extension == '.zip':
+    with zipfile.ZipFile(path) as archive:
+      members: list[str] = sorted(name for name in archive.namelist() if name.endswith('.json')
+                                  and not name.endswith('.index.json') and not name.startswith('__MACOSX/'))
+      if not members:
+        raise ValueError(f"The zip archive {path} doesn't hold any json file.")
+      for member in members:
+        with archive.open(member) as stream:
+          yield from iter_json_array(stream, chunk_size)
+    return
+  if extension == '.json.zst' and zstandard is None:
+    raise RuntimeError(f"The package zstandard (poetry install --extras zstd) is required to read the zstd compressed file {path}.")
+
+  with open(path, 'rb') as file:
+    stream: BinaryIO = file
+    if extension == '.json.gz':
+      stream = gzip.GzipFile(fileobj = file)
+    elif extension == '.json.zst':
+      stream = zstandard.ZstdDecompressor().stream_reader(file)
+    yield from iter_json_array(stream, chunk_size)
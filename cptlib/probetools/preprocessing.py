@@ -0,0 +1,87 @@
+import warnings
+from collections import namedtuple
+
+import numpy as np
+
+# How the qc and fs columns of a probe are processed before its measurements are classified:
+#   fs_offset: the distance (m) between the cone tip and the centre of the friction sleeve above it. The fs recorded with
+#              the tip at depth d + *fs_offset* is assigned to depth d, such that qc and fs describe the same soil
+#   spike_threshold: a value that deviates more than *spike_threshold* times the scaled median absolute deviation from
+#                    the median of the *spike_window* values around it is replaced by that median, 0 disables despiking
+#   spike_window: the number of consecutive values (odd) in the window of the despiking
+#   smoothing: the width (m) of the depth window of the moving average of qc and fs, 0 disables smoothing
+#   min_thickness: zones thinner than *min_thickness* (m) are merged into the thicker one of their neighbouring zones
+PreprocessingPolicy = namedtuple('PreprocessingPolicy',
+                                 ['fs_offset', 'spike_threshold', 'spike_window', 'smoothing', 'min_thickness'],
+                                 defaults = (0.0, 0.0, 5, 0.0, 0.0))
+
+MAD_SCALE: float = 1.4826 # scales the median absolute deviation to the standard deviation of normal noise
+
+
+def check_preprocessing(policy: PreprocessingPolicy) -> None:
+  """Raise a ValueError if *policy* isn't a valid PreprocessingPolicy."""
+  if policy.fs_offset < 0 or policy.spike_threshold < 0 or policy.smoothing < 0 or policy.min_thickness < 0:
+    raise ValueError("fs_offset, spike_threshold, smoothing and min_thickness must be non-negative.")
+  if policy.spike_window < 3 or policy.spike_window % 2 == 0:
+    raise ValueError(f"spike_window must be an odd number of at least 3, but has the value {policy.spike_window}.")
+
+
+def available(values: np.ndarray) -> np.ndarray:
+  """Return the mask of the values in the column *values* that are available (not NaN) and positive."""
+  with np.errstate(invalid = 'ignore'):
+    return np.isfinite(values) & (values > 0)
+
+def align(depth: np.ndarray, values: np.ndarray, offset: float) -> np.ndarray:
+  """
+  Return the values of the column *values* at *depth* + *offset*, interpolated linearly between the available values. The values beyond the last available value are NaN.
+  """
+  valid: np.ndarray = available(values)
+  if offset == 0 or valid.sum() < 2:
+    return values
+
+  return np.interp(depth + offset, depth[valid], values[valid], left = np.nan, right = np.nan)
+
+def despike(values: np.ndarray, window: int, threshold: float) -> np.ndarray:
+  """
+  Return the column *values* in which the spikes are replaced by the median of the *window* values around them (a Hampel filter). Unavailable values are ignored and remain unavailable.
+  """
+  if threshold == 0 or len(values) < window:
+    return values
+
+  HALF: int = window//2
+  valid: np.ndarray = available(values)
+  windows: np.ndarray = np.lib.stride_tricks.sliding_window_view(
+    np.pad(np.where(valid, values, np.nan), HALF, constant_values = np.nan), window)
+  with warnings.catch_warnings(): # windows without available values
+    warnings.simplefilter('ignore', RuntimeWarning)
+    medians: np.ndarray = np.nanmedian(windows, axis = 1)
+    deviations: np.ndarray = np.nanmedian(np.abs(windows - medians[:, None]), axis = 1)
+  with np.errstate(invalid = 'ignore'):
+    spikes: np.ndarray = valid & (np.abs(values - medians) > threshold*MAD_SCALE*deviations)
+  return np.where(spikes, medians, values)
+
+def smooth(depth: np.ndarray, values: np.ndarray, width: float) -> np.ndarray:
+  """
+  Return the moving average of the column *values* over a depth window of *width* centred at each depth in *depth* (sorted). The average only includes the available values; unavailable values remain unavailable.
+  """
+  if width == 0:
+    return values
+
+  valid: np.ndarray = available(values)
+  sums: np.ndarray = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+  counts: np.ndarray = np.concatenate(([0], np.cumsum(valid)))
+  starts: np.ndarray = np.searchsorted(depth, depth - 0.5*width, side = 'left')
+  stops: np.ndarray = np.searchsorted(depth, depth + 0.5*width, side = 'right')
+  with np.errstate(invalid = 'ignore', divide = 'ignore'):
+    means: np.ndarray = (sums[stops] - sums[starts])/(counts[stops] - counts[starts])
+  return np.where(valid, means, values)
+
+def preprocess(depth: np.ndarray, qc: np.ndarray, fs: np.ndarray,
+               policy: PreprocessingPolicy = PreprocessingPolicy()) -> tuple[np.ndarray, np.ndarray]:
+  """
+  Return the columns *qc* and *fs* of the measurements at *depth* (sorted) after aligning fs with qc, despiking and smoothing them according to *policy*, in that order. The columns are only copied if they need to be changed.
+  """
+  fs = align(depth, fs, policy.fs_offset)
+  qc, fs = (despike(values, policy.spike_window, policy.spike_threshold) for values in (qc, fs))
+  qc, fs = (smooth(depth, values, policy.smoothing) for values in (qc, fs))
+  return qc, fs
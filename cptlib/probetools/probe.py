@@ -1,42 +1,152 @@
+from collections.abc import Sequence
 from inspect import isfunction
 from math import ceil
 from types import NoneType
-from typing import Union
+from typing import Optional, Union
 
+import numpy as np
+
+from cptlib.probetools.data_quality import QualityStats
+from cptlib.probetools.interval_statistics import IntervalStatistics
+from cptlib.setuptools.decimation import min_max_indices
 from cptlib.setuptools.graph_set_up import GraphSetUp
-from cptlib.setuptools.measurement import COLORS, QUANTITIES, UNITS, Measurement
+from cptlib.setuptools.measurement import (COLORS, QUANTITIES, UNITS, Measurement, MeasurementColumns, ValidityMasks,
+                                          validity_masks)
 
 
 class Probe:
   """
   A container that stores the measurements of the probe and its identification number *number*. It also offers functionality to visualize the probe's content.
   """
-  def __init__(self, number: str, measurements: list[Measurement]):
+  def __init__(self, number: str, measurements: list[Measurement], info: Optional[dict] = None,
+               quality: Optional[QualityStats] = None):
     """
     Parameters
     __________
     number: str
       The identification number of the probe.
     measurements: list[Measurement]
-      A list containing all the measurements of the probe.
+      A list containing all the measurements of the probe or a MeasurementColumns sequence.
+    info: dict, optional
+      The fields in PROBE_FIELDS that describe the probe as a whole, e.g., its location and groundwater depth.
+    quality: QualityStats, optional
+      The quality of the measurements found when they were cleaned.
     """
     self._number: str = number
     self._measurements: list[Measurement] = measurements
+    self._info: dict = info if info is not None else {}
+    self._quality: Optional[QualityStats] = quality
+    self._columns: Optional[tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+    self._validity: Optional[ValidityMasks] = None
+    self._statistics: Optional[IntervalStatistics] = None
 
   def __repr__(self) -> str:
     return f'{self.__class__.__name__}(number={self._number}, measurements='\
     f'{self._measurements})'
 
+  # ========== PRIVATE METHODS ==========
+
+  def __visualize_decimated(self, graph: GraphSetUp, argv: tuple) -> None:
+    """
+    Add the vertical line plots of *visualize* to *graph*, but computed on the columns of the measurements and, if the independent quantity is the depth, reduced to the points that are visible at the resolution of *graph*.
+    """
+    columns: dict[str, np.ndarray] = dict(zip(QUANTITIES, self.columns(), strict = True))
+    sign: int = 1
+    if graph.indep_variable == 'depth':
+      sign = -1 # for visualization purposes
+
+    x_max: float = 0.0
+    for arg in argv:
+      x_values: np.ndarray
+      unit: str = ''
+      color: str = ''
+      arg_label: str = arg[1]
+
+      if isfunction(arg[0]):
+        unit = arg[2]
+        color = arg[3]
+        if not arg_label:
+          arg_label = '<?>' # label must be present in this case
+        with np.errstate(divide='ignore', invalid='ignore'):
+          x_values = np.asarray(arg[0](Measurement(*self.columns())), dtype=float)
+      else:
+        unit = UNITS[arg[0]]
+        color = COLORS[arg[0]]
+        x_values = columns[arg[0]]
+
+      indices: np.ndarray = np.arange(len(x_values))
+      if graph.indep_variable == 'depth': # the measurements are sorted by depth
+        indices = min_max_indices(columns['depth'], x_values, graph.pixel_rows())
+
+      graph.axes.plot(x_values[indices], sign*columns[graph.indep_variable][indices], color,
+                      label = arg_label + ' [' + unit + ']' if arg_label else arg[0] + ' [' + unit + ']')
+
+      finite_x_values: np.ndarray = x_values[np.isfinite(x_values)]
+      if finite_x_values.size:
+        x_max = max(x_max, float(finite_x_values.max()))
+
+    graph.xlim(0, ceil(x_max/10.0)*10)
+    graph.legend()
+    graph.grid(True)
+
   # ========== PUBLIC METHODS ==========
 
+  def columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return the depth, qc and fs of the measurements as three float arrays in which unavailable values are NaN.
+    The arrays are computed once and shared by all subsequent calls.
+    """
+    if self._columns is None and isinstance(self._measurements, MeasurementColumns): # no copy needed
+      self._columns = self._measurements.columns
+    elif self._columns is None:
+      values: np.ndarray = np.array(self._measurements, dtype=float).reshape(-1, len(QUANTITIES))
+      self._columns = (values[:, 0], values[:, 1], values[:, 2])
+
+    return self._columns
+
+  @property
+  def info(self) -> dict:
+    return self._info
+
   @property
-  def measurements(self) -> list[Measurement]:
+  def quality(self) -> Optional[QualityStats]:
+    return self._quality
+
+  @property
+  def measurements(self) -> Sequence[Measurement]:
     return self._measurements
 
   @property
   def number(self) -> str:
     return self._number
 
+  def statistics(self) -> IntervalStatistics:
+    """
+    Return the statistics of the valid qc (MPa), fs (kPa) and friction ratio Rf (%) of the measurements over any depth interval. The cumulative sums and sparse tables behind them are built once and shared by all subsequent calls.
+    """
+    if self._statistics is None:
+      depth, qc, fs = self.columns()
+      validity: ValidityMasks = self.validity()
+      with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        Rf: np.ndarray = fs*100/(1000*qc)
+      self._statistics = IntervalStatistics(depth, {'qc': np.where(validity.qc, qc, np.nan),
+                                                    'fs': np.where(validity.fs, fs, np.nan),
+                                                    'Rf': np.where(validity.measurement, Rf, np.nan)})
+
+    return self._statistics
+
+  def validity(self) -> ValidityMasks:
+    """
+    Return the masks of the measurements with a valid qc, fs and both. The masks are computed once and shared by all subsequent calls.
+    """
+    if self._validity is None and isinstance(self._measurements, MeasurementColumns): # computed during the import
+      self._validity = self._measurements.validity
+    elif self._validity is None:
+      _, qc, fs = self.columns()
+      self._validity = validity_masks(qc, fs)
+
+    return self._validity
+
   def visualize(self, graph: GraphSetUp, *argv) -> None:
     """
     Add vertical line plots of the QUANTITIES in *argv w.r.t. the quantity *graph.indep_variable* to *graph*.
@@ -50,18 +160,18 @@ class Probe:
       They need to be passed on in a tuple of which the first component contains 'depth', 'qc', 'fs' or a function of these QUANTITIES that accepts a Measurement object. The second component contains the label to be displayed in the graph. In case a function is passed on in the first component, a third and fourth component are required that contain the unit and line color for the graph resp.
 
       If the label (second component) is an empty string, the standard representation of the quantity will be used as label in the graph. If the first component is a function, however, a label is required and '<?>' will be displayed if not provided.
+
+      If *graph.fast_rendering* is True, a function in the first component is evaluated once on a Measurement object of which the fields are the arrays returned by *columns*.
     """
-    indep_values: list[Union[float, NoneType]] = []
+    if graph.fast_rendering:
+      self.__visualize_decimated(graph, argv)
+      return
+
+    columns: dict[str, np.ndarray] = dict(zip(QUANTITIES, self.columns(), strict = True))
     sign: int = 1
     if graph.indep_variable == 'depth':
       sign = -1 # for visualization purposes
-    
-    for measurement in self._measurements:
-      try: # measurement can be NoneType
-        indep_values.append(
-          sign*dict(zip(QUANTITIES, measurement, strict = True))[graph.indep_variable])
-      except TypeError:
-        indep_values.append(None)
+    indep_values: list[float] = (sign*columns[graph.indep_variable]).tolist() # unavailable values are NaN
 
     x_max: float = 0.0
     for arg in argv:
@@ -75,22 +185,18 @@ class Probe:
         color = arg[3]
         if not arg_label:
           arg_label = '<?>' # label must be present in this case
-        for measurement in self._measurements:
-          try: # measurement can be NoneType
-            x_values.append(arg[0](measurement))
-          except TypeError:
-            x_values.append(None)
+        for measurement, valid in zip(self._measurements, self.validity().measurement.tolist()):
+          x_values.append(arg[0](measurement) if valid else None)
           
       else:
         unit = UNITS[arg[0]]
         color = COLORS[arg[0]]
-        for measurement in self._measurements:
-          x_values.append(dict(zip(QUANTITIES, measurement, strict = True))[arg[0]])
+        x_values = columns[arg[0]].tolist()
         
       graph.axes.plot(x_values, indep_values, color, label = arg_label +\
                       ' [' + unit + ']' if arg_label else arg[0] + ' [' + unit + ']')
 
-      x_max_arg: float = max([x_value for x_value in x_values if x_value]) #Remove None
+      x_max_arg: float = max([x_value for x_value in x_values if x_value and x_value == x_value]) #Remove None, NaN
       x_max = x_max_arg if x_max < x_max_arg else x_max
 
     graph.xlim(0, ceil(x_max/10.0)*10)
@@ -0,0 +1,272 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+
+from cptlib.probetools.data_quality import QualityStats
+from cptlib.probetools.json_source import json_file_path
+from cptlib.probetools.probe_list import ProbeList
+from cptlib.setuptools.measurement import MeasurementColumns
+
+try: # locks between processes are only available on POSIX systems
+  import fcntl
+except ImportError:
+  fcntl = None
+
+CACHE_VERSION: int = 2
+MAX_BYTES: int = 1 << 30 # 1 GiB
+
+
+class ProbeDataset:
+  """
+  The measurements of all the probes in a json file published in the cache under the key *key*: the depth, qc and fs of all measurements in the memory-mapped table *table* of shape (3, number of measurements), sorted per probe. All processes that map the same table share its physical pages.
+  """
+  def __init__(self, key: str, table: np.ndarray, probes: list[list], lock_file: Optional[object] = None):
+    """
+    Parameters
+    __________
+    key: str
+      The key of the dataset in the cache.
+    table: numpy.ndarray
+      The memory-mapped table with the depth, qc and fs of the measurements in its rows.
+    probes: list[list]
+      The number, the first and last column of its measurements in *table*, the PROBE_FIELDS and the QualityStats of each probe.
+    lock_file: file object, optional
+      The open table file holding a shared lock as long as the dataset is in use.
+    """
+    self._key: str = key
+    self._table: np.ndarray = table
+    self._ranges: dict[str, tuple[int, int]] = {probe[0]: (probe[1], probe[2]) for probe in probes}
+    self._info: dict[str, dict] = {probe[0]: probe[3] for probe in probes}
+    self._quality: dict[str, QualityStats] = {probe[0]: QualityStats(*probe[4]) for probe in probes}
+    self._lock_file: Optional[object] = lock_file
+    self._references: int = 0
+
+  def __contains__(self, number: str) -> bool:
+    return number in self._ranges
+
+  def __len__(self) -> int:
+    return len(self._ranges)
+
+  def __repr__(self) -> str:
+    return f'{self.__class__.__name__}(key={self._key}, probes={len(self._ranges)}, '\
+    f'measurements={self._table.shape[1]})'
+
+  # ========== PUBLIC METHODS ==========
+
+  @property
+  def key(self) -> str:
+    return self._key
+
+  @property
+  def numbers(self) -> list[str]:
+    """Return the probe numbers in the order in which the probes occur in the file."""
+    return list(self._ranges.keys())
+
+  @property
+  def nbytes(self) -> int:
+    return self._table.nbytes
+
+  def info(self, number: str) -> dict:
+    """Return the PROBE_FIELDS of the probe with number *number*."""
+    return self._info[number]
+
+  def quality(self, number: str) -> QualityStats:
+    """Return the QualityStats of the measurements of the probe with number *number*."""
+    return self._quality[number]
+
+  def measurements(self, number: str) -> MeasurementColumns:
+    """Return the measurements of the probe with number *number* as views of the table, without copying."""
+    start, end = self._ranges[number]
+    return MeasurementColumns(*self._table[:, start:end])
+
+
+class ProbeCache:
+  """
+  A cache in the directory *cache_dir* that is shared by all the processes on the machine, e.g., the workers of a web server. The measurements of a json file are parsed once and published as a memory-mapped table that all the processes read without copying.
+
+  A dataset is in use as long as a process holds a reference to it. The least recently used datasets that are not in use are evicted as soon as the cache exceeds *max_bytes*.
+  """
+  def __init__(self, cache_dir: str = 'probe_cache', max_bytes: int = MAX_BYTES):
+    """
+    Parameters
+    __________
+    cache_dir: str, default: 'probe_cache'
+      The directory of the cache. It is created if it doesn't exist.
+    max_bytes: int, default: MAX_BYTES
+      The size above which datasets are evicted.
+    """
+    self._cache_dir: str = cache_dir
+    self._max_bytes: int = max_bytes
+    self._datasets: dict[str, ProbeDataset] = {} # datasets in use by this process
+    self._lock = threading.Lock()
+    os.makedirs(cache_dir, exist_ok = True)
+
+  def __repr__(self) -> str:
+    return f'{self.__class__.__name__}(cache_dir={self._cache_dir}, max_bytes={self._max_bytes})'
+
+  # ========== PRIVATE METHODS ==========
+
+  def __path(self, key: str, extension: str) -> str:
+    return os.path.join(self._cache_dir, key + extension)
+
+  @staticmethod
+  def __source(json_file_name: str) -> dict:
+    """
+    Return the description of the current version of the json file named *json_file_name*. The file is identified by its inode rather than its name, such that all the links to the same file share its dataset.
+    """
+    stat = os.stat(json_file_path(json_file_name))
+    return {"version": CACHE_VERSION, "device": stat.st_dev, "inode": stat.st_ino, "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns}
+
+  @staticmethod
+  def __key(source: dict) -> str:
+    return hashlib.sha256(json.dumps(source, sort_keys = True).encode('utf-8')).hexdigest()[:32]
+
+  def __open(self, key: str, source: dict) -> Optional[ProbeDataset]:
+    """
+    Map the table of the dataset with key *key* if it has been published for *source* and return the dataset. A shared lock on the table file marks the dataset as in use, such that other processes don't evict it.
+    """
+    try:
+      lock_file = open(self.__path(key, '.npy'), 'rb')
+    except FileNotFoundError:
+      return None
+    if fcntl is not None:
+      fcntl.flock(lock_file, fcntl.LOCK_SH)
+
+    try: # the metadata is written last, so the table is complete if the metadata exists
+      with open(self.__path(key, '.json'), 'r') as file:
+        meta: dict = json.load(file)
+      if meta["source"] != source:
+        raise ValueError("The dataset belongs to another version of the json file.")
+      table: np.ndarray = np.load(self.__path(key, '.npy'), mmap_mode = 'r')
+      os.utime(self.__path(key, '.json')) # the dataset has been used recently
+    except (OSError, ValueError, KeyError):
+      lock_file.close()
+      return None
+
+    return ProbeDataset(key, table, meta["probes"], lock_file)
+
+  def __publish(self, json_file_name: str, key: str, source: dict) -> None:
+    """
+    Parse the json file named *json_file_name*, clean its measurements with the default QualityPolicy and write the table and the metadata of its dataset to the cache. The files are written under a temporary name and renamed, such that other processes never map a partial table.
+    """
+    probes = ProbeList(json_file_name)
+    columns: list[tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+    meta_probes: list[list] = []
+    start: int = 0
+    for probe in probes:
+      columns.append(probe.columns())
+      meta_probes.append([probe.number, start, start + len(probe.measurements), probe.info, list(probe.quality)])
+      start += len(probe.measurements)
+
+    table: np.ndarray = np.empty((3, start), dtype = float)
+    for probe_columns, (_, first, last, _, _) in zip(columns, meta_probes):
+      table[:, first:last] = probe_columns
+
+    suffix: str = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(self.__path(key, '.npy') + suffix, 'wb') as file:
+      np.save(file, table)
+    os.replace(self.__path(key, '.npy') + suffix, self.__path(key, '.npy'))
+    with open(self.__path(key, '.json') + suffix, 'w') as file:
+      json.dump({"source": source, "probes": meta_probes}, file)
+    os.replace(self.__path(key, '.json') + suffix, self.__path(key, '.json'))
+
+    print(f"\nPublished {start} measurements of {len(meta_probes)} probes from file {json_file_name}.json "\
+          f"in the cache {self._cache_dir}")
+
+  def __evict(self, keep: str) -> None:
+    """
+    Remove the least recently used datasets, except the dataset with key *keep* and the datasets in use by any process, until the size of the cache doesn't exceed *_max_bytes*.
+    """
+    entries: list[tuple[float, str, int]] = []
+    for file_name in os.listdir(self._cache_dir):
+      if not file_name.endswith('.json'):
+        continue
+      key: str = file_name[:-len('.json')]
+      try:
+        entries.append((os.stat(self.__path(key, '.json')).st_mtime, key,
+                        os.stat(self.__path(key, '.json')).st_size + os.stat(self.__path(key, '.npy')).st_size))
+      except OSError:
+        continue
+
+    total_bytes: int = sum(entry[2] for entry in entries)
+    for _, key, no_bytes in sorted(entries):
+      if total_bytes <= self._max_bytes:
+        break
+      if key == keep or key in self._datasets:
+        continue
+
+      try:
+        with open(self.__path(key, '.npy'), 'rb') as lock_file:
+          if fcntl is not None: # fails if another process holds a shared lock
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+          os.remove(self.__path(key, '.json'))
+          os.remove(self.__path(key, '.npy'))
+      except OSError:
+        continue
+      total_bytes -= no_bytes
+
+  # ========== PUBLIC METHODS ==========
+
+  def is_published(self, json_file_name: str) -> bool:
+    """
+    Return True if the current version of the json file named *json_file_name* (without the file extension) has been published, such that acquiring its dataset doesn't parse the file.
+    """
+    source: dict = self.__source(json_file_name)
+    try:
+      with open(self.__path(self.__key(source), '.json'), 'r') as file:
+        return json.load(file)["source"] == source
+    except (OSError, ValueError, KeyError):
+      return False
+
+  def acquire(self, json_file_name: str) -> ProbeDataset:
+    """
+    Return the dataset of the json file named *json_file_name* (without the file extension) and mark it as in use until it is passed to *release*. The file is only parsed if no process has published its current version yet.
+    """
+    source: dict = self.__source(json_file_name)
+    key: str = self.__key(source)
+    with self._lock:
+      dataset: Optional[ProbeDataset] = self._datasets.get(key)
+      if dataset is not None:
+        dataset._references += 1
+        return dataset
+
+    dataset = self.__open(key, source)
+    if dataset is None:
+      with open(self.__path(key, '.lock'), 'wb') as build_lock: # one process at a time publishes the dataset
+        if fcntl is not None:
+          fcntl.flock(build_lock, fcntl.LOCK_EX)
+        dataset = self.__open(key, source) # published by another process in the meantime
+        if dataset is None:
+          self.__publish(json_file_name, key, source)
+          dataset = self.__open(key, source)
+      try:
+        os.remove(self.__path(key, '.lock'))
+      except OSError:
+        pass
+      if dataset is None:
+        raise RuntimeError(f"The dataset of file {json_file_name}.json could not be published in the cache.")
+
+    with self._lock:
+      if key in self._datasets: # opened by another thread in the meantime
+        dataset._lock_file.close()
+        dataset = self._datasets[key]
+      else:
+        self._datasets[key] = dataset
+        self.__evict(keep = key)
+      dataset._references += 1
+    return dataset
+
+  def release(self, dataset: ProbeDataset) -> None:
+    """
+    Mark that a reference to *dataset* obtained by *acquire* is no longer used. Once no references are left, other processes may evict the dataset. The memory of its table is freed as soon as no probe refers to it anymore.
+    """
+    with self._lock:
+      dataset._references -= 1
+      if dataset._references == 0 and self._datasets.get(dataset.key) is dataset:
+        del self._datasets[dataset.key]
+        dataset._lock_file.close() # releases the shared lock
@@ -0,0 +1,258 @@
+import json
+import os
+from collections import namedtuple
+from collections.abc import Iterable
+from typing import Optional
+
+from cptlib.probetools.json_source import SEPARATOR, is_compressed, iter_records, json_file_path
+from cptlib.setuptools.measurement import PROBE_FIELDS
+
+ProbeEntry = namedtuple('ProbeEntry', ['number', 'runs', 'no_records', 'info'])
+
+INDEX_VERSION: int = 2
+
+class ProbeIndex:
+  """
+  An index of the json file named *json_file_name* that stores for each probe the byte ranges (runs of consecutive records) where its records are located in the file, together with the PROBE_FIELDS of the probe. The runs of a compressed json file are ranges of record numbers instead, since it can only be read sequentially.
+
+  The index is built by scanning the file once and is stored next to it in the file *json_file_name*.index.json. It is rebuilt when the json file has changed. The index allows to select probes by number or by their PROBE_FIELDS and to read the records of the selected probes only.
+  """
+  def __init__(self, json_file_name: str):
+    """
+    Parameter
+    _________
+    json_file_name: str
+      Name of the json file containing the records of one or multiple probes without the file extension.
+    """
+    self._json_file_name: str = json_file_name
+    self._path: str = json_file_path(json_file_name)
+    self._entries: dict[str, ProbeEntry] = {}
+    self.__load_or_build()
+
+  def __contains__(self, number: str) -> bool:
+    return number in self._entries
+
+  def __getitem__(self, number: str) -> ProbeEntry:
+    return self._entries[number]
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def __repr__(self) -> str:
+    return f'{self.__class__.__name__}(json_file_name={self._json_file_name}, probes={len(self._entries)})'
+
+  # ========== PRIVATE METHODS ==========
+
+  def __build(self) -> None:
+    """
+    Scan the json file record by record and assign the location and PROBE_FIELDS of the records of each probe to the property _entries.
+    """
+    if is_compressed(self._path):
+      self.__build_sequential()
+      return
+
+    with open(self._path, 'rb') as file:
+      content: bytes = file.read()
+
+    text: str = content.decode('utf-8')
+    is_ascii: bool = len(text) == len(content) # character offsets equal byte offsets
+    decoder = json.JSONDecoder()
+    runs: dict[str, list[list[int]]] = {}
+    no_records: dict[str, int] = {}
+    info: dict[str, dict] = {}
+    previous_number: Optional[str] = None
+    position: int = text.index('[') + 1
+    byte_position: int = len(text[:position].encode('utf-8'))
+
+    while True:
+      next_position: int = SEPARATOR.match(text, position).end()
+      if not is_ascii:
+        byte_position += len(text[position:next_position].encode('utf-8'))
+      else:
+        byte_position = next_position
+      position = next_position
+      if position >= len(text) or text[position] == ']':
+        break
+
+      record, end = decoder.raw_decode(text, position)
+      byte_end: int = end if is_ascii else byte_position + len(text[position:end].encode('utf-8'))
+      number: str = record["sondeernummer"]
+      if number not in info:
+        info[number] = {field: record.get(field) for field in PROBE_FIELDS}
+        runs[number] = []
+        no_records[number] = 0
+
+      if number == previous_number: # extend the current run
+        runs[number][-1][1] = byte_end
+      else:
+        runs[number].append([byte_position, byte_end])
+      no_records[number] += 1
+      previous_number = number
+      position, byte_position = end, byte_end
+
+    self._entries = {number: ProbeEntry(number, [tuple(run) for run in runs[number]], no_records[number],
+                                        info[number]) for number in info}
+
+  def __build_sequential(self) -> None:
+    """
+    Decompress the json file record by record and assign the record numbers and PROBE_FIELDS of the records of each probe to the property _entries.
+    """
+    runs: dict[str, list[list[int]]] = {}
+    no_records: dict[str, int] = {}
+    info: dict[str, dict] = {}
+    previous_number: Optional[str] = None
+    for position, record in enumerate(iter_records(self._path)):
+      number: str = record["sondeernummer"]
+      if number not in info:
+        info[number] = {field: record.get(field) for field in PROBE_FIELDS}
+        runs[number] = []
+        no_records[number] = 0
+
+      if number == previous_number: # extend the current run
+        runs[number][-1][1] = position + 1
+      else:
+        runs[number].append([position, position + 1])
+      no_records[number] += 1
+      previous_number = number
+
+    self._entries = {number: ProbeEntry(number, [tuple(run) for run in runs[number]], no_records[number],
+                                        info[number]) for number in info}
+
+  def __load(self) -> bool:
+    """
+    Load the index from the file *_json_file_name*.index.json into the property _entries and return True if it belongs to the current version of the json file, otherwise return False.
+    """
+    try:
+      with open(self._json_file_name + ".index.json", 'r') as file:
+        stored: dict = json.load(file)
+    except (OSError, ValueError):
+      return False
+
+    if stored.get("source") != self.__source():
+      return False
+    self._entries = {entry[0]: ProbeEntry(entry[0], [tuple(run) for run in entry[1]], entry[2], entry[3])
+                     for entry in stored["probes"]}
+    return True
+
+  def __load_or_build(self) -> None:
+    """
+    Load the index from the file *_json_file_name*.index.json if it belongs to the current version of the json file. Otherwise, build the index and try to store it.
+    """
+    if self.__load():
+      return
+
+    source: dict = self.__source()
+    index_file_name: str = self._json_file_name + ".index.json"
+    self.__build()
+    print(f"\nIndexed {len(self._entries)} probes in file {self._path}")
+    temporary_file_name: str = f"{index_file_name}.{os.getpid()}.tmp"
+    try:
+      with open(temporary_file_name, 'w') as file:
+        json.dump({"source": source, "probes": [list(entry) for entry in self._entries.values()]}, file)
+      os.replace(temporary_file_name, index_file_name) # atomic, concurrent readers never see a partial index
+    except OSError: # the index is still usable in memory
+      pass
+
+  def __source(self) -> dict:
+    """Return the version of the index and the name, size and modification time of the json file."""
+    stat = os.stat(self._path)
+    return {"version": INDEX_VERSION, "file": os.path.basename(self._path), "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns}
+
+  def __read_sequential(self, numbers: Iterable[str]) -> list[dict]:
+    """
+    Decompress the json file up to the last record of the probes with a number in *numbers* and return their records as dictionaries in a list, in the order of *numbers*.
+    """
+    numbers = list(numbers)
+    wanted: dict[str, list[dict]] = {number: [] for number in numbers}
+    if not wanted:
+      return []
+    last: int = max(run[1] for number in wanted for run in self._entries[number].runs)
+    for position, record in enumerate(iter_records(self._path)):
+      if record["sondeernummer"] in wanted:
+        wanted[record["sondeernummer"]].append(record)
+      if position + 1 >= last:
+        break
+
+    return [record for number in numbers for record in wanted[number]]
+
+  # ========== PUBLIC METHODS ==========
+
+  @classmethod
+  def stored(cls, json_file_name: str) -> Optional["ProbeIndex"]:
+    """
+    Return the index of the json file named *json_file_name* if it has been stored for the current version of the file, otherwise None. Unlike the initialization, the file is never scanned.
+    """
+    index: ProbeIndex = cls.__new__(cls)
+    index._json_file_name = json_file_name
+    index._path = json_file_path(json_file_name)
+    index._entries = {}
+    return index if index.__load() else None
+
+  @property
+  def path(self) -> str:
+    """Return the path of the json file, including its extension."""
+    return self._path
+
+  @property
+  def numbers(self) -> list[str]:
+    """Return the probe numbers in the order in which the probes occur in the file."""
+    return list(self._entries.keys())
+
+  def read_records(self, numbers: Iterable[str]) -> list[dict]:
+    """
+    Read the records of the probes with a number in *numbers* from the json file and return them as dictionaries in a list. Only the byte ranges of these probes are read and parsed. A compressed json file is decompressed up to the last record of these probes.
+    """
+    if is_compressed(self._path):
+      return self.__read_sequential(numbers)
+
+    records: list[dict] = []
+    with open(self._path, 'rb') as file:
+      for number in numbers:
+        for start, end in self._entries[number].runs:
+          file.seek(start)
+          records.extend(json.loads(b'[' + file.read(end - start) + b']'))
+
+    return records
+
+  def select(self, numbers: Optional[Iterable[str]] = None,
+             bbox: Optional[tuple[float, float, float, float]] = None,
+             date_range: tuple[Optional[int], Optional[int]] = (None, None), method: Optional[str] = None,
+             offset: int = 0, limit: Optional[int] = None) -> list[str]:
+    """
+    Return the numbers of the probes that satisfy all the given criteria in the order in which they occur in the file.
+
+    Parameters
+    __________
+    numbers: Iterable[str], optional
+      The probe numbers to select from.
+    bbox: tuple[float, float, float, float], optional
+      The rectangle (x_min, y_min, x_max, y_max) in which the probes lay.
+    date_range: tuple[int | None, int | None], default: (None, None)
+      The earliest and latest 'datum_aanvang' (ms since epoch) of the probes.
+    method: str, optional
+      The 'sondeermethode' of the probes.
+    offset: int, default: 0
+      The number of selected probes to skip.
+    limit: int, optional
+      The maximum number of probes to return.
+    """
+    wanted: Optional[set[str]] = set(numbers) if numbers is not None else None
+    selected: list[str] = []
+    for number, entry in self._entries.items():
+      info: dict = entry.info
+      if wanted is not None and number not in wanted:
+        continue
+      if bbox is not None and (info.get('x') is None or info.get('y') is None or
+                               not (bbox[0] <= info['x'] <= bbox[2] and bbox[1] <= info['y'] <= bbox[3])):
+        continue
+      if date_range != (None, None):
+        date: Optional[int] = info.get('datum_aanvang')
+        if date is None or (date_range[0] is not None and date < date_range[0]) or \
+          (date_range[1] is not None and date > date_range[1]):
+          continue
+      if method is not None and info.get('sondeermethode') != method:
+        continue
+      selected.append(number)
+
+    return selected[offset:] if limit is None else selected[offset:offset + limit]
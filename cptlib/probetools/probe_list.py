@@ -1,33 +1,64 @@
 import json
+import weakref
 from collections import defaultdict
-from typing import Iterator
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Iterator, Optional
 
+import numpy as np
+
+from cptlib.probetools.data_quality import QualityPolicy, QualityStats, check_policy, clean_columns
+from cptlib.probetools.json_source import is_compressed, iter_records, json_file_path
 from cptlib.probetools.probe import Probe
+from cptlib.probetools.probe_index import ProbeIndex
 from cptlib.setuptools.decorators import filter
-from cptlib.setuptools.measurement import Measurement
+from cptlib.setuptools.measurement import PROBE_FIELDS, Measurement
+
+if TYPE_CHECKING:
+  from cptlib.probetools.probe_cache import ProbeCache
 
 
 class ProbeList:
   """
-  A list of the probes that are stored in the json file named *json_file_name*.
+  A list of the probes that are stored in the json file named *json_file_name*. The json file may be compressed (.json.gz or .json.zst) or be a zip archive of json files, which are decompressed while the records are read.
   
   Each record in the json file is expected to have at least the following four fields: 'diepte' (depth), 'qc' (cone resistance), 'fs' (sleeve friction) and 'sondeernummer' (probe number).
+
+  The measurements of each probe are cleaned once during the import according to a QualityPolicy, which also determines their ValidityMasks, such that the analyses don't need to check each measurement for unavailable values.
   """
 
-  def __init__(self, json_file_name: str):
+  def __init__(self, json_file_name: str, probe_numbers: Optional[Iterable[str]] = None,
+               cache: Optional['ProbeCache'] = None, policy: QualityPolicy = QualityPolicy()):
     """
-    Parameter
+    Parameters
     __________
     json_file_name: str
-      Name of the json file containing the records of one or multiple probes without the file extension.
+      Name of the json file containing the records of one or multiple probes without the file extension (see json_source.EXTENSIONS).
+    probe_numbers: Iterable[str], optional
+      The numbers of the probes to import. Only the records of these probes are read from the file by means of its ProbeIndex. All the probes are imported if not provided.
+    cache: ProbeCache, optional
+      A cache shared by several processes. If provided, the measurements are views of the dataset of the file in the cache instead of being read from the file.
+    policy: QualityPolicy, default: QualityPolicy()
+      How the measurements are cleaned. By default, they are only sorted by depth and invalid values are marked.
     """
+    check_policy(policy)
+    self._policy: QualityPolicy = policy
     self._probes: dict[str, list[Measurement]] = defaultdict(list)
-    self.__import_probe_data(json_file_name)
+    self._info: dict[str, dict] = {}
+    self._quality: dict[str, QualityStats] = {}
+    if cache is not None:
+      self.__map_probe_data(json_file_name, probe_numbers, cache)
+    else:
+      self.__import_probe_data(json_file_name, probe_numbers)
+
+  def __getitem__(self, index: int | str) -> Probe:
+    if isinstance(index, str): # look up the probe by its number
+      if index not in self._probes:
+        raise KeyError(f"There is no probe with number {index} in the list.")
+      return Probe(index, self._probes[index], self._info.get(index), self._quality.get(index))
 
-  def __getitem__(self, index: int) -> Probe:
     number: str = list(self._probes.keys())[index]
     measurements: list[Measurement] = list(self._probes.values())[index]
-    return Probe(number, measurements)
+    return Probe(number, measurements, self._info.get(number), self._quality.get(number))
 
   def __iter__(self) -> Iterator[Probe]:
     self._position: int = 0
@@ -49,24 +80,77 @@ class ProbeList:
 
   # ========== PRIVATE METHODS ==========
 
-  def __import_probe_data(self, json_file_name: str) -> None:
-    records: list[dict] = self.read_records(json_file_name)
-    self.__separate_probes(records)
+  def __import_probe_data(self, json_file_name: str, probe_numbers: Optional[Iterable[str]]) -> None:
+    path: str = json_file_path(json_file_name)
+    records: Iterable[dict]
+    if probe_numbers is not None:
+      records = self.read_probe_records(json_file_name, probe_numbers)
+    elif is_compressed(path): # the records are grouped per probe while the file is being decompressed
+      records = self.stream_records(json_file_name)
+    else:
+      records = self.read_records(json_file_name)
+    no_records: int = self.__separate_probes(records)
 
     print(
-        f"\nImported {len(records)} measurements from file {json_file_name}.json"
+        f"\nImported {no_records} measurements from file {path}"
     )
 
-  def __separate_probes(self, records: list[dict]) -> None:
+  def __map_probe_data(self, json_file_name: str, probe_numbers: Optional[Iterable[str]], cache: 'ProbeCache') -> None:
     """
-    Group the elements of *records* per probe and sort them statistically per probe based on the depth. The measurements of the probes in the _probe property are updated and a new prope is added if encountered. The latter one is accomplished by adding a new key to *_probe* containing the probe number and assigning a list of the measurements as the corresponding value.
+    Assign the measurements of the probes with a number in *probe_numbers* (all probes if None) to the _probes property as views of the dataset of the json file in *cache*. Unknown probe numbers are ignored. The dataset is released when the list is garbage collected.
     """
-    for record in records:
-      self._probes[record["sondeernummer"]].append(
-          Measurement(record["diepte"], qc=record["qc"], fs=record["fs"]))
+    dataset = cache.acquire(json_file_name)
+    weakref.finalize(self, cache.release, dataset)
+    numbers: list[str] = dataset.numbers if probe_numbers is None else \
+      [number for number in probe_numbers if number in dataset]
+    for number in numbers:
+      self._info[number] = dataset.info(number)
+      if self._policy == QualityPolicy(): # the dataset has been cleaned with the default policy
+        self._probes[number] = dataset.measurements(number)
+        self._quality[number] = dataset.quality(number)
+      else:
+        self._probes[number], stats = clean_columns(*dataset.measurements(number).columns, self._policy)
+        self._quality[number] = stats._replace(sorted = dataset.quality(number).sorted)
+
+    print(
+        f"\nMapped {sum(len(measurements) for measurements in self._probes.values())} measurements of {len(numbers)} "\
+        f"probes from the cache of file {json_file_name}.json"
+    )
+
+  def __separate_probes(self, records: Iterable[dict]) -> int:
+    """
+    Group the elements of *records* per probe and clean the measurements of each probe according to the _policy property, which sorts them statistically based on the depth. The measurements of the probes in the _probe property are updated and a new prope is added if encountered. The latter one is accomplished by adding a new key to *_probe* containing the probe number and assigning the cleaned measurements as the corresponding value. Their QualityStats are stored in the _quality property.
 
-    for measurements in self._probes.values():
-      measurements.sort(key=lambda x: x.depth)
+    The PROBE_FIELDS of the first record of a probe are stored in the _info property. Return the number of records.
+    """
+    values: dict[str, list[tuple]] = defaultdict(list)
+    no_records: int = 0
+    for record in records:
+      no_records += 1
+      if record["sondeernummer"] not in self._info:
+        self._info[record["sondeernummer"]] = {field: record.get(field) for field in PROBE_FIELDS}
+      values[record["sondeernummer"]].append((record["diepte"], record["qc"], record["fs"]))
+
+    for number, probe_values in values.items():
+      table: np.ndarray = np.array(probe_values, dtype = float) # None becomes NaN
+      self._probes[number], self._quality[number] = clean_columns(table[:, 0], table[:, 1], table[:, 2],
+                                                                  self._policy)
+
+    self.__report_quality()
+    return no_records
+
+  def __report_quality(self) -> None:
+    """Print the quality problems of the measurements that have been found and solved while cleaning them."""
+    totals: list[int] = [sum(stats[field] for stats in self._quality.values())
+                         for field in range(1, len(QualityStats._fields) - 1)]
+    no_unsorted: int = sum(not stats.sorted for stats in self._quality.values())
+    problems: list[str] = [f"{total} {description}" for total, description in zip(
+      totals, ("invalid qc values", "invalid fs values", "repeated depths", "dropped measurements",
+               "interpolated values")) if total]
+    if no_unsorted:
+      problems.append(f"{no_unsorted} probes not sorted by depth")
+    if problems:
+      print(f"\nData quality: {', '.join(problems)}.")
 
   # ========== PUBLIC METHODS ==========
 
@@ -80,6 +164,13 @@ class ProbeList:
 
     for m in probe.measurements:
       self._probes[probe.number].append(m)
+    self._info[probe.number] = probe.info
+    if probe.quality is not None:
+      self._quality[probe.number] = probe.quality
+
+  def quality(self) -> dict[str, QualityStats]:
+    """Return the QualityStats of the measurements of each probe that has been imported from the file."""
+    return dict(self._quality)
 
   @staticmethod
   @filter('diepte')
@@ -87,10 +178,47 @@ class ProbeList:
     """
     Read the records from the json file and return them as dictionaries in a list.
     """
+    path: str = json_file_path(json_file_name)
     records: list[dict] = []
-    with open(json_file_name + ".json", 'r') as file:
-      records = json.load(file)
+    if is_compressed(path):
+      records = list(iter_records(path))
+    else:
+      with open(path, 'r') as file:
+        records = json.load(file)
+
+    print(f"\nRead {len(records)} records from file {path}")
+
+    return records
+
+  @staticmethod
+  def stream_records(json_file_name: str) -> Iterator[dict]:
+    """
+    Yield the records from the json file one at a time while it is being read (and decompressed), such that neither the content of the file nor the records are kept in memory as a whole. The records of which the field 'diepte' is unavailable are skipped.
+    """
+    path: str = json_file_path(json_file_name)
+    no_records: int = 0
+    no_removed: int = 0
+    for record in iter_records(path):
+      no_records += 1
+      if record['diepte'] is None:
+        no_removed += 1
+        continue
+      yield record
+
+    print(f"\nRead {no_records} records from file {path}")
+    if no_removed:
+      print(f"\nRemoved {no_removed} records of which the field 'diepte' is unavailable.")
+
+  @staticmethod
+  @filter('diepte')
+  def read_probe_records(json_file_name: str, probe_numbers: Iterable[str]) -> list[dict]:
+    """
+    Read the records of the probes with a number in *probe_numbers* from the json file and return them as dictionaries in a list. Unknown probe numbers are ignored.
+    """
+    index = ProbeIndex(json_file_name)
+    numbers: list[str] = [number for number in probe_numbers if number in index]
+    records: list[dict] = index.read_records(numbers)
 
-    print(f"\nRead {len(records)} records from file {json_file_name}.json")
+    print(f"\nRead {len(records)} records of {len(numbers)} probes from file {index.path}")
 
     return records
@@ -1,3 +1,4 @@
+import os
 from collections import namedtuple
 
 import requests
@@ -8,6 +9,9 @@ from shapely.geometry import Point
 
 ProbeLocation = namedtuple('ProbeLocation', ['number','x_coord','y_coord'])
 
+# The geoserver of DOV, which can be replaced by a local stand-in, e.g., during a load test
+DOV_URL: str = os.environ.get('DOV_GEOSERVER_URL', 'https://www.dov.vlaanderen.be/geoserver')
+
 class ProbeLocationList:
   """
   A list of the probe locations laying within the rectangle with lower left corner *xy_min* and upper right corner *xy_max*. The probe locations are retrieved from the geoserver of 'Databank Ondergrond Vlaanderen (DOV)'.
@@ -41,7 +45,7 @@ class ProbeLocationList:
     """
     Retrieve the probe locations from the geoserver of DOV laying inside the rectangle spanned by *_xy_min* and *_xy_max* and assign them in a list to *_locations*.
     """
-    URL: str = 'https://www.dov.vlaanderen.be/geoserver'
+    URL: str = DOV_URL
     URL_PATH: str = '/ows?service=WFS&version=1.0.0&request=GetFeature&typeName='\
     'dov-pub:Sonderingen&BBOX=' + '%g,%g,%g,%g' % (*self._xy_min, *self._xy_max) + \
     ',urn:ogc:def:crs:EPSG::31370'
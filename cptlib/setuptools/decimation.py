@@ -0,0 +1,40 @@
+import numpy as np
+
+
+def min_max_indices(indep_values: np.ndarray, values: np.ndarray, no_bins: int) -> np.ndarray:
+  """
+  Return the sorted indices of the points of the curve (*values*, *indep_values*) that need to be drawn such that the
+  curve looks the same when the range of *indep_values* is displayed on *no_bins* pixel rows.
+
+  The points are grouped per pixel row and only the first, last, minimum and maximum value of each group are kept
+  (min/max decimation). The points that start or end a gap in the curve (NaN) are kept as well so that the gaps remain
+  visible. The values of *indep_values* are required to be sorted.
+  """
+  LEN_VALUES: int = len(values)
+  if LEN_VALUES <= 4*no_bins:
+    return np.arange(LEN_VALUES)
+
+  finite: np.ndarray = np.isfinite(values) & np.isfinite(indep_values)
+  indices: np.ndarray = np.flatnonzero(finite)
+  if indices.size == 0:
+    return indices
+
+  span: float = indep_values[indices[-1]] - indep_values[indices[0]]
+  bins: np.ndarray = np.zeros(indices.size, dtype=int)
+  if span != 0:
+    bins = np.minimum(((indep_values[indices] - indep_values[indices[0]])*no_bins/span).astype(int),
+                      no_bins - 1)
+
+  # The bins are monotonic, so each group is a contiguous block of indices
+  first_in_bin: np.ndarray = np.flatnonzero(np.diff(bins, prepend=-1))
+  last_in_bin: np.ndarray = np.append(first_in_bin[1:] - 1, indices.size - 1)
+  finite_values: np.ndarray = values[indices]
+  argmin: np.ndarray = np.lexsort((finite_values, bins))[first_in_bin]
+  argmax: np.ndarray = np.lexsort((-finite_values, bins))[first_in_bin]
+
+  # A point next to a NaN breaks the line and needs to be kept together with the NaN
+  gap_edges: np.ndarray = np.flatnonzero(np.diff(finite.astype(int)))
+  gaps: np.ndarray = np.concatenate((gap_edges, gap_edges + 1))
+
+  return np.unique(np.concatenate((indices[first_in_bin], indices[last_in_bin], indices[argmin],
+                                   indices[argmax], gaps)))
@@ -19,7 +19,8 @@ class GraphSetUp:
 
   All the methods from the pyplot module can be called by an instance of this class.
   """
-  def __init__(self, file_name: str, indep_variable: str, title: str = '', legend_font_size: str = 'medium'):
+  def __init__(self, file_name: str, indep_variable: str, title: str = '', legend_font_size: str = 'medium',
+               fast_rendering: bool = False):
     """
     Parameters
     __________
@@ -31,6 +32,9 @@ class GraphSetUp:
       The title that appears on top of the plot.
     font_size: str, default: 'medium'
       The font size of the legend labels, i.e., 'xx-small', 'x-small', 'small', 'medium', 'large', 'x-large' or 'xx-large'.
+    fast_rendering: bool, default: False
+      The curves are decimated to the points that are visible at the resolution of the figure and the zones are drawn
+      as one collection per SBT if its value is True.
     """
     if not set(QUANTITIES).intersection({indep_variable}):
       raise ValueError(f"Class '{self.__class__.__name__}' cannot be instantiated"\
@@ -43,6 +47,7 @@ class GraphSetUp:
     self._file_name: str = file_name
     self._indep_variable: str = indep_variable
     self._legend_font_size = legend_font_size
+    self._fast_rendering: bool = fast_rendering
     
     self._axes.set_title(title)
     self._axes.set_ylabel(indep_variable + ' [' + UNITS[indep_variable] + ']')
@@ -60,6 +65,10 @@ class GraphSetUp:
   def axes(self) -> axs._axes.Axes:
     return self._axes
 
+  @property
+  def fast_rendering(self) -> bool:
+    return self._fast_rendering
+
   def free_yticklabels_from_minus(self) -> None:
     """Remove the minus sign from the ytick labels."""
     new_yticklabels: list[Text] = []
@@ -101,6 +110,10 @@ class GraphSetUp:
       self._axes.legend(list(by_label.values()), list(by_label.keys()),
                         fontsize=self._legend_font_size)
 
+  def pixel_rows(self) -> int:
+    """Return the height of the figure in pixels."""
+    return int(self._fig.get_figheight()*self._fig.dpi)
+
   def save(self, bytesio: bool = False) -> BytesIO | None:
     "Save the figure to a png file named *_file_name* or to a png BytesIO object if *bytesio* is *True*."
     if bytesio:
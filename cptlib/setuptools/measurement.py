@@ -1,6 +1,69 @@
 from collections import namedtuple
+from collections.abc import Iterator, Sequence
+from typing import Optional
+
+import numpy as np
 
 QUANTITIES: tuple[str,str,str] = ('depth','qc','fs')
 COLORS: dict[str,str] = dict(zip(QUANTITIES, ('silver','lime','red'), strict = True))
 UNITS: dict[str, str] = dict(zip(QUANTITIES, ('m','MPa','kPa'), strict = True))
 Measurement = namedtuple('Measurement', QUANTITIES)
+
+# Masks of the measurements with a valid (available and positive) qc, fs and both qc and fs
+ValidityMasks = namedtuple('ValidityMasks', ['qc', 'fs', 'measurement'])
+
+# Fields of a record that describe the probe as a whole rather than a single measurement
+PROBE_FIELDS: tuple[str, ...] = ('x', 'y', 'start_sondering_mtaw', 'diepte_gw_m', 'datum_aanvang',
+                                 'sondeermethode')
+
+
+def validity_masks(qc: np.ndarray, fs: np.ndarray) -> ValidityMasks:
+  """Return the masks of the values in *qc* and *fs* that are available (not NaN) and positive."""
+  with np.errstate(invalid='ignore'):
+    qc_valid: np.ndarray = np.isfinite(qc) & (qc > 0)
+    fs_valid: np.ndarray = np.isfinite(fs) & (fs > 0)
+  return ValidityMasks(qc_valid, fs_valid, qc_valid & fs_valid)
+
+
+class MeasurementColumns(Sequence):
+  """
+  A read-only sequence of the Measurement objects of a probe that is backed by the three arrays *depth*, *qc* and *fs*, e.g., views of a memory-mapped table. The Measurement objects are created on access, unavailable values (NaN) become None as in the records.
+
+  The ValidityMasks of the measurements are computed once, unless they are given by *validity*.
+  """
+  def __init__(self, depth: np.ndarray, qc: np.ndarray, fs: np.ndarray, validity: Optional[ValidityMasks] = None):
+    self._columns: tuple[np.ndarray, np.ndarray, np.ndarray] = (depth, qc, fs)
+    self._validity: Optional[ValidityMasks] = validity
+
+  def __getitem__(self, index: int | slice) -> Measurement | list[Measurement]:
+    if isinstance(index, slice):
+      return [self.__measurement(row) for row in zip(*(column[index].tolist() for column in self._columns))]
+    return self.__measurement(tuple(column[index].item() for column in self._columns))
+
+  def __iter__(self) -> Iterator[Measurement]:
+    for row in zip(*(column.tolist() for column in self._columns)):
+      yield self.__measurement(row)
+
+  def __len__(self) -> int:
+    return len(self._columns[0])
+
+  def __repr__(self) -> str:
+    return repr(list(self))
+
+  # ========== PRIVATE METHODS ==========
+
+  @staticmethod
+  def __measurement(row: tuple[float, float, float]) -> Measurement:
+    return Measurement(*(None if value != value else value for value in row)) # NaN != NaN
+
+  # ========== PUBLIC METHODS ==========
+
+  @property
+  def columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return self._columns
+
+  @property
+  def validity(self) -> ValidityMasks:
+    if self._validity is None:
+      self._validity = validity_masks(self._columns[1], self._columns[2])
+    return self._validity
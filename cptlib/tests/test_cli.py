@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import pandas as pd
+
+from cptlib.cli import find_input_files, main
+
+INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe'
+
+class TestCli(TestCase):
+  def setUp(self):
+    self._dir: str = tempfile.mkdtemp()
+    self._input_dir: str = os.path.join(self._dir, 'input')
+    self._output_dir: str = os.path.join(self._dir, 'output')
+    os.makedirs(os.path.join(self._input_dir, 'site'))
+    shutil.copy(INPUT_FILE + '.json', os.path.join(self._input_dir, 'probes.json'))
+    shutil.copy(INPUT_FILE + '.json', os.path.join(self._input_dir, 'site', 'other_probes.json'))
+
+  def tearDown(self):
+    shutil.rmtree(self._dir)
+
+  def test_find_input_files(self):
+    open(os.path.join(self._input_dir, 'probes.index.json'), 'w').close()
+
+    self.assertListEqual(find_input_files([self._input_dir]),
+                         [os.path.join(self._input_dir, 'probes'), os.path.join(self._input_dir, 'site', 'other_probes')])
+    self.assertListEqual(find_input_files([os.path.join(self._input_dir, '*.json'), self._input_dir + '/']),
+                         [os.path.join(self._input_dir, 'probes'), os.path.join(self._input_dir, 'site', 'other_probes')])
+
+  def test_outputs(self):
+    status: int = main([self._input_dir, '-o', self._output_dir, '-a', 'zones', 'layers', '-z', '3', '-j', '2',
+                        '--chunk-size', '1'])
+    layers = pd.read_csv(os.path.join(self._output_dir, 'probes.layers-zone3.csv'))
+    zones = pd.read_csv(os.path.join(self._output_dir, 'other_probes.zones.csv'))
+
+    self.assertEqual(status, 0)
+    self.assertListEqual(list(layers["probe number"]), ['2000912_S1', '2000912_S2'])
+    self.assertListEqual(list(layers["# layers"]), [0, 1])
+    self.assertListEqual(sorted(set(zones["probe number"])), ['2000912_S1', '2000912_S2'])
+
+  def test_resume(self):
+    arguments: list[str] = [self._input_dir, '-o', self._output_dir, '-a', 'zones', '-j', '1']
+    main(arguments)
+    output_file: str = os.path.join(self._output_dir, 'probes.zones.csv')
+    os.utime(output_file, (0, 0)) # older than the input file
+    mtime: float = os.path.getmtime(os.path.join(self._output_dir, 'other_probes.zones.csv'))
+
+    main(arguments)
+
+    self.assertGreater(os.path.getmtime(output_file), 0) # analysed again
+    self.assertEqual(os.path.getmtime(os.path.join(self._output_dir, 'other_probes.zones.csv')), mtime) # skipped
+
+  def test_failed_file(self):
+    with open(os.path.join(self._input_dir, 'broken.json'), 'w') as file:
+      file.write('[{"sondeernummer": ')
+
+    status: int = main([self._input_dir, '-o', self._output_dir, '-a', 'layers', '-j', '1'])
+
+    self.assertEqual(status, 1)
+    self.assertTrue(os.path.exists(os.path.join(self._output_dir, 'probes.layers-zone0.csv')))
+    self.assertFalse(os.path.exists(os.path.join(self._output_dir, 'broken.layers-zone0.csv')))
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from cptlib.layertools.cross_section import CrossSection, project_onto_polyline, section_probe_numbers
+from cptlib.layertools.zones_cache import ZonesCache
+from cptlib.layertools.zones_probe import ZonesProbe
+from cptlib.probetools.probe_index import ProbeIndex
+from cptlib.probetools.probe_list import ProbeList
+from cptlib.setuptools.graph_set_up import GraphSetUp
+
+INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe'
+VERTICES: np.ndarray = np.array([[152150.0, 207450.0], [152400.0, 207200.0], [153000.0, 206950.0]])
+
+class TestCrossSection(TestCase):
+  def setUp(self):
+    self._probes = ProbeList(INPUT_FILE)
+
+  def test_project_onto_polyline(self):
+    chainages, offsets = project_onto_polyline(np.array([[1.0, 1.0], [3.0, 2.0], [-1.0, 0.0]]),
+                                               np.array([[0.0, 0.0], [2.0, 0.0], [2.0, 4.0]]))
+
+    np.testing.assert_allclose(chainages, [1.0, 4.0, 0.0])
+    np.testing.assert_allclose(offsets, [1.0, 1.0, 1.0])
+
+  def test_section_probe_numbers(self):
+    with tempfile.TemporaryDirectory() as directory: # such that the stored index doesn't end up next to the input file
+      file_name: str = os.path.join(directory, 'probes')
+      shutil.copy(INPUT_FILE + '.json', file_name + '.json')
+      index = ProbeIndex(file_name)
+
+    self.assertListEqual(section_probe_numbers(index, VERTICES[:2], 100.0), ['2000912_S1', '2000912_S2'])
+    self.assertListEqual(section_probe_numbers(index, VERTICES[1::-1], 100.0), ['2000912_S2', '2000912_S1'])
+    self.assertListEqual(section_probe_numbers(index, VERTICES + 1000.0, 100.0), [])
+
+  def test_polygons(self):
+    section = CrossSection(self._probes, VERTICES, max_offset = 100.0)
+    vertices, numbers = section.polygons()
+    no_zones: int = sum(len(ZonesProbe(probe)) for probe in self._probes)
+
+    self.assertEqual(len(section), 2)
+    self.assertTrue(section.elevation)
+    self.assertEqual(vertices.shape[1:], (4, 2))
+    self.assertEqual(len(vertices), len(numbers))
+    np.testing.assert_array_equal(numbers[-no_zones:], np.concatenate([ZonesProbe(probe).columns()[2]
+                                                                       for probe in self._probes])) # the columns
+    first, second = section
+    self.assertTrue(np.all((vertices[:, :, 0] >= first.chainage - 0.01*section.length) &
+                           (vertices[:, :, 0] <= second.chainage + 0.01*section.length)))
+
+  def test_max_offset(self):
+    self.assertEqual(len(CrossSection(self._probes, VERTICES, max_offset = 1.0)), 0)
+
+  def test_zones_cache(self):
+    cache = ZonesCache(max_entries = 1)
+    section = CrossSection(self._probes, VERTICES, cache = cache, source = 'v1')
+    zones = cache.zones(self._probes[1], source = 'v1')
+
+    self.assertIs(list(section)[1].zones, zones) # classified once
+    self.assertEqual(len(cache), 1)
+
+  def test_visualize(self):
+    graph = GraphSetUp(file_name = 'section', indep_variable = 'depth')
+    CrossSection(self._probes, VERTICES).visualize(graph)
+
+    self.assertEqual(len(graph.axes.collections), # one per SBT and the probe lines
+                     len(np.unique(CrossSection(self._probes, VERTICES).polygons()[1])) + 2)
+    graph.close('all')
+
+  def test_too_few_vertices(self):
+    with self.assertRaises(ValueError):
+      CrossSection(self._probes, VERTICES[:1])
@@ -0,0 +1,76 @@
+from unittest import TestCase
+
+import numpy as np
+
+from cptlib.probetools.data_quality import QualityPolicy, clean_columns, short_gaps
+from cptlib.probetools.probe_list import ProbeList
+
+INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe'
+NAN: float = float('nan')
+
+class TestDataQuality(TestCase):
+  def setUp(self):
+    self._depth: np.ndarray = np.array([0.3, 0.1, 0.2, 0.2, 0.4, 0.5, 0.6, 0.7])
+    self._qc: np.ndarray = np.array([3.0, 1.0, 2.0, 4.0, NAN, 5.0, NAN, NAN])
+    self._fs: np.ndarray = np.array([30.0, 10.0, 20.0, NAN, 40.0, 50.0, 60.0, 70.0])
+
+  def test_mark(self):
+    measurements, stats = clean_columns(self._depth, self._qc, self._fs)
+    depth, qc, _ = measurements.columns
+
+    np.testing.assert_array_equal(depth, [0.1, 0.2, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7])
+    np.testing.assert_array_equal(qc[:4], [1.0, 2.0, 4.0, 3.0])
+    np.testing.assert_array_equal(measurements.validity.measurement,
+                                  [True, True, False, True, False, True, False, False])
+    self.assertEqual(stats, (8, 3, 1, 1, 0, 0, False))
+    self.assertIsNone(measurements[4].qc)
+
+  def test_sorted_not_copied(self):
+    depth: np.ndarray = np.sort(self._depth)
+
+    measurements, stats = clean_columns(depth, self._qc, self._fs)
+
+    self.assertTrue(stats.sorted)
+    self.assertIs(measurements.columns[0], depth)
+
+  def test_duplicates(self):
+    first, _ = clean_columns(self._depth, self._qc, self._fs, QualityPolicy(duplicates = 'first'))
+    mean, _ = clean_columns(self._depth, self._qc, self._fs, QualityPolicy(duplicates = 'mean'))
+
+    self.assertEqual(len(first), 7)
+    self.assertEqual(first[1], (0.2, 2.0, 20.0))
+    self.assertEqual(mean[1], (0.2, 3.0, 20.0))
+
+  def test_drop(self):
+    measurements, stats = clean_columns(self._depth, self._qc, self._fs, QualityPolicy(missing = 'drop'))
+
+    self.assertEqual(stats.no_dropped, 4)
+    self.assertTrue(measurements.validity.measurement.all())
+
+  def test_interpolate(self):
+    measurements, stats = clean_columns(self._depth, self._qc, self._fs,
+                                        QualityPolicy(missing = 'interpolate', max_gap = 1))
+    _, qc, fs = measurements.columns
+
+    self.assertEqual(stats.no_interpolated, 2)
+    self.assertAlmostEqual(qc[4], 4.0)
+    self.assertAlmostEqual(fs[2], 20.0) # repeated depth
+    self.assertTrue(np.isnan(qc[6:]).all()) # not between two valid values
+
+  def test_short_gaps(self):
+    valid: np.ndarray = np.array([False, True, False, False, True, False, True, False])
+
+    np.testing.assert_array_equal(short_gaps(valid, 1), [False, False, False, False, False, True, False, False])
+    np.testing.assert_array_equal(short_gaps(valid, 2), [False, False, True, True, False, True, False, False])
+
+  def test_probe_list_policy(self):
+    probes = ProbeList(INPUT_FILE)
+    dropped_probes = ProbeList(INPUT_FILE, policy = QualityPolicy(missing = 'drop'))
+
+    for probe, dropped_probe in zip(probes, dropped_probes):
+      self.assertEqual(len(dropped_probe.measurements), int(probe.validity().measurement.sum()))
+      self.assertEqual(dropped_probe.quality.no_dropped, len(probe.measurements) - len(dropped_probe.measurements))
+
+  def test_invalid_policy(self):
+    with self.assertRaises(ValueError):
+      ProbeList(INPUT_FILE, policy = QualityPolicy(missing = 'ignore'))
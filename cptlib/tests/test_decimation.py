@@ -0,0 +1,40 @@
+from unittest import TestCase
+
+import numpy as np
+
+from cptlib.setuptools.decimation import min_max_indices
+
+
+class TestDecimation(TestCase):
+  def test_short_curve_unchanged(self):
+    expected_len: int = 10
+
+    indices: np.ndarray = min_max_indices(np.arange(10.0), np.ones(10), no_bins = 5)
+    self.assertEqual(len(indices), expected_len)
+
+  def test_min_max_kept_per_bin(self):
+    depth: np.ndarray = np.linspace(0.0, 10.0, 10000)
+    values: np.ndarray = np.sin(depth*7.0) + 0.1*np.cos(depth*311.0)
+    no_bins: int = 50
+
+    indices: np.ndarray = min_max_indices(depth, values, no_bins)
+
+    self.assertLessEqual(len(indices), 4*no_bins)
+    self.assertTrue(np.all(np.diff(indices) > 0))
+    bins: np.ndarray = np.minimum((depth*no_bins/10.0).astype(int), no_bins - 1)
+    for b in range(no_bins):
+      in_bin: np.ndarray = bins == b
+      self.assertAlmostEqual(values[indices[bins[indices] == b]].max(), values[in_bin].max())
+      self.assertAlmostEqual(values[indices[bins[indices] == b]].min(), values[in_bin].min())
+
+  def test_gaps_kept(self):
+    depth: np.ndarray = np.linspace(0.0, 10.0, 1000)
+    values: np.ndarray = np.ones(1000)
+    values[500:510] = np.nan
+
+    indices: np.ndarray = min_max_indices(depth, values, no_bins = 10)
+
+    self.assertIn(499, indices)
+    self.assertIn(500, indices)
+    self.assertIn(509, indices)
+    self.assertIn(510, indices)
@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+import numpy as np
+
+from cptlib.layertools.interval_index import IntervalIndex
+from cptlib.layertools.layer import Layer
+from cptlib.layertools.zones_probe import ZonesProbe
+from cptlib.probetools.probe_list import ProbeList
+
+INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe'
+
+class TestIntervalIndex(TestCase):
+  def setUp(self):
+    self._index = IntervalIndex([Layer(1.0, 2.0), Layer(2.0, 3.5), Layer(5.0, 6.0)])
+
+  def test_find(self):
+    self.assertIsNone(self._index.find(0.5))
+    self.assertEqual(self._index.find(2.0).top, 2.0)
+    self.assertIsNone(self._index.find(4.0))
+    self.assertIsNone(self._index.find(6.0))
+
+  def test_locate(self):
+    expected_indices: list[int] = [-1, 0, 1, -1, 2, -1]
+
+    indices: np.ndarray = self._index.locate(np.array([0.5, 1.0, 2.0, 4.0, 5.5, 6.0]))
+    self.assertListEqual(indices.tolist(), expected_indices)
+
+  def test_overlapping(self):
+    self.assertListEqual([layer.top for layer in self._index.overlapping(1.5, 5.5)], [1.0, 2.0, 5.0])
+    self.assertListEqual(self._index.overlapping(3.5, 5.0), [])
+
+  def test_overlapping_slices(self):
+    expected_starts: list[int] = [0, 2, 1, 3]
+    expected_stops: list[int] = [3, 2, 2, 3]
+
+    starts, stops = self._index.overlapping_slices(np.array([1.5, 3.5, 2.0, 7.0]), np.array([5.5, 5.0, 2.0, 8.0]))
+    self.assertListEqual(starts.tolist(), expected_starts)
+    self.assertListEqual(stops.tolist(), expected_stops)
+
+  def test_zones_probe_index(self):
+    probes = ProbeList(INPUT_FILE)
+    zones = ZonesProbe(probes[1])
+    index: IntervalIndex = zones.interval_index()
+    depths: np.ndarray = np.linspace(0.0, 20.0, 401)
+
+    for depth, position in zip(depths, index.locate(depths), strict = True):
+      expected = [k for k, zone in enumerate(zones) if zone.top <= depth < zone.bottom]
+      self.assertEqual(position, expected[0] if expected else -1)
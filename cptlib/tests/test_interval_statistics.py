@@ -0,0 +1,50 @@
+from unittest import TestCase
+
+import numpy as np
+
+from cptlib.layertools.zones_probe import ZonesProbe
+from cptlib.probetools.interval_statistics import IntervalStatistics, SparseTable
+from cptlib.probetools.probe_list import ProbeList
+
+INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe'
+
+class TestIntervalStatistics(TestCase):
+  def test_sparse_table(self):
+    rng = np.random.default_rng(1)
+    values = rng.normal(size = 300)
+    values[rng.random(300) < 0.2] = np.nan
+    starts, stops = rng.integers(0, 301, 2000), rng.integers(0, 301, 2000)
+
+    minima = SparseTable(values, block_size = 8).query(starts, stops)
+    maxima = SparseTable(values, maximum = True, block_size = 8).query(starts, stops)
+
+    for start, stop, minimum, maximum in zip(starts, stops, minima, maxima):
+      available = values[start:stop][np.isfinite(values[start:stop])]
+      if available.size:
+        self.assertEqual((minimum, maximum), (available.min(), available.max()))
+      else:
+        self.assertTrue(np.isnan(minimum) and np.isnan(maximum))
+
+  def test_summary(self):
+    statistics = IntervalStatistics(np.arange(5.0), {'qc': np.array([1.0, np.nan, 3.0, 5.0, 2.0])})
+
+    self.assertDictEqual(statistics.summary(0.0, 3.5), {'# measurements': 4, 'qc mean': 3.0, 'qc min': 1.0,
+                                                        'qc max': 5.0})
+    self.assertEqual(statistics.summary(3.0, 4.0)['qc mean'], 5.0)
+    self.assertTrue(np.isnan(statistics.summary(1.0, 1.5)['qc max'])) # no available values
+    self.assertEqual(statistics.summary(2.0, 1.0)['# measurements'], 0)
+
+  def test_zones(self):
+    probe = ProbeList(INPUT_FILE)[1]
+    tops, bottoms, _ = ZonesProbe(probe).columns()
+    depth, qc, _ = probe.columns()
+    valid_qc = np.where(probe.validity().qc, qc, np.nan)
+
+    summary = probe.statistics().summarize(tops, bottoms)
+
+    self.assertIs(probe.statistics(), probe.statistics())
+    self.assertEqual(summary["# measurements"].sum(), len(depth))
+    for k in range(len(tops)):
+      inside = valid_qc[(depth >= tops[k]) & (depth < bottoms[k])]
+      self.assertAlmostEqual(summary["qc mean"][k], np.nanmean(inside))
+      self.assertEqual(summary["qc max"][k], np.nanmax(inside))
@@ -0,0 +1,54 @@
+from unittest import TestCase
+
+import numpy as np
+
+from cptlib.layertools.interval_table import IntervalTable
+from cptlib.layertools.layer import Layer
+from cptlib.layertools.layers_probe import LayersProbe
+from cptlib.layertools.zone import Zone
+from cptlib.probetools.probe_list import ProbeList
+
+INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe'
+
+class TestIntervalTable(TestCase):
+  def setUp(self):
+    self._zones = IntervalTable.merge(np.array([1.0, 1.2, 1.4, 1.6, 1.8]), np.array([3, 3, 5, 5, 3]))
+
+  def test_merge(self):
+    np.testing.assert_allclose(self._zones.tops, [0.9, 1.3, 1.7])
+    np.testing.assert_allclose(self._zones.bottoms, [1.3, 1.7, 1.9])
+    self.assertListEqual(self._zones.numbers.tolist(), [3, 5, 3])
+
+  def test_lazy_objects(self):
+    zone = self._zones[1]
+
+    self.assertIsInstance(zone, Zone)
+    self.assertEqual((zone.number, zone.top, zone.bottom), (5, self._zones.tops[1], self._zones.bottoms[1]))
+    self.assertListEqual([zone.number for zone in self._zones], [3, 5, 3])
+    self.assertFalse(hasattr(zone, '__dict__'))
+
+  def test_slice_is_view(self):
+    rows = self._zones[1:]
+
+    self.assertIsInstance(rows, IntervalTable)
+    self.assertEqual(len(rows), 2)
+    self.assertTrue(np.shares_memory(rows.tops, self._zones.tops))
+
+  def test_thickest(self):
+    layers = IntervalTable(np.array([1.0, 2.0, 4.0]), np.array([1.5, 3.0, 5.0]))
+
+    self.assertIsInstance(layers.thickest(), Layer)
+    self.assertEqual(layers.thickest().top, 2.0) # the first of the equally thick layers
+    self.assertIsNone(IntervalTable(np.empty(0), np.empty(0)).thickest())
+
+  def test_invalid_layer(self):
+    with self.assertRaises(ValueError):
+      IntervalTable(np.array([1.0, 3.0]), np.array([2.0, 2.5]))
+    with self.assertRaises(ValueError):
+      IntervalTable.merge(np.array([0.2, 1.0]), np.array([1, 2])) # the first zone would start above the surface
+
+  def test_layers_probe_thickest(self):
+    probes = ProbeList(INPUT_FILE)
+    layers = LayersProbe(probes[1])
+
+    self.assertEqual(layers.thickest().top, max(layers).top)
@@ -0,0 +1,74 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from unittest import TestCase, skipIf
+
+import numpy as np
+
+from cptlib.probetools.json_source import iter_json_array, json_file_path, zstandard
+from cptlib.probetools.probe_index import ProbeIndex
+from cptlib.probetools.probe_list import ProbeList
+
+INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe'
+
+class TestJsonSource(TestCase):
+  def setUp(self):
+    self._dir: str = tempfile.mkdtemp()
+    with open(INPUT_FILE + '.json', 'rb') as file:
+      self._content: bytes = file.read()
+    self._probes = ProbeList(INPUT_FILE)
+
+  def tearDown(self):
+    shutil.rmtree(self._dir)
+
+  def assertSameProbes(self, probes: ProbeList, expected: ProbeList):
+    self.assertListEqual([probe.number for probe in probes], [probe.number for probe in expected])
+    for probe, expected_probe in zip(probes, expected):
+      for column, expected_column in zip(probe.columns(), expected_probe.columns()):
+        np.testing.assert_array_equal(column, expected_column)
+
+  def test_iter_json_array(self):
+    records = list(iter_json_array(io.BytesIO(self._content), chunk_size = 100)) # records split over chunks
+
+    self.assertListEqual(records, json.loads(self._content))
+    self.assertListEqual(list(iter_json_array(io.BytesIO(b' [ ] '))), [])
+    with self.assertRaises(ValueError):
+      list(iter_json_array(io.BytesIO(self._content[:-200])))
+
+  def test_gzip(self):
+    with gzip.open(os.path.join(self._dir, 'probes.json.gz'), 'wb') as file:
+      file.write(self._content)
+    name: str = os.path.join(self._dir, 'probes')
+
+    self.assertEqual(json_file_path(name), name + '.json.gz')
+    self.assertSameProbes(ProbeList(name), self._probes)
+
+    # Compare with a copy such that the stored index doesn't end up next to the input file
+    copy: str = os.path.join(self._dir, 'copy')
+    shutil.copy(INPUT_FILE + '.json', copy + '.json')
+    number: str = self._probes[1].number
+    index = ProbeIndex(name)
+    self.assertListEqual(index.numbers, ProbeIndex(copy).numbers)
+    self.assertSameProbes(ProbeList(name, probe_numbers = [number]), ProbeList(copy, probe_numbers = [number]))
+
+  @skipIf(zstandard is None, "zstandard is not installed")
+  def test_zstd(self):
+    with open(os.path.join(self._dir, 'probes.json.zst'), 'wb') as file:
+      file.write(zstandard.ZstdCompressor().compress(self._content))
+
+    self.assertSameProbes(ProbeList(os.path.join(self._dir, 'probes')), self._probes)
+
+  def test_zip(self):
+    with zipfile.ZipFile(os.path.join(self._dir, 'archive.zip'), 'w', zipfile.ZIP_DEFLATED) as archive:
+      archive.writestr('b/probes.json', self._content)
+      archive.writestr('a/readme.txt', 'not a json file')
+
+    self.assertSameProbes(ProbeList(os.path.join(self._dir, 'archive')), self._probes)
+
+  def test_missing_file(self):
+    with self.assertRaises(FileNotFoundError):
+      json_file_path(os.path.join(self._dir, 'probes'))
@@ -0,0 +1,53 @@
+from unittest import TestCase
+
+import numpy as np
+
+from cptlib.layertools.layer_sweep import LayerSweep
+from cptlib.layertools.layers_probe import LayersProbe
+from cptlib.probetools.probe_list import Probe, ProbeList
+from cptlib.setuptools.measurement import Measurement
+
+INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe'
+QC_MAXIMA: list[float] = [1.0, 1.5, 2.0, 2.5, 3.0, 4.0]
+
+class TestLayerSweep(TestCase):
+  def setUp(self):
+    self._probes = ProbeList(INPUT_FILE)
+
+  def test_same_as_layers_probe(self):
+    for probe in self._probes:
+      sweep = LayerSweep(probe, QC_MAXIMA, range(10))
+
+      self.assertEqual(len(sweep), len(QC_MAXIMA)*10)
+      for row in sweep:
+        layers = LayersProbe(probe, row.zone_number, row.qc_max)
+        tops, bottoms = layers.columns()
+        np.testing.assert_array_equal(sweep.layers(row.qc_max, row.zone_number).tops, tops)
+        np.testing.assert_array_equal(sweep.layers(row.qc_max, row.zone_number).bottoms, bottoms)
+        self.assertEqual(row.no_layers, len(layers))
+        if layers.thickest() is None:
+          self.assertTrue(np.isnan(row.top) and np.isnan(row.bottom))
+        else:
+          self.assertEqual((row.top, row.bottom), (layers.thickest().top, layers.thickest().bottom))
+
+  def test_columns(self):
+    columns = LayerSweep(self._probes[1], [1.0, 2.0], [0, 3]).columns()
+
+    self.assertListEqual(columns["qc_max"].tolist(), [1.0, 2.0, 1.0, 2.0])
+    self.assertListEqual(columns["zone_number"].tolist(), [0, 0, 3, 3])
+    self.assertEqual(columns["no_layers"][1], 2)
+    self.assertAlmostEqual(columns["top"][1], 2.945)
+    self.assertAlmostEqual(columns["bottom"][3], 3.205)
+
+  def test_qc_not_positive(self):
+    probe = Probe('S1', [Measurement(1.0, 3.0, 30.0), Measurement(1.1, 0.0, 10.0), Measurement(1.2, None, 10.0),
+                         Measurement(1.3, 1.0, 10.0), Measurement(1.4, 3.0, 30.0)])
+
+    layers = LayerSweep(probe, [2.0], [0]).layers(2.0)
+
+    np.testing.assert_array_equal(layers.tops, LayersProbe(probe, 0, 2.0).columns()[0])
+    self.assertAlmostEqual(layers.tops[0], 1.05) # a qc that isn't positive is below qc_max
+
+  def test_unknown_combination(self):
+    with self.assertRaises(KeyError):
+      LayerSweep(self._probes[0], [2.0]).layers(3.0)
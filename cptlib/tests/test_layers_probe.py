@@ -2,6 +2,7 @@ from unittest import TestCase
 
 from cptlib.layertools.layers_probe import Layer, LayersProbe
 from cptlib.probetools.probe_list import Probe, ProbeList
+from cptlib.setuptools.measurement import Measurement
 
 INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe'
 
@@ -35,4 +36,14 @@ class TestLayersProbe(TestCase):
     for layer in iter(layers): # one layer = one iteration
       self.assertAlmostEqual(layer.top, expected_top)
       self.assertAlmostEqual(layer.bottom, expected_bottom)
-  
\ No newline at end of file
+
+  def test_qc_not_positive(self):
+    measurements: list[Measurement] = [Measurement(1.0, 3.0, 30.0), Measurement(1.1, 0.0, 10.0),
+                                       Measurement(1.2, -0.5, 10.0), Measurement(1.3, None, 10.0),
+                                       Measurement(1.4, 1.0, 10.0), Measurement(1.5, 3.0, 30.0)]
+
+    layers = LayersProbe(Probe('S1', measurements), zone_number = 0, qc_max = 2.0)
+
+    self.assertEqual(len(layers), 1) # a qc that isn't positive is below qc_max, a missing qc is skipped
+    self.assertAlmostEqual(max(layers).top, 1.05)
+    self.assertAlmostEqual(max(layers).bottom, 1.45)
@@ -0,0 +1,57 @@
+from math import log10, sqrt
+from unittest import TestCase
+
+import numpy as np
+
+from cptlib.layertools.normalized_sbt import (ATM_PRESS, UNIT_WEIGHT_SOIL, UNIT_WEIGHT_WATER,
+                                              normalized_SBT, normalized_zone_numbers)
+from cptlib.layertools.zones_probe import ZonesProbe
+from cptlib.probetools.probe_list import ProbeList
+
+INPUT_DIR: str = 'cptlib/tests/input_files/'
+
+class TestNormalizedSBT(TestCase):
+  def test_stress_exponent_fixed_point(self):
+    depth, qc, fs = 5.0, 1.5, 30.0
+    gw_depth: float = 2.0
+
+    # Solve the fixed-point problem for a single measurement in scalar form
+    sigma_v0: float = UNIT_WEIGHT_SOIL*depth
+    sigma_v0_eff: float = sigma_v0 - UNIT_WEIGHT_WATER*(depth - gw_depth)
+    Fr: float = fs*100/(1000*qc - sigma_v0)
+    n: float = 1.0
+    for _ in range(100):
+      Qtn: float = (1000*qc - sigma_v0)/ATM_PRESS*(ATM_PRESS/sigma_v0_eff)**n
+      Ic: float = sqrt((3.47 - log10(Qtn))**2 + (log10(Fr) + 1.22)**2)
+      n = min(0.381*Ic + 0.05*sigma_v0_eff/ATM_PRESS - 0.15, 1.0)
+
+    sbt = normalized_SBT(np.array([depth]), np.array([qc]), np.array([fs]), gw_depth, tolerance = 1e-9)
+
+    self.assertTrue(sbt.converged[0])
+    self.assertAlmostEqual(sbt.n[0], n)
+    self.assertAlmostEqual(sbt.Fr[0], Fr)
+    self.assertAlmostEqual(sbt.Ic[0], Ic, places = 6)
+
+  def test_invalid_measurements(self):
+    depth = np.array([1.0, 2.0, 3.0])
+    qc = np.array([np.nan, 2.0, 0.0])
+    fs = np.array([10.0, np.nan, 10.0])
+
+    sbt = normalized_SBT(depth, qc, fs)
+
+    self.assertFalse(sbt.valid.any())
+    self.assertFalse(sbt.converged.any())
+    self.assertListEqual(normalized_zone_numbers(sbt).tolist(), [0, 0, 0])
+
+  def test_classify_normalized(self):
+    probes = ProbeList(INPUT_DIR + 'test_layers_probe')
+    zones = ZonesProbe(probes[1], normalized = True)
+    depth, _, _ = probes[1].columns()
+
+    self.assertTrue(zones.normalized_SBT.converged[zones.normalized_SBT.valid].all())
+    self.assertGreater(len(zones), 0)
+    for zone, next_zone in zip(list(zones)[:-1], list(zones)[1:], strict = True):
+      self.assertAlmostEqual(zone.bottom, next_zone.top)
+      self.assertNotEqual(zone.number, next_zone.number)
+    self.assertLess(list(zones)[0].top, depth[0])
+    self.assertGreater(list(zones)[-1].bottom, depth[-1])
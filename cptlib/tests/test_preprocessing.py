@@ -0,0 +1,71 @@
+from unittest import TestCase
+
+import numpy as np
+
+from cptlib.layertools.interval_table import IntervalTable
+from cptlib.layertools.zones_probe import ZonesProbe
+from cptlib.probetools.preprocessing import PreprocessingPolicy, align, despike, preprocess, smooth
+from cptlib.probetools.probe_list import ProbeList
+
+INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe'
+
+class TestPreprocessing(TestCase):
+  def setUp(self):
+    self._depth = np.arange(1.0, 3.0, 0.1)
+    self._values = np.linspace(2.0, 4.0, len(self._depth))
+
+  def test_align(self):
+    aligned = align(self._depth, self._values, 0.2)
+
+    np.testing.assert_allclose(aligned[:-2], self._values[2:])
+    self.assertTrue(np.isnan(aligned[-2:]).all()) # beyond the last measurement
+
+  def test_despike(self):
+    values = self._values.copy()
+    values[7] = 50.0
+    values[12] = np.nan
+
+    despiked = despike(values, 5, 3.0)
+
+    self.assertLess(despiked[7], 4.0)
+    np.testing.assert_array_equal(np.delete(despiked, [7, 12]), np.delete(values, [7, 12]))
+    self.assertTrue(np.isnan(despiked[12]))
+
+  def test_smooth(self):
+    values = np.full(len(self._depth), 3.0)
+    values[5] = np.nan
+
+    smoothed = smooth(self._depth, values, 0.5)
+
+    np.testing.assert_allclose(np.delete(smoothed, 5), 3.0)
+    self.assertTrue(np.isnan(smoothed[5]))
+
+  def test_default_policy(self):
+    qc, fs = preprocess(self._depth, self._values, self._values)
+
+    self.assertIs(qc, self._values)
+    self.assertIs(fs, self._values)
+
+  def test_merge_thin(self):
+    zones = IntervalTable(np.array([0.0, 1.0, 1.1, 2.0, 2.05, 3.0]), np.array([1.0, 1.1, 2.0, 2.05, 3.0, 3.5]),
+                          np.array([3, 4, 5, 6, 5, 3]))
+
+    merged = zones.merge_thin(0.2)
+
+    np.testing.assert_allclose(merged.tops, [0.0, 1.1, 3.0])
+    np.testing.assert_allclose(merged.bottoms, [1.1, 3.0, 3.5])
+    self.assertListEqual(merged.numbers.tolist(), [3, 5, 3])
+    self.assertIs(zones.merge_thin(0.01), zones)
+    with self.assertRaises(ValueError):
+      IntervalTable(np.array([0.0]), np.array([1.0])).merge_thin(0.2)
+
+  def test_zones_probe(self):
+    probe = ProbeList(INPUT_FILE)[1]
+    policy = PreprocessingPolicy(fs_offset = 0.05, spike_threshold = 3.0, smoothing = 0.2, min_thickness = 0.3)
+
+    zones = ZonesProbe(probe, preprocessing = policy)
+
+    self.assertLess(len(zones), len(ZonesProbe(probe)))
+    self.assertGreaterEqual(zones.interval_table.thicknesses[:-1].min(), 0.3)
+    with self.assertRaises(ValueError):
+      ZonesProbe(probe, preprocessing = PreprocessingPolicy(spike_window = 4))
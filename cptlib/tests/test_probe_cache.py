@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from cptlib.probetools.probe_cache import ProbeCache
+from cptlib.probetools.probe_list import ProbeList
+
+INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe'
+
+class TestProbeCache(TestCase):
+  def setUp(self):
+    self._dir: str = tempfile.mkdtemp()
+    self._file_name: str = os.path.join(self._dir, 'probes')
+    shutil.copy(INPUT_FILE + '.json', self._file_name + '.json')
+    self._cache_dir: str = os.path.join(self._dir, 'cache')
+
+  def tearDown(self):
+    shutil.rmtree(self._dir)
+
+  def test_same_measurements(self):
+    probes = ProbeList(self._file_name)
+    cached_probes = ProbeList(self._file_name, cache = ProbeCache(self._cache_dir))
+
+    self.assertEqual(len(cached_probes), len(probes))
+    for probe, cached_probe in zip(probes, cached_probes):
+      self.assertEqual(cached_probe.number, probe.number)
+      self.assertEqual(cached_probe.info, probe.info)
+      self.assertListEqual(list(cached_probe.measurements), list(probe.measurements))
+
+  def test_published_once(self):
+    self.assertFalse(ProbeCache(self._cache_dir).is_published(self._file_name))
+    dataset = ProbeCache(self._cache_dir).acquire(self._file_name)
+    self.assertTrue(ProbeCache(self._cache_dir).is_published(self._file_name))
+    table_file_name: str = os.path.join(self._cache_dir, dataset.key + '.npy')
+    inode: int = os.stat(table_file_name).st_ino
+
+    other_dataset = ProbeCache(self._cache_dir).acquire(self._file_name) # as in another process
+
+    self.assertEqual(other_dataset.key, dataset.key)
+    self.assertEqual(os.stat(table_file_name).st_ino, inode)
+    self.assertListEqual(other_dataset.numbers, ['2000912_S1', '2000912_S2'])
+    self.assertEqual(len(os.listdir(self._cache_dir)), 2)
+
+  def test_views_without_copy(self):
+    cached_probes = ProbeList(self._file_name, cache = ProbeCache(self._cache_dir))
+    depth, qc, fs = cached_probes[0].columns()
+
+    self.assertIsInstance(depth.base, np.memmap)
+    self.assertFalse(depth.flags.writeable)
+
+  def test_eviction(self):
+    other_file_name: str = os.path.join(self._dir, 'other_probes')
+    shutil.copy(INPUT_FILE + '.json', other_file_name + '.json')
+    cache = ProbeCache(self._cache_dir, max_bytes = 0)
+    other_cache = ProbeCache(self._cache_dir, max_bytes = 0) # as in another process
+
+    dataset = other_cache.acquire(self._file_name)
+    cache.release(cache.acquire(other_file_name))
+    self.assertEqual(len(os.listdir(self._cache_dir)), 4) # in use by the other process
+
+    other_cache.release(dataset)
+    cache.acquire(other_file_name)
+    self.assertEqual(len(os.listdir(self._cache_dir)), 2)
+
+  def test_links_share_dataset(self):
+    os.link(self._file_name + '.json', self._file_name + '_alias.json')
+    cache = ProbeCache(self._cache_dir)
+
+    self.assertIs(cache.acquire(self._file_name + '_alias'), cache.acquire(self._file_name))
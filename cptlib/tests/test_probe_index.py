@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from cptlib.probetools.probe_index import ProbeIndex
+from cptlib.probetools.probe_list import ProbeList
+
+INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe'
+
+class TestProbeIndex(TestCase):
+  def setUp(self):
+    # Work on a copy such that the stored index doesn't end up next to the input file
+    self._dir: str = tempfile.mkdtemp()
+    self._file_name: str = os.path.join(self._dir, 'probes')
+    shutil.copy(INPUT_FILE + '.json', self._file_name + '.json')
+
+  def tearDown(self):
+    shutil.rmtree(self._dir)
+
+  def test_read_records(self):
+    expected_len_records: int = 2768
+
+    index = ProbeIndex(self._file_name)
+    records: list[dict] = index.read_records(index.numbers)
+
+    self.assertEqual(len(index), 9)
+    self.assertEqual(len(records), expected_len_records)
+    self.assertListEqual(records, ProbeList.read_records.__wrapped__(self._file_name))
+
+  def test_stored_index(self):
+    index = ProbeIndex(self._file_name)
+
+    self.assertTrue(os.path.exists(self._file_name + '.index.json'))
+    self.assertListEqual(ProbeIndex(self._file_name).numbers, index.numbers)
+
+  def test_only_stored(self):
+    self.assertIsNone(ProbeIndex.stored(self._file_name)) # not built
+    self.assertFalse(os.path.exists(self._file_name + '.index.json'))
+
+    index = ProbeIndex(self._file_name)
+    self.assertListEqual(ProbeIndex.stored(self._file_name).numbers, index.numbers)
+
+    with open(self._file_name + '.json', 'ab') as file: # a new version of the file
+      file.write(b' ')
+    self.assertIsNone(ProbeIndex.stored(self._file_name))
+
+  def test_select(self):
+    index = ProbeIndex(self._file_name)
+
+    self.assertListEqual(index.select(method='continu elektrisch'), ['2000912_S1', '2000912_S2'])
+    self.assertListEqual(index.select(numbers=['2000912_S2', 'GEO-72/555-S97']), ['GEO-72/555-S97', '2000912_S2'])
+    self.assertListEqual(index.select(offset=7, limit=5), ['2000912_S1', '2000912_S2'])
+    self.assertListEqual(index.select(bbox=(0.0, 0.0, 1.0, 1.0)), [])
+
+  def test_probe_list_selection(self):
+    expected_len_measurements: int = 875
+
+    probes = ProbeList(self._file_name, probe_numbers=['2000912_S2'])
+
+    self.assertEqual(len(probes), 1)
+    self.assertEqual(probes[0].number, '2000912_S2')
+    self.assertEqual(len(probes[0].measurements), expected_len_measurements)
@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from cptlib.layertools.normalized_sbt import ATM_PRESS
+from cptlib.layertools.sbt_chart import SBTChart, zone_grid
+from cptlib.layertools.zones_probe import ZonesProbe
+from cptlib.probetools.probe_list import ProbeList
+from cptlib.setuptools.graph_set_up import GraphSetUp
+
+INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe'
+
+class TestSBTChart(TestCase):
+  def test_counts(self):
+    probes = ProbeList(INPUT_FILE)
+    chart = SBTChart(bins = (20, 30))
+    chart.add_probes(probes)
+
+    self.assertTupleEqual(chart.counts.shape, (20, 30))
+    self.assertEqual(chart.no_probes, len(probes))
+    self.assertEqual(len(chart) + chart.no_outside, sum(probe.validity().measurement.sum() for probe in probes))
+
+  def test_bins(self):
+    chart = SBTChart(bins = (2, 3)) # Rf: 0.1-1-10 %, qc/pa: 1-10-100-1000
+    qc = np.array([5.0, 5.0, 0.5, 50.0, 500.0])*ATM_PRESS/1000 # MPa
+    Rf = np.array([0.5, 5.0, 10.0, 0.2, 1.0]) # %
+    chart.add(qc[:2], Rf[:2]*1000*qc[:2]/100) # added in parts
+    chart.add(qc[2:], Rf[2:]*1000*qc[2:]/100)
+
+    np.testing.assert_array_equal(chart.counts, [[1, 1, 0], [1, 0, 1]])
+    self.assertEqual(chart.no_outside, 1)
+
+  def test_zone_grid(self):
+    Rf, qc_norm, numbers = zone_grid(50)
+
+    for row, column in [(0, 0), (10, 40), (25, 25), (49, 3), (45, 49)]:
+      Rf_point, qc_point = Rf[column], qc_norm[row]*ATM_PRESS/1000
+      self.assertEqual(numbers[row, column],
+                       ZonesProbe.zone_number(Rf_point, qc_point, ZonesProbe.SBT_index(Rf_point, qc_point)))
+
+    graph = GraphSetUp(file_name = 'chart', indep_variable = 'qc')
+    chart = SBTChart()
+    chart.add_probes(ProbeList(INPUT_FILE))
+    chart.visualize(graph)
+    self.assertEqual(graph.axes.get_xscale(), 'log')
+    plt.close(graph.gcf())
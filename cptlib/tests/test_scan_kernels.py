@@ -0,0 +1,49 @@
+import glob
+from unittest import TestCase, skipIf
+
+import numpy as np
+
+from cptlib.layertools.scan_kernels import COMPILED, layer_bounds, zone_numbers
+from cptlib.layertools.zones_probe import Measurement, ZonesProbe
+from cptlib.probetools.probe_list import ProbeList
+
+INPUT_FILES: list[str] = sorted(file_name for file_name in glob.glob('cptlib/tests/input_files/*.json')
+                               if not file_name.endswith('.index.json'))
+
+class TestScanKernels(TestCase):
+  def setUp(self):
+    self._probes: list = [probe for file_name in INPUT_FILES for probe in ProbeList(file_name[:-len('.json')])]
+
+  def test_zone_numbers(self):
+    for probe in self._probes:
+      depth, qc, fs = probe.columns()
+      valid: np.ndarray = probe.validity().measurement
+      expected: list[int] = []
+      for m_depth, m_qc, m_fs, m_valid in zip(depth.tolist(), qc.tolist(), fs.tolist(), valid.tolist()):
+        Rf: float = ZonesProbe.friction_ratio(Measurement(m_depth, m_qc, m_fs)) if m_valid else 0.0
+        expected.append(ZonesProbe.zone_number(Rf, m_qc, ZonesProbe.SBT_index(Rf, m_qc)) if m_valid else 0)
+
+      self.assertListEqual(zone_numbers(qc, fs, valid, compiled = False).tolist(), expected)
+
+  def test_layer_bounds(self):
+    depth = np.array([1.0, 1.1, 1.2, 1.3, 1.4, 1.5])
+    qc = np.array([1.0, 1.5, 3.0, np.nan, 1.0, 1.0])
+    qc_valid = np.isfinite(qc)
+
+    tops, bottoms = layer_bounds(depth, qc, np.ones(6), qc_valid, np.zeros(6, dtype = bool), 0, 2.0, compiled = False)
+
+    np.testing.assert_allclose(tops, [0.95, 1.35])
+    np.testing.assert_allclose(bottoms, [1.15, 1.55])
+
+  @skipIf(not COMPILED, "numba is not installed")
+  def test_compiled(self):
+    for probe in self._probes:
+      depth, qc, fs = probe.columns()
+      validity = probe.validity()
+      np.testing.assert_array_equal(zone_numbers(qc, fs, validity.measurement, compiled = True),
+                                    zone_numbers(qc, fs, validity.measurement, compiled = False))
+      for zone_nr in range(10):
+        for compiled_column, column in zip(
+            layer_bounds(depth, qc, fs, validity.qc, validity.measurement, zone_nr, 2.0, compiled = True),
+            layer_bounds(depth, qc, fs, validity.qc, validity.measurement, zone_nr, 2.0, compiled = False)):
+          np.testing.assert_array_equal(compiled_column, column)
@@ -0,0 +1,55 @@
+from unittest import TestCase
+
+import numpy as np
+
+from cptlib.layertools.scan_kernels import zone_numbers
+from cptlib.layertools.uncertainty import (ErrorModel, UncertainZones, UncertaintyPolicy, batch_zone_numbers,
+                                           check_uncertainty)
+from cptlib.layertools.zones_probe import ZonesProbe
+from cptlib.probetools.probe_list import ProbeList
+
+INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe'
+
+class TestUncertainty(TestCase):
+  def setUp(self):
+    self._probes = ProbeList(INPUT_FILE)
+
+  def test_batch_zone_numbers(self):
+    rng = np.random.default_rng(1)
+    qc = np.exp(rng.uniform(-3, 4, (20, 500))) # spread over the whole chart
+    fs = np.exp(rng.uniform(-2, 7, (20, 500)))
+    qc[0, :3], fs[1, :3] = [np.nan, 0.0, -1.0], [np.inf, 0.0, -1.0]
+
+    zone_nrs = batch_zone_numbers(qc, fs)
+
+    valid = np.isfinite(qc) & np.isfinite(fs) & (qc > 0) & (fs > 0)
+    np.testing.assert_array_equal(zone_nrs.ravel(), zone_numbers(qc.ravel(), fs.ravel(), valid.ravel(), compiled = False))
+
+  def test_without_errors(self):
+    policy = UncertaintyPolicy(ErrorModel(), ErrorModel(), realizations = 5)
+    for probe in self._probes:
+      zones = UncertainZones(probe, policy)
+
+      for column, expected in zip(zones.columns(), ZonesProbe(probe).columns()):
+        np.testing.assert_array_equal(column, expected)
+      self.assertTrue(np.all(zones.most_likely()[1] == 1))
+      np.testing.assert_array_equal(zones.zone_probabilities(), np.ones(len(zones)))
+
+  def test_probabilities(self):
+    probe = self._probes[1]
+    policy = UncertaintyPolicy(ErrorModel(0.1), ErrorModel(0.1, 1.0, 'lognormal'), realizations = 50, seed = 3)
+    zones = UncertainZones(probe, policy)
+
+    self.assertTupleEqual(zones.probabilities.shape, (len(zones.depth), 10))
+    np.testing.assert_allclose(zones.probabilities.sum(axis = 1), 1.0)
+    np.testing.assert_array_equal(zones.probabilities[~probe.validity().measurement, 0], 1.0)
+    self.assertEqual(len(zones.zone_probabilities()), len(zones))
+    np.testing.assert_array_equal(UncertainZones(probe, policy).probabilities, zones.probabilities) # same seed
+    self.assertFalse(np.array_equal(UncertainZones(probe, policy._replace(seed = 4)).probabilities,
+                                    zones.probabilities))
+
+  def test_check_uncertainty(self):
+    for policy in [UncertaintyPolicy(qc = ErrorModel(-0.1)), UncertaintyPolicy(fs = ErrorModel(0.1, float('nan'))),
+                   UncertaintyPolicy(fs = ErrorModel(0.1, 0.0, 'uniform')), UncertaintyPolicy(realizations = 0)]:
+      with self.assertRaises(ValueError):
+        check_uncertainty(policy)
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from cptlib.layertools.voxel_model import NO_DATA, VoxelModel, nearest_neighbours, resample_zones
+from cptlib.layertools.zones_probe import ZonesProbe
+from cptlib.probetools.probe_list import ProbeList
+
+INPUT_FILE: str = 'cptlib/tests/input_files/test_layers_probe'
+
+class TestVoxelModel(TestCase):
+  def setUp(self):
+    self._dir: str = tempfile.mkdtemp()
+    self._probes = list(ProbeList(INPUT_FILE)) # two probes about 200 m apart
+
+  def tearDown(self):
+    shutil.rmtree(self._dir)
+
+  def test_nearest_neighbours(self):
+    points: np.ndarray = np.array([[0.0, 0.0], [10.0, 0.0], [0.0, 5.0]])
+
+    distances, indices = nearest_neighbours(points, np.array([[1.0, 1.0], [9.0, 0.0]]), 4, max_distance = 8.0)
+
+    self.assertListEqual(indices.tolist(), [[0, 2, 3, 3], [1, 3, 3, 3]])
+    np.testing.assert_allclose(distances[:, 0], [np.sqrt(2.0), 1.0])
+    self.assertTrue(np.isinf(distances[1, 1:]).all())
+
+  def test_resample_zones(self):
+    zones = ZonesProbe(self._probes[0]).interval_table
+
+    numbers: np.ndarray = resample_zones(zones, np.array([0.0, zones.tops[0] + 0.001, zones.bottoms[-1] + 1.0]))
+
+    self.assertListEqual(numbers.tolist(), [NO_DATA, zones.numbers[0], NO_DATA])
+
+  def test_nearest(self):
+    model = VoxelModel.build(self._probes, os.path.join(self._dir, 'model'), cell_size = 10.0, depth_step = 0.5)
+    probe = self._probes[1]
+    x, y = probe.info['x'], probe.info['y']
+
+    self.assertListEqual(model.probes, ['2000912_S1', '2000912_S2'])
+    self.assertEqual(model.cells.shape, (len(model.axes.depth), len(model.axes.y), len(model.axes.x)))
+    np.testing.assert_array_equal(model.column(x, y),
+                                  resample_zones(ZonesProbe(probe).interval_table, model.axes.depth))
+    self.assertEqual(model.depth_slice(5.0).shape, (len(model.axes.y), len(model.axes.x)))
+    self.assertEqual(model.x_slice(x).shape, (len(model.axes.depth), len(model.axes.y)))
+    self.assertEqual(model.y_slice(y).shape, (len(model.axes.depth), len(model.axes.x)))
+    with self.assertRaises(ValueError):
+      model.column(x + 1000.0, y)
+
+  def test_chunks(self):
+    model = VoxelModel.build(self._probes, os.path.join(self._dir, 'model'), cell_size = 10.0, depth_step = 0.5,
+                             method = 'idw')
+    chunked_model = VoxelModel.build(self._probes, os.path.join(self._dir, 'chunked_model'), cell_size = 10.0,
+                                     depth_step = 0.5, method = 'idw', max_chunk_cells = 1)
+
+    np.testing.assert_array_equal(chunked_model.cells, model.cells)
+
+  def test_idw_single_probe(self):
+    bbox: tuple[float, float, float, float] = (152100.0, 207200.0, 152400.0, 207500.0)
+    nearest = VoxelModel.build(self._probes[:1], os.path.join(self._dir, 'nearest'), 50.0, 0.5, bbox = bbox)
+    idw = VoxelModel.build(self._probes[:1], os.path.join(self._dir, 'idw'), 50.0, 0.5, method = 'idw', bbox = bbox)
+
+    np.testing.assert_array_equal(idw.cells, nearest.cells)
+    self.assertTrue((nearest.cells == nearest.cells[:, :1, :1]).all()) # the same column everywhere
+
+  def test_rebuilt(self):
+    name: str = os.path.join(self._dir, 'model')
+    VoxelModel.build(self._probes, name, cell_size = 10.0, depth_step = 0.5)
+    other = VoxelModel.build(self._probes[:1], os.path.join(self._dir, 'other'), cell_size = 10.0, depth_step = 0.5)
+    os.replace(os.path.join(self._dir, 'other.npy'), name + '.npy') # the cells of a new build, but not yet its axes
+
+    with self.assertRaises(ValueError):
+      VoxelModel(name)
+    os.replace(os.path.join(self._dir, 'other.json'), name + '.json')
+    np.testing.assert_array_equal(VoxelModel(name).cells, other.cells)
+
+  def test_invalid_method(self):
+    with self.assertRaises(ValueError):
+      VoxelModel.build(self._probes, os.path.join(self._dir, 'model'), 10.0, 0.5, method = 'kriging')